@@ -14,7 +14,9 @@ frequency domain and related quantities.
 
 :func:`coherency`, :func:`coherence`, :func:`coherence_regularized`,
 :func:`coherency_regularized`, :func:`coherency_bavg`, :func:`coherence_bavg`,
+:func:`coherence_bands`, :func:`coherence_bands_spec`,
 :func:`coherence_partial`, :func:`coherence_partial_bavg`,
+:func:`coherence_partial_matrix`, :func:`coherence_partial_full`,
 :func:`coherency_phase_spectrum`, :func:`coherency_phase_delay`,
 :func:`coherency_phase_delay_bavg`, :func:`correlation_spectrum`
 
@@ -24,7 +26,9 @@ of the adjacency matrix edges and intermediate calculations are cached, in
 order to save calculation time.
 
 :func:`cache_fft`, :func:`cache_to_psd`, :func:`cache_to_phase`,
-:func:`cache_to_relative_phase`, :func:`cache_to_coherency`.
+:func:`cache_to_relative_phase`, :func:`cache_to_coherency`,
+:func:`cache_to_seed_coherency`, :func:`cache_to_coherence_network`,
+:func:`cache_to_dynamic_coherency`.
 
 4. Event-related analysis: calculate the correlation between time-series and
 external events.
@@ -42,7 +46,13 @@ external events.
 
 7. Autoregressive estimation and granger causality
 
-:func:
+:func:`conditional_granger_causality`
+
+8. Surrogate testing: the significance of statistics of time-series (such as
+their coherence or correlation), against surrogate data with the same spectra.
+
+:func:`surrogate_test`, :func:`surrogates`, :func:`coherence_statistic`,
+:func:`seed_corrcoef_statistic`
 
 The algorithms in this library are the functional form of the algorithms, which
 accept as inputs numpy array and produce numpy array outputs. Therfore, they
@@ -59,3 +69,4 @@ from nitime.algorithms.event_related import *
 from nitime.algorithms.autoregressive import *
 from nitime.algorithms.filter import *
 from nitime.algorithms.correlation import *
+from nitime.algorithms.surrogate import *
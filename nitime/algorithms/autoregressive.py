@@ -165,7 +165,7 @@ def AR_est_LD(x, order, rxx=None):
     return w[1:], b
 
 
-def lwr_recursion(r):
+def lwr_recursion(r, all_orders=False):
     r"""Perform a Levinson-Wiggins[Whittle]-Robinson recursion to
     find the coefficients a(i) that satisfy the matrix version
     of the Yule-Walker system of P + 1 equations:
@@ -191,62 +191,112 @@ def lwr_recursion(r):
     Parameters
     ----------
 
-    r : ndarray, shape (P + 1, nc, nc)
+    r : ndarray, shape (P + 1, nc, nc), or (batch, P + 1, nc, nc)
+      The autocovariance sequence. A batch of independent sequences is solved
+      all together.
+
+    all_orders : bool, optional
+      Whether to return the covariance estimates of the models of all the
+      orders 0, ..., P, which the recursion goes through, rather than only
+      of order P.
 
     Returns
     -------
 
-    a : ndarray (P,nc,nc)
+    a : ndarray (P,nc,nc), or (batch, P, nc, nc)
       coefficient sequence of order P
-    sigma : ndarray (nc,nc)
-      covariance estimate
+    sigma : ndarray (nc,nc), or (batch, nc, nc)
+      covariance estimate. If all_orders is True, shaped (P + 1, nc, nc), or
+      (batch, P + 1, nc, nc), where sigma[m] is the estimate for order m.
 
     """
-
-    # r is (P+1, nc, nc)
-    nc = r.shape[1]
-    P = r.shape[0] - 1
-
-    a = np.zeros((P, nc, nc))  # ar coefs
+    r = np.asarray(r)
+    if r.ndim == 3:
+        a, sigma = lwr_recursion(r[None], all_orders)
+        return a[0], sigma[0]
+
+    # r is (batch, P+1, nc, nc)
+    n_batch = r.shape[0]
+    nc = r.shape[2]
+    P = r.shape[1] - 1
+
+    dtype = np.result_type(r.dtype, float)
+    a = np.zeros((n_batch, P, nc, nc), dtype)  # ar coefs
     b = np.zeros_like(a)  # lp coefs
-    sigb = np.zeros_like(r[0])  # forward prediction error covariance
-    sigf = np.zeros_like(r[0])  # backward prediction error covariance
-    delta = np.zeros_like(r[0])
+
+    sig_orders = np.empty((n_batch, P + 1, nc, nc), dtype)
 
     # initialize
     idnt = np.eye(nc)
-    sigf[:] = r[0]
-    sigb[:] = r[0]
+    sigf = r[:, 0].astype(dtype)  # forward prediction error covariance
+    sigb = sigf.copy()  # backward prediction error covariance
+    sig_orders[:, 0] = sigf
 
     # iteratively find sequences A_{p+1}(i) and B_{p+1}(i)
     for p in range(P):
 
         # calculate delta_{p+1}
         # delta_{p+1} = r(p+1) + sum_{i=1}^{p} a(i)r(p+1-i)
-        delta[:] = r[p + 1]
-        for i in range(1, p + 1):
-            delta += np.dot(a[i - 1], r[p + 1 - i])
+        # (as the product of [a(1) ... a(p)] and [r(p) ... r(1)]^T):
+        delta = r[:, p + 1].astype(dtype)
+        if p > 0:
+            delta += _matmul(_hstack(a[:, :p]),
+                             r[:, p:0:-1].reshape(n_batch, p * nc, nc))
+
+        # ka = delta * inv(sigb) and kb = delta^H * inv(sigf), as solutions
+        # of the transposed systems:
+        ka = _solve_right(delta, sigb)
+        kb = _solve_right(delta.conj().swapaxes(1, 2), sigf)
+
+        if p > 0:
+            # a_{p+1}(i) = a_{p}(i) - ka*b_{p}(p+1-i) for i in {1,2,...,p}
+            # b_{p+1}(i) = b_{p}(i) - kb*a_{p}(p+1-i) for i in {1,2,...,p}
+            # (both from the sequences of order p):
+            da = _matmul(ka, _hstack(b[:, p - 1::-1]))
+            b[:, :p] -= _vsplit(_matmul(kb, _hstack(a[:, p - 1::-1])))
+            a[:, :p] -= _vsplit(da)
+
+        a[:, p] = -ka
+        b[:, p] = -kb
+
+        sigf = _matmul(idnt - _matmul(ka, kb), sigf)
+        sigb = _matmul(idnt - _matmul(kb, ka), sigb)
+        sig_orders[:, p + 1] = sigf
+
+    if all_orders:
+        return a, sig_orders
+    return a, sigf
 
-        # intermediate values XXX: should turn these into solution-problems
-        ka = np.dot(delta, linalg.inv(sigb))
-        kb = np.dot(delta.conj().T, linalg.inv(sigf))
 
-        # store a_{p} before updating sequence to a_{p+1}
-        ao = a.copy()
-        # a_{p+1}(i) = a_{p}(i) - ka*b_{p}(p+1-i) for i in {1,2,...,p}
-        # b_{p+1}(i) = b_{p}(i) - kb*a_{p}(p+1-i) for i in {1,2,...,p}
-        for i in range(1, p + 1):
-            a[i - 1] -= np.dot(ka, b[p - i])
-        for i in range(1, p + 1):
-            b[i - 1] -= np.dot(kb, ao[p - i])
+def _matmul(x, y):
+    """The products of stacks of matrices, x (batch, n, k) and y (batch, k,
+    m). Small matrices are multiplied all together, and large ones with
+    BLAS, one at a time"""
+    if x.shape[1] * x.shape[2] * y.shape[2] < 1000:
+        return np.einsum('bkl,blm->bkm', x, y)
+    out = np.empty((x.shape[0], x.shape[1], y.shape[2]),
+                   np.result_type(x, y))
+    for k in range(x.shape[0]):
+        out[k] = np.dot(x[k], y[k])
+    return out
 
-        a[p] = -ka
-        b[p] = -kb
 
-        sigf = np.dot(idnt - np.dot(ka, kb), sigf)
-        sigb = np.dot(idnt - np.dot(kb, ka), sigb)
+def _hstack(a):
+    """Stack a sequence of matrices, (batch, p, n, m), side by side, into
+    (batch, n, p * m)"""
+    return a.transpose(0, 2, 1, 3).reshape(a.shape[0], a.shape[2], -1)
 
-    return a, sigf
+
+def _vsplit(a):
+    """Split side-by-side (n, n) matrices, (batch, n, p * n), into (batch, p,
+    n, n). The inverse of :func:`_hstack` for square matrices"""
+    n = a.shape[1]
+    return a.reshape(a.shape[0], n, -1, n).transpose(0, 2, 1, 3)
+
+
+def _solve_right(x, a):
+    """x * inv(a), for stacks of matrices"""
+    return np.linalg.solve(a.swapaxes(1, 2), x.swapaxes(1, 2)).swapaxes(1, 2)
 
 
 def MAR_est_LWR(x, order, rxx=None):
@@ -269,11 +319,92 @@ def MAR_est_LWR(x, order, rxx=None):
     -------
     a, ecov : The system coefficients and the estimated covariance
     """
-    Rxx = utils.autocov_vector(x, nlags=order)
-    a, ecov = lwr_recursion(Rxx.transpose(2, 0, 1))
+    if rxx is None:
+        rxx = utils.autocov_vector(x, nlags=order)
+    a, ecov = lwr_recursion(rxx[..., :order].transpose(2, 0, 1))
     return a, ecov
 
 
+def conditional_granger_causality(x, order, rxx=None, sources=None,
+                                  ecov=None):
+    r"""
+    The time-domain Granger causality between each pair of time-series in a
+    multivariate autoregressive model, conditional on all the other
+    time-series.
+
+    The causality from x[j] to x[i] is
+
+    .. math::
+
+        F_{j \rightarrow i | rest} = \ln \frac{\Sigma^{(j)}_{ii}}{\Sigma_{ii}}
+
+    where :math:`\Sigma` is the error covariance of the full model, of all the
+    time-series, and :math:`\Sigma^{(j)}` is that of the reduced model,
+    without x[j].
+
+    Parameters
+    ----------
+    x : ndarray (M, N)
+        The time-series. Not used if rxx is provided.
+
+    order : int
+        The order P of the models
+
+    rxx : ndarray (M, M, P + 1), optional
+        The autocovariance of x (see :func:`utils.autocov_vector`), if it was
+        already computed
+
+    sources : int array, optional
+        Only calculate the causality from these time-series. Defaults to all
+        of them.
+
+    ecov : ndarray (M, M), optional
+        The error covariance of the full model, if it was already fit (see
+        :func:`MAR_est_LWR`), so that it is not fit again for each call on a
+        subset of the sources
+
+    Returns
+    -------
+    gc : ndarray (M, M)
+        gc[i, j] is the causality from x[j] to x[i]. nan on the diagonal and
+        for the sources not calculated.
+
+    Notes
+    -----
+    The full model is fit with :func:`MAR_est_LWR`. The autocovariance
+    sequence of each reduced model is the partition of that of the full
+    model without the rows and columns of the excluded time-series, so the
+    reduced models are found together, from a batched LWR recursion (see
+    :func:`lwr_recursion`), without refitting the data.
+    """
+    if rxx is None:
+        rxx = utils.autocov_vector(x, nlags=order + 1)
+    M = rxx.shape[0]
+    if sources is None:
+        sources = np.arange(M)
+    sources = np.asarray(sources, dtype=int)
+
+    if ecov is None:
+        ecov = MAR_est_LWR(x, order + 1, rxx=rxx)[1]
+    r = rxx[..., :order + 1].transpose(2, 0, 1)
+
+    gc = np.empty((M, M))
+    gc.fill(np.nan)
+    # Fit blocks of reduced models at a time:
+    block_size = max(1, 2 ** 22 // (r.size or 1))
+    for start in range(0, len(sources), block_size):
+        block = sources[start:start + block_size]
+        # The time-series kept in each of the reduced models:
+        keep = np.array([np.delete(np.arange(M), j) for j in block])
+        r_reduced = r[:, keep[:, :, None], keep[:, None, :]].swapaxes(0, 1)
+        ecov_reduced = lwr_recursion(r_reduced)[1]
+        gc[keep, block[:, None]] = np.log(
+            np.diagonal(ecov_reduced, axis1=1, axis2=2) /
+            np.diag(ecov)[keep])
+
+    return gc
+
+
 def AR_psd(ak, sigma_v, n_freqs=1024, sides='onesided'):
     r"""
     Compute the PSD of an AR process, based on the process coefficients and
@@ -322,7 +453,7 @@ def transfer_function_xy(a, n_freqs=1024):
     Parameters
     ----------
 
-    a : ndarray, shape (P, 2, 2)
+    a : ndarray, shape (P, 2, 2), or (batch, P, 2, 2)
       sequence of coef matrices describing an mAR process
     n_freqs : int, optional
       number of frequencies to compute in range [0,PI]
@@ -330,32 +461,38 @@ def transfer_function_xy(a, n_freqs=1024):
     Returns
     -------
 
-    Hw : ndarray
+    Hw : ndarray (2, 2, n_freqs // 2 + 1), or (batch, 2, 2, n_freqs // 2 + 1)
       The transfer function from innovations process vector to
       mAR process X
 
     """
+    a = np.asarray(a)
+    n_w = n_freqs // 2 + 1
     # these concatenations follow from the observation that A(0) is
     # implicitly the identity matrix
-    ai = np.r_[1, a[:, 0, 0]]
-    bi = np.r_[0, a[:, 0, 1]]
-    ci = np.r_[0, a[:, 1, 0]]
-    di = np.r_[1, a[:, 1, 1]]
-
-    # compute A(w) such that A(w)X(w) = Err(w)
-    w, aw = freq_response(ai, n_freqs=n_freqs)
-    _, bw = freq_response(bi, n_freqs=n_freqs)
-    _, cw = freq_response(ci, n_freqs=n_freqs)
-    _, dw = freq_response(di, n_freqs=n_freqs)
-
-    #A = np.array([ [1-aw, -bw], [-cw, 1-dw] ])
-    A = np.array([[aw, bw], [cw, dw]])
+    a0 = np.broadcast_to(np.eye(2), a.shape[:-3] + (1, 2, 2))
+    ai = np.concatenate([a0, a], axis=-3)
+
+    # compute A(w) such that A(w)X(w) = Err(w), for w in [0, PI), on the same
+    # grid as freq_response, from an FFT of the zero-padded sequence:
+    w = np.linspace(0, np.pi, n_w, endpoint=False)
+    ai = np.rollaxis(ai, -3, ai.ndim)
+    A = np.fft.rfft(ai, n=2 * n_w, axis=-1)[..., :n_w]
+    aw = A[..., 0, 0, :]
+    bw = A[..., 0, 1, :]
+    cw = A[..., 1, 0, :]
+    dw = A[..., 1, 1, :]
+
     # compute the transfer function from Err to X. Since Err(w) is 1(w),
     # the transfer function H(w) = A^(-1)(w)
     # (use 2x2 matrix shortcut)
-    detA = (A[0, 0] * A[1, 1] - A[0, 1] * A[1, 0])
-    Hw = np.array([[dw, -bw], [-cw, aw]])
-    Hw /= detA
+    detA = aw * dw - bw * cw
+    Hw = np.empty(a.shape[:-3] + (2, 2, n_w), dtype=complex)
+    Hw[..., 0, 0, :] = dw
+    Hw[..., 0, 1, :] = -bw
+    Hw[..., 1, 0, :] = -cw
+    Hw[..., 1, 1, :] = aw
+    Hw /= detA[..., None, None, :]
     return w, Hw
 
 
@@ -373,10 +510,10 @@ def spectral_matrix_xy(Hw, cov):
     Parameters
     ----------
 
-    Hw : ndarray (2, 2, n_freqs)
+    Hw : ndarray (2, 2, n_freqs), or (batch, 2, 2, n_freqs)
       Pre-computed transfer function from transfer_function_xy()
 
-    cov : ndarray (2, 2)
+    cov : ndarray (2, 2), or (batch, 2, 2)
       The covariance between innovations processes in Err[t]
 
     Returns
@@ -385,30 +522,9 @@ def spectral_matrix_xy(Hw, cov):
     Sw : ndarrays
       matrix of spectral density functions
     """
-
-    nw = Hw.shape[-1]
     # now compute specral density function estimate
-    # S(w) = H(w)SigH*(w)
-    Sw = np.empty((2, 2, nw), 'D')
-
-    # do a shortcut for 2x2:
-    # compute T(w) = SigH*(w)
-    # t00 = Sig[0,0] * H*_00(w) + Sig[0,1] * H*_10(w)
-    t00 = cov[0, 0] * Hw[0, 0].conj() + cov[0, 1] * Hw[0, 1].conj()
-    # t01 = Sig[0,0] * H*_01(w) + Sig[0,1] * H*_11(w)
-    t01 = cov[0, 0] * Hw[1, 0].conj() + cov[0, 1] * Hw[1, 1].conj()
-    # t10 = Sig[1,0] * H*_00(w) + Sig[1,1] * H*_10(w)
-    t10 = cov[1, 0] * Hw[0, 0].conj() + cov[1, 1] * Hw[0, 1].conj()
-    # t11 = Sig[1,0] * H*_01(w) + Sig[1,1] * H*_11(w)
-    t11 = cov[1, 0] * Hw[1, 0].conj() + cov[1, 1] * Hw[1, 1].conj()
-
-    # now S(w) = H(w)T(w)
-    Sw[0, 0] = Hw[0, 0] * t00 + Hw[0, 1] * t10
-    Sw[0, 1] = Hw[0, 0] * t01 + Hw[0, 1] * t11
-    Sw[1, 0] = Hw[1, 0] * t00 + Hw[1, 1] * t10
-    Sw[1, 1] = Hw[1, 0] * t01 + Hw[1, 1] * t11
-
-    return Sw
+    # S(w) = H(w)SigH*(w), for all the frequencies (and systems) at once:
+    return np.einsum('...ikw,...kl,...jlw->...ijw', Hw, cov, Hw.conj())
 
 
 def coherence_from_spectral(Sw):
@@ -422,10 +538,10 @@ def coherence_from_spectral(Sw):
       spectral matrix
     """
 
-    Sxx = Sw[0, 0].real
-    Syy = Sw[1, 1].real
+    Sxx = Sw[..., 0, 0, :].real
+    Syy = Sw[..., 1, 1, :].real
 
-    Sxy_mod_sq = (Sw[0, 1] * Sw[1, 0]).real
+    Sxy_mod_sq = (Sw[..., 0, 1, :] * Sw[..., 1, 0, :]).real
     Sxy_mod_sq /= Sxx
     Sxy_mod_sq /= Syy
     return Sxy_mod_sq
@@ -462,9 +578,9 @@ def granger_causality_xy(a, cov, n_freqs=1024):
     Parameters
     ----------
 
-    a : ndarray, (P,2,2)
+    a : ndarray, (P,2,2), or (batch, P, 2, 2)
       coefficient matrices characterizing the autoregressive mixing
-    cov : ndarray, (2,2)
+    cov : ndarray, (2,2), or (batch, 2, 2)
       covariance matrix characterizing the innovations vector
     n_freqs: int
       number of frequencies to compute in the fourier transform
@@ -478,20 +594,25 @@ def granger_causality_xy(a, cov, n_freqs=1024):
       3) function of the Granger causality of Y on X
       4) function of the 'instantaneous causality' between X and Y
       5) spectral density matrix
+
+    For a batch of systems, each of the functions has the batch as its first
+    dimension.
     """
 
     w, Hw = transfer_function_xy(a, n_freqs=n_freqs)
 
-    sigma = cov[0, 0]
-    upsilon = cov[0, 1]
-    gamma = cov[1, 1]
+    # The covariances are broadcast against the frequencies:
+    cov = np.asarray(cov)[..., None]
+    sigma = cov[..., 0, 0, :]
+    upsilon = cov[..., 0, 1, :]
+    gamma = cov[..., 1, 1, :]
 
     # this transformation of the transfer functions computes the
     # Granger causality of Y on X
     gamma2 = gamma - upsilon ** 2 / sigma
 
-    Hxy = Hw[0, 1]
-    Hxx_hat = Hw[0, 0] + (upsilon / sigma) * Hxy
+    Hxy = Hw[..., 0, 1, :]
+    Hxx_hat = Hw[..., 0, 0, :] + (upsilon / sigma) * Hxy
 
     xx_auto_component = (sigma * Hxx_hat * Hxx_hat.conj()).real
     cross_component = gamma2 * Hxy * Hxy.conj()
@@ -501,17 +622,16 @@ def granger_causality_xy(a, cov, n_freqs=1024):
     # this transformation computes the Granger causality of X on Y
     sigma2 = sigma - upsilon ** 2 / gamma
 
-    Hyx = Hw[1, 0]
-    Hyy_hat = Hw[1, 1] + (upsilon / gamma) * Hyx
+    Hyx = Hw[..., 1, 0, :]
+    Hyy_hat = Hw[..., 1, 1, :] + (upsilon / gamma) * Hyx
     yy_auto_component = (gamma * Hyy_hat * Hyy_hat.conj()).real
     cross_component = sigma2 * Hyx * Hyx.conj()
     Syy = yy_auto_component + cross_component
     f_x_on_y = np.log(Syy.real / yy_auto_component)
 
     # now compute cross densities, using the latest transformation
-    Hxx = Hw[0, 0]
-    Hyx = Hw[1, 0]
-    Hxy_hat = Hw[0, 1] + (upsilon / gamma) * Hxx
+    Hxx = Hw[..., 0, 0, :]
+    Hxy_hat = Hw[..., 0, 1, :] + (upsilon / gamma) * Hxx
     Sxy = sigma2 * Hxx * Hyx.conj() + gamma * Hxy_hat * Hyy_hat.conj()
     Syx = sigma2 * Hyx * Hxx.conj() + gamma * Hyy_hat * Hxy_hat.conj()
 
@@ -522,4 +642,10 @@ def granger_causality_xy(a, cov, n_freqs=1024):
     f_xy /= detS
     f_xy = np.log(f_xy)
 
-    return w, f_x_on_y, f_y_on_x, f_xy, np.array([[Sxx, Sxy], [Syx, Syy]])
+    Sw = np.empty(Hw.shape, dtype=complex)
+    Sw[..., 0, 0, :] = Sxx
+    Sw[..., 0, 1, :] = Sxy
+    Sw[..., 1, 0, :] = Syx
+    Sw[..., 1, 1, :] = Syy
+
+    return w, f_x_on_y, f_y_on_x, f_xy, Sw
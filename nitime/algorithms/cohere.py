@@ -14,18 +14,22 @@ XXX
 
 """
 
+import hashlib
+import os
+
 import numpy as np
 from nitime.lazy import scipy_fftpack as fftpack
 from nitime.lazy import matplotlib_mlab as mlab
+from nitime.lazy import scipy_sparse
 
-from .spectral import get_spectra, get_spectra_bi
+from .spectral import get_spectra, _welch_segments
 import nitime.utils as utils
 
 # To suppport older versions of numpy that don't have tril_indices:
-from nitime.index_utils import tril_indices
+from nitime.index_utils import tril_indices, triu_indices
 
 
-def coherency(time_series, csd_method=None):
+def coherency(time_series, csd_method=None, condensed=False):
     r"""
     Compute the coherency between the spectra of n-tuple of time series.
     Input to this function is in the time domain
@@ -39,6 +43,10 @@ def coherency(time_series, csd_method=None):
     csd_method : dict, optional.
        See :func:`get_spectra` documentation for details
 
+    condensed : bool, optional
+       Return c as a :class:`utils.CondensedMatrix`, holding only the upper
+       triangle of the matrix (default: False)
+
     Returns
     -------
 
@@ -69,22 +77,8 @@ def coherency(time_series, csd_method=None):
     if csd_method is None:
         csd_method = {'this_method': 'welch'}  # The default
 
-    f, fxy = get_spectra(time_series, csd_method)
-
-    #A container for the coherencys, with the size and shape of the expected
-    #output:
-    c = np.zeros((time_series.shape[0],
-                  time_series.shape[0],
-                  f.shape[0]), dtype=complex)  # Make sure it's complex
-
-    for i in range(time_series.shape[0]):
-        for j in range(i, time_series.shape[0]):
-            c[i][j] = coherency_spec(fxy[i][j], fxy[i][i], fxy[j][j])
-
-    idx = tril_indices(time_series.shape[0], -1)
-    c[idx[0], idx[1], ...] = c[idx[1], idx[0], ...].conj()  # Make it symmetric
-
-    return f, c
+    return _pairwise_spec(time_series, csd_method, coherency_spec, complex,
+                          condensed)
 
 
 def coherency_spec(fxy, fxx, fyy):
@@ -116,7 +110,60 @@ def coherency_spec(fxy, fxx, fyy):
     return fxy / np.sqrt(fxx * fyy)
 
 
-def coherence(time_series, csd_method=None):
+def _pairwise_spec(time_series, csd_method, func, dtype, condensed, *args):
+    """
+    Apply func(fxy, fxx, fyy, *args) to the spectra of all the pairs of rows
+    of time_series (see :func:`pairwise_spec`), returning f and either the
+    full Hermitian matrix of results or its :class:`utils.CondensedMatrix`
+    """
+    f, fxy = get_spectra(time_series, csd_method, condensed=True)
+    c = pairwise_spec(fxy, func, args=args, dtype=dtype)
+    if condensed:
+        return f, c
+    return f, c.toarray()
+
+
+def pairwise_spec(fxy, func, args=(), dtype=complex):
+    """
+    Apply a pairwise frequency-domain measure to all the pairs of a matrix
+    of spectra.
+
+    Parameters
+    ----------
+
+    fxy : :class:`utils.CondensedMatrix` or array (M, M, n_freqs)
+        The spectra (on the diagonal) and cross-spectra of M time series
+
+    func : callable
+        Called as func(fxy, fxx, fyy, *args), for example
+        :func:`coherency_spec`. Is given a row of pairs (i, j >= i) at a time.
+
+    args : tuple, optional
+        Additional arguments to func
+
+    dtype : dtype, optional
+        The type of the values returned by func
+
+    Returns
+    -------
+
+    c : :class:`utils.CondensedMatrix`
+        The values of func for all the pairs (i, j), i <= j
+    """
+    if not isinstance(fxy, utils.CondensedMatrix):
+        fxy = utils.CondensedMatrix.from_dense(fxy)
+    M = fxy.M
+    psd = fxy.diagonal()
+    c = np.empty(fxy.data.shape, dtype)
+    start = 0
+    for i in range(M):
+        sl = slice(start, start + M - i)
+        c[sl] = func(fxy.data[sl], psd[i], psd[i:], *args)
+        start += M - i
+    return utils.CondensedMatrix(c, M)
+
+
+def coherence(time_series, csd_method=None, condensed=False):
     r"""Compute the coherence between the spectra of an n-tuple of time_series.
 
     Parameters of this function are in the time domain.
@@ -129,6 +176,10 @@ def coherence(time_series, csd_method=None):
     csd_method : dict, optional
        See :func:`algorithms.spectral.get_spectra` documentation for details
 
+    condensed : bool, optional
+       Return c as a :class:`utils.CondensedMatrix`, holding only the upper
+       triangle of the matrix (default: False)
+
     Returns
     -------
     f : float array
@@ -157,22 +208,8 @@ def coherence(time_series, csd_method=None):
     if csd_method is None:
         csd_method = {'this_method': 'welch'}  # The default
 
-    f, fxy = get_spectra(time_series, csd_method)
-
-    # A container for the coherences, with the size and shape of the expected
-    # output:
-    c = np.zeros((time_series.shape[0],
-                  time_series.shape[0],
-                  f.shape[0]))
-
-    for i in range(time_series.shape[0]):
-        for j in range(i, time_series.shape[0]):
-            c[i][j] = coherence_spec(fxy[i][j], fxy[i][i], fxy[j][j])
-
-    idx = tril_indices(time_series.shape[0], -1)
-    c[idx[0], idx[1], ...] = c[idx[1], idx[0], ...].conj()  # Make it symmetric
-
-    return f, c
+    return _pairwise_spec(time_series, csd_method, coherence_spec, float,
+                          condensed)
 
 
 def coherence_spec(fxy, fxx, fyy):
@@ -208,7 +245,8 @@ def coherence_spec(fxy, fxx, fyy):
     return c
 
 
-def coherency_regularized(time_series, epsilon, alpha, csd_method=None):
+def coherency_regularized(time_series, epsilon, alpha, csd_method=None,
+                          condensed=False):
     r"""
     Compute a regularized measure of the coherence.
 
@@ -233,6 +271,10 @@ def coherency_regularized(time_series, epsilon, alpha, csd_method=None):
     csd_method: dict, optional.
         See :func:`get_spectra` documentation for details
 
+    condensed : bool, optional
+       Return c as a :class:`utils.CondensedMatrix`, holding only the upper
+       triangle of the matrix (default: False)
+
     Returns
     -------
     f: float array
@@ -259,23 +301,8 @@ def coherency_regularized(time_series, epsilon, alpha, csd_method=None):
     if csd_method is None:
         csd_method = {'this_method': 'welch'}  # The default
 
-    f, fxy = get_spectra(time_series, csd_method)
-
-    # A container for the coherences, with the size and shape of the expected
-    # output:
-    c = np.zeros((time_series.shape[0],
-                  time_series.shape[0],
-                  f.shape[0]), dtype=complex)  # Make sure it's complex
-
-    for i in range(time_series.shape[0]):
-        for j in range(i, time_series.shape[0]):
-            c[i][j] = _coherency_reqularized(fxy[i][j], fxy[i][i],
-                                             fxy[j][j], epsilon, alpha)
-
-    idx = tril_indices(time_series.shape[0], -1)
-    c[idx[0], idx[1], ...] = c[idx[1], idx[0], ...].conj()  # Make it symmetric
-
-    return f, c
+    return _pairwise_spec(time_series, csd_method, _coherency_reqularized,
+                          complex, condensed, epsilon, alpha)
 
 
 def _coherency_reqularized(fxy, fxx, fyy, epsilon, alpha):
@@ -312,7 +339,8 @@ def _coherency_reqularized(fxy, fxx, fyy, epsilon, alpha):
          np.sqrt(((alpha ** 2) * (fxx + epsilon) * (fyy + epsilon))))
 
 
-def coherence_regularized(time_series, epsilon, alpha, csd_method=None):
+def coherence_regularized(time_series, epsilon, alpha, csd_method=None,
+                          condensed=False):
     r"""
     Same as coherence, except regularized in order to overcome numerical
     imprecisions
@@ -335,6 +363,10 @@ def coherence_regularized(time_series, epsilon, alpha, csd_method=None):
     csd_method: dict, optional.
        See :func:`get_spectra` documentation for details
 
+    condensed : bool, optional
+       Return c as a :class:`utils.CondensedMatrix`, holding only the upper
+       triangle of the matrix (default: False)
+
     Returns
     -------
     f: float array
@@ -362,23 +394,8 @@ def coherence_regularized(time_series, epsilon, alpha, csd_method=None):
     if csd_method is None:
         csd_method = {'this_method': 'welch'}  # The default
 
-    f, fxy = get_spectra(time_series, csd_method)
-
-    #A container for the coherences, with the size and shape of the expected
-    #output:
-    c = np.zeros((time_series.shape[0],
-                  time_series.shape[0],
-                  f.shape[0]), complex)
-
-    for i in range(time_series.shape[0]):
-        for j in range(i, time_series.shape[0]):
-            c[i][j] = _coherence_reqularized(fxy[i][j], fxy[i][i],
-                                             fxy[j][j], epsilon, alpha)
-
-    idx = tril_indices(time_series.shape[0], -1)
-    c[idx[0], idx[1], ...] = c[idx[1], idx[0], ...].conj()  # Make it symmetric
-
-    return f, c
+    return _pairwise_spec(time_series, csd_method, _coherence_reqularized,
+                          complex, condensed, epsilon, alpha)
 
 
 def _coherence_reqularized(fxy, fxx, fyy, epsilon, alpha):
@@ -604,6 +621,128 @@ def _coherence_bavg(fxy, fxx, fyy):
     return (np.abs(fxy.sum()) ** 2) / (fxx.sum() * fyy.sum())
 
 
+def coherence_bands(time_series, bands, ij=None, csd_method=None,
+                    measure='coherence'):
+    r"""
+    Compute band-averaged coherence summaries for several frequency bands at
+    once.
+
+    Input to this function is in the time domain.
+
+    Parameters
+    ----------
+    time_series : float array
+       An array of time series, time as the last dimension.
+
+    bands : list of (lb, ub) tuples
+       The lower and upper bounds of each of the frequency bands (ub can be
+       None, for the maximal frequency). As in :func:`coherence_bavg`, a band
+       with lb of 0 starts at f0, excluding the DC component.
+
+    ij : list of (i, j) tuples, optional
+       The pairs of time-series to compare. Defaults to all the pairs i < j,
+       in the order of triu_indices(n, 1).
+
+    csd_method : dict, optional.
+       See :func:`get_spectra` documentation for details
+
+    measure : str, optional
+       What to calculate for each band: 'coherence' (the default, as in
+       :func:`coherence_bavg`), 'coherency' (as in :func:`coherency_bavg`)
+       or 'phase' (the band-averaged phase of the cross-spectrum, which is
+       also the phase of the band-averaged coherency).
+
+    Returns
+    -------
+    c : array (n_pairs, n_bands)
+       The band-averaged measure for each pair and each band
+
+    Notes
+    -----
+    The spectra are estimated only once. Each band average is then looked up
+    from cumulative sums over the frequencies, so extra bands are nearly
+    free. See :func:`coherence_bands_spec`.
+    """
+    if csd_method is None:
+        csd_method = {'this_method': 'welch'}  # The default
+
+    if ij is None:
+        i, j = triu_indices(time_series.shape[0], 1)
+    else:
+        i, j = np.asarray(ij, dtype=int).reshape(-1, 2).T
+
+    f, fxy = get_spectra(time_series, csd_method, condensed=True)
+    fxx = fxy.diagonal()
+
+    return coherence_bands_spec(f, fxy[i, j], fxx[i], fxx[j], bands,
+                                measure=measure)
+
+
+def coherence_bands_spec(f, fxy, fxx, fyy, bands, measure='coherence'):
+    r"""
+    Compute band-averaged coherence summaries for several frequency bands at
+    once. See :func:`coherence_bands`.
+
+    Input to this function is in the frequency domain.
+
+    Parameters
+    ----------
+    f : float array
+        The frequencies of the spectra
+
+    fxy : complex array (..., n_freqs)
+        The cross-spectra of the time series
+
+    fxx, fyy : float arrays (..., n_freqs)
+        The spectra of the signals
+
+    bands : list of (lb, ub) tuples
+        The frequency bands
+
+    measure : str, optional
+        'coherence', 'coherency' or 'phase'
+
+    Returns
+    -------
+    c : array (..., n_bands)
+        The band-averaged measure, for each of the bands
+    """
+    bounds = np.array([utils.get_bounds(f, lb, ub) for lb, ub in bands],
+                      dtype=int).reshape(-1, 2)
+    # The lowest frequency band should be f0:
+    lb_zero = np.array([lb == 0 for lb, ub in bands], dtype=bool)
+    bounds[lb_zero, 0] = np.maximum(bounds[lb_zero, 0], 1)
+    if np.any(bounds[:, 1] <= bounds[:, 0]):
+        e_s = "Each of the frequency bands must contain at least one "
+        e_s += "frequency"
+        raise ValueError(e_s)
+
+    def band_sums(x):
+        # Sums over [lb_idx, ub_idx) are differences of the cumulative sum:
+        csum = np.zeros(x.shape[:-1] + (x.shape[-1] + 1,), dtype=x.dtype)
+        np.cumsum(x, -1, out=csum[..., 1:])
+        return csum[..., bounds[:, 1]] - csum[..., bounds[:, 0]]
+
+    fxx = np.real(fxx)
+    fyy = np.real(fyy)
+    if measure == 'coherence':
+        return (np.abs(band_sums(fxy)) ** 2 /
+                (band_sums(fxx) * band_sums(fyy)))
+
+    n_freqs = bounds[:, 1] - bounds[:, 0]
+    # Average the phases and the magnitudes separately:
+    p_bavg = band_sums(np.angle(fxy)) / n_freqs
+    if measure == 'phase':
+        return p_bavg
+    elif measure == 'coherency':
+        m_bavg = band_sums(np.abs(coherency_spec(fxy, fxx, fyy))) / n_freqs
+        # Recombine according to z = r(cos(phi)+sin(phi)i):
+        return m_bavg * (np.cos(p_bavg) + np.sin(p_bavg) * 1j)
+
+    e_s = "measure must be one of 'coherence', 'coherency' or 'phase'"
+    raise ValueError(e_s)
+
+
 def coherence_partial(time_series, r, csd_method=None):
     r"""
     Compute the band-specific partial coherence between the spectra of
@@ -657,22 +796,13 @@ def coherence_partial(time_series, r, csd_method=None):
     if csd_method is None:
         csd_method = {'this_method': 'welch'}  # The default
 
-    f, fxy = get_spectra(time_series, csd_method)
-
-    # Initialize c according to the size of f:
-    c = np.zeros((time_series.shape[0],
-                  time_series.shape[0],
-                  f.shape[0]), dtype=complex)
-
-    for i in range(time_series.shape[0]):
-        for j in range(i, time_series.shape[0]):
-            f, fxx, frr, frx = get_spectra_bi(time_series[i], r, csd_method)
-            f, fyy, frr, fry = get_spectra_bi(time_series[j], r, csd_method)
-            c[i, j] = coherence_partial_spec(fxy[i][j], fxy[i][i],
-                                                  fxy[j][j], frx, fry, frr)
+    n = time_series.shape[0]
+    # The spectra of all the time-series and of r, estimated once. r is the
+    # last channel:
+    f, fxy = get_spectra(np.vstack([time_series, r]), csd_method)
 
-    idx = tril_indices(time_series.shape[0], -1)
-    c[idx[0], idx[1], ...] = c[idx[1], idx[0], ...].conj()  # Make it symmetric
+    c = np.zeros((n, n, f.shape[0]), dtype=complex)
+    c[:] = _coherence_partial(_coherency_matrix(fxy), [n])[:n, :n, 0]
 
     return f, c
 
@@ -709,7 +839,112 @@ def coherence_partial_spec(fxy, fxx, fyy, fxr, fry, frr):
            ((1 - ((np.abs(Rxr)) ** 2)) * (1 - ((np.abs(Rry)) ** 2))))
 
 
-def coherency_phase_spectrum(time_series, csd_method=None):
+def _coherency_matrix(fxy):
+    """The coherency between all the pairs in a (n, n, n_freqs) spectral
+    matrix"""
+    fxx = np.real(fxy[np.arange(fxy.shape[0]), np.arange(fxy.shape[0])])
+    norm = np.sqrt(fxx)
+    return fxy / (norm[:, None] * norm[None])
+
+
+def _coherence_partial(R, conditions):
+    """The partial coherence between all the pairs of channels, given each
+    one of the conditions, from the coherency matrix R (n, n, n_freqs).
+
+    Returns a (n, n, len(conditions), n_freqs) array, which is 0 for a
+    condition equal to one of the channels of the pair.
+    """
+    n = R.shape[0]
+    c = np.zeros((n, n, len(conditions), R.shape[-1]))
+    R2 = np.abs(R) ** 2
+    for idx, k in enumerate(conditions):
+        # The coherency of x and y, after removing the part of each that is
+        # linearly predictable from k:
+        Rxy_k = R - R[:, k][:, None] * R[k][None]
+        residual = 1 - R2[:, k]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c[:, :, idx] = (np.abs(Rxy_k) ** 2 /
+                            (residual[:, None] * residual[None]))
+        c[k, :, idx] = 0
+        c[:, k, idx] = 0
+    return c
+
+
+def coherence_partial_matrix(fxy):
+    r"""
+    Compute the partial coherence between every pair of channels, given each
+    one of the other channels, from their spectral matrix.
+
+    Input to this function is in the frequency domain.
+
+    Parameters
+    ----------
+    fxy : complex array (n, n, n_freqs)
+        The spectra and cross-spectra of n channels (for example, as returned
+        by :func:`get_spectra`)
+
+    Returns
+    -------
+    c : float array (n, n, n, n_freqs)
+        c[i, j, k] is the partial coherence between channels i and j, with
+        channel k partialed out (see :func:`coherence_partial`). It is 0 when
+        k is either i or j.
+
+    Notes
+    -----
+    The calculation is done on the whole coherency matrix, with one
+    vectorized operation for each conditioning channel.
+    """
+    fxy = np.asarray(fxy)
+    return _coherence_partial(_coherency_matrix(fxy), range(fxy.shape[0]))
+
+
+def coherence_partial_full(fxy):
+    r"""
+    Compute the partial coherence between every pair of channels, given all
+    the other channels, from their spectral matrix.
+
+    Input to this function is in the frequency domain.
+
+    Parameters
+    ----------
+    fxy : complex array (n, n, n_freqs)
+        The spectra and cross-spectra of n channels (for example, as returned
+        by :func:`get_spectra`)
+
+    Returns
+    -------
+    c : float array (n, n, n_freqs)
+        c[i, j] is the partial coherence between channels i and j, with all
+        the other channels partialed out. The diagonal is 1.
+
+    Notes
+    -----
+    This is calculated from the inverse of the spectral matrix at each
+    frequency, G = fxy^{-1}, as:
+
+    .. math::
+
+        Coh_{ij|rest} = \frac{|G_{ij}|^2}{G_{ii} G_{jj}}
+
+    which requires the spectral matrix to be invertible at every frequency
+    (for example, more independent windows/tapers than channels).
+    """
+    fxy = np.asarray(fxy)
+    # Invert all the frequencies at once:
+    try:
+        G = np.linalg.inv(np.rollaxis(fxy, -1))
+    except np.linalg.LinAlgError:
+        e_s = "The spectral matrix is singular, so the partial coherence "
+        e_s += "given all other channels is not defined"
+        raise ValueError(e_s)
+    G = np.rollaxis(G, 0, 3)
+    Gxx = np.real(G[np.arange(G.shape[0]), np.arange(G.shape[0])])
+
+    return np.abs(G) ** 2 / (Gxx[:, None] * Gxx[None])
+
+
+def coherency_phase_spectrum(time_series, csd_method=None, ij=None):
     r"""
     Compute the phase spectrum of the cross-spectrum between two time series.
 
@@ -721,6 +956,13 @@ def coherency_phase_spectrum(time_series, csd_method=None):
     time_series: n*t float array
     The time series, with t, time, as the last dimension
 
+    csd_method : dict, optional.
+       See :func:`get_spectra`
+
+    ij : int array (n_pairs, 2), optional
+       The pairs of time-series (i, j) for which to calculate the phase
+       spectrum. Defaults to all the pairs.
+
     Returns
     -------
 
@@ -728,7 +970,8 @@ def coherency_phase_spectrum(time_series, csd_method=None):
 
     p: an array with the pairwise phase spectrum between the time
     series, where p[i][j] is the phase spectrum between time series[i] and
-    time_series[j]
+    time_series[j]. If ij is provided, p is shaped (n_pairs, n_freqs), with
+    p[k] the phase spectrum between the time-series in ij[k]
 
     Notes
     -----
@@ -743,24 +986,13 @@ def coherency_phase_spectrum(time_series, csd_method=None):
     dynamics of functional networks using phase spectrum of fMRI data.
     Neuroimage, 28: 227-37.
     """
-    if csd_method is None:
-        csd_method = {'this_method': 'welch'}  # The default
+    f, fxy = _pair_spectra(time_series, csd_method, ij)
 
-    f, fxy = get_spectra(time_series, csd_method)
+    return f, _pair_phase(fxy, ij)
 
-    p = np.zeros((time_series.shape[0],
-                  time_series.shape[0],
-                  f.shape[0]))
-
-    for i in range(time_series.shape[0]):
-        for j in range(i + 1, time_series.shape[0]):
-            p[i][j] = np.angle(fxy[i][j])
-            p[j][i] = np.angle(fxy[i][j].conjugate())
 
-    return f, p
-
-
-def coherency_phase_delay(time_series, lb=0, ub=None, csd_method=None):
+def coherency_phase_delay(time_series, lb=0, ub=None, csd_method=None,
+                          ij=None):
     """
     The temporal delay calculated from the coherency phase spectrum.
 
@@ -777,38 +1009,59 @@ def coherency_phase_delay(time_series, lb=0, ub=None, csd_method=None):
     csd_method : dict, optional.
        See :func:`get_spectra`
 
+    ij : int array (n_pairs, 2), optional
+       The pairs of time-series (i, j) for which to calculate the delay.
+       Defaults to all the pairs.
+
     Returns
     -------
     f : float array
        The mid-frequencies for the frequency bands over which the calculation
        is done.
     p : float array
-       Pairwise temporal delays between time-series (in seconds).
+       Pairwise temporal delays between time-series (in seconds), shaped (M,
+       M, n_freqs), or (n_pairs, n_freqs) if ij is provided.
 
     """
-    if csd_method is None:
-        csd_method = {'this_method': 'welch'}  # The default
-
-    f, fxy = get_spectra(time_series, csd_method)
+    f, fxy = _pair_spectra(time_series, csd_method, ij)
 
     lb_idx, ub_idx = utils.get_bounds(f, lb, ub)
 
     if lb_idx == 0:
         lb_idx = 1
 
-    p = np.zeros((time_series.shape[0], time_series.shape[0],
-                  f[lb_idx:ub_idx].shape[-1]))
-
-    for i in range(time_series.shape[0]):
-        for j in range(i, time_series.shape[0]):
-            p[i][j] = _coherency_phase_delay(f[lb_idx:ub_idx],
-                                             fxy[i][j][lb_idx:ub_idx])
-            p[j][i] = _coherency_phase_delay(f[lb_idx:ub_idx],
-                                    fxy[i][j][lb_idx:ub_idx].conjugate())
+    p = _pair_phase(fxy[..., lb_idx:ub_idx], ij)
+    p /= 2 * np.pi * f[lb_idx:ub_idx]
 
     return f[lb_idx:ub_idx], p
 
 
+def _pair_spectra(time_series, csd_method, ij):
+    """The frequencies and the cross-spectra of the pairs in ij, shaped
+    (n_pairs, n_freqs), or of all the pairs, shaped (M, M, n_freqs), if ij is
+    None"""
+    if csd_method is None:
+        csd_method = {'this_method': 'welch'}  # The default
+
+    if ij is None:
+        return get_spectra(time_series, csd_method)
+
+    f, fxy = get_spectra(time_series, csd_method, condensed=True)
+    ij = _cache_ij(ij)
+    return f, fxy[ij[:, 0], ij[:, 1]]
+
+
+def _pair_phase(fxy, ij=None):
+    """The phase of the cross-spectra from :func:`_pair_spectra`. For all the
+    pairs, p[j, i] is -p[i, j] and the diagonal is 0"""
+    p = np.angle(fxy)
+    if ij is None:
+        i, j = triu_indices(p.shape[0], 1)
+        p[j, i] = -p[i, j]
+        p[np.arange(p.shape[0]), np.arange(p.shape[0])] = 0
+    return p
+
+
 def _coherency_phase_delay(f, fxy):
     r"""
     Compute the phase delay between the spectra of two signals. The input to
@@ -901,9 +1154,146 @@ coherency_spec and organized in a data structure similar to the one
 created by coherence"""
 
 
+def _cache_ij(ij):
+    """The (i,j) combinations as an (n_pairs, 2) integer array"""
+    return np.asarray(ij, dtype=int).reshape(-1, 2)
+
+
+def _cache_rows(cache, channels):
+    """The rows of cache['FFT_slices'] holding the requested channels"""
+    cached = cache['channels']
+    rows = np.searchsorted(cached, channels)
+    rows[rows == len(cached)] = 0
+    if np.any(cached[rows] != channels):
+        e_s = "The cache does not contain all the channels in ij"
+        raise ValueError(e_s)
+    return rows
+
+
+def _chunks(n, item_size, max_size=2 ** 22):
+    """Slices over n items, each holding at most max_size array elements
+    (but at least one item) of item_size elements each"""
+    step = max(1, max_size // max(1, item_size))
+    return [slice(start, start + step) for start in range(0, n, step)]
+
+
+def _fft_slices(time_series, channels, NFFT, n_overlap, window_vals,
+                transform, out):
+    """Put the windowed transform of every NFFT long segment of the channels
+    of time_series into out (n_channels, n_slices, n_freqs)
+
+    The segments are a strided view of the data, which gets windowed and
+    transformed a block of channels at a time (bounding the size of the
+    temporaries). No detrending is done. transform is a function from
+    :func:`_band_transform`.
+    """
+    for block in _chunks(len(channels), out.shape[1] * NFFT):
+        segments = _welch_segments(time_series[channels[block]], NFFT,
+                                   n_overlap)
+        out[block] = transform(window_vals * segments)
+
+
+def _band_transform(NFFT, pad_to, lb_idx, ub_idx, transform='auto'):
+    """A function calculating the pad_to-point DFT of (zero-padded) NFFT long
+    segments (the last dimension of its input), only at the bins [lb_idx,
+    ub_idx), and the name of the transform used for that.
+
+    transform is one of:
+
+    'fft' : The full FFT, from which the band is sliced out.
+
+    'dft' : A matrix product with the DFT coefficients of each bin (which
+    evaluates the same sums as Goertzel's recurrence, bin by bin). Cheapest
+    for a few bins.
+
+    'czt' : The chirp-z transform of the band (Bluestein's algorithm), with
+    two FFTs of a little more than NFFT + n_bins points. Cheapest for many
+    bins on a grid much finer than NFFT (pad_to >> NFFT).
+
+    'auto' : The cheapest of these, according to a cost model.
+    """
+    n_bins = ub_idx - lb_idx
+    # The length of the convolution in the chirp-z transform:
+    n_czt = fftpack.next_fast_len(NFFT + n_bins - 1)
+    if transform == 'auto':
+        # Roughly calibrated run-times (fftpack and BLAS, per segment):
+        costs = {'fft': 1.5 * pad_to * np.log2(pad_to),
+                 'dft': 0.4 * NFFT * n_bins,
+                 'czt': 3 * n_czt * np.log2(n_czt) + 4 * n_czt}
+        transform = min(costs, key=costs.get)
+
+    n = np.arange(NFFT)
+    bins = np.arange(lb_idx, ub_idx)
+
+    if transform == 'fft':
+        def band_transform(x):
+            return fftpack.fft(x, n=pad_to, axis=-1)[..., lb_idx:ub_idx]
+
+    elif transform == 'dft':
+        # The phases are reduced modulo pad_to as integers, for precision:
+        W = np.exp(-2j * np.pi * (np.outer(n, bins) % pad_to) / pad_to)
+        W_real = np.ascontiguousarray(W.real)
+        W_imag = np.ascontiguousarray(W.imag)
+
+        def band_transform(x):
+            x2d = x.reshape(-1, NFFT)
+            if np.iscomplexobj(x2d):
+                X = np.dot(x2d, W)
+            else:
+                X = np.empty((x2d.shape[0], n_bins), dtype=complex)
+                X.real = np.dot(x2d, W_real)
+                X.imag = np.dot(x2d, W_imag)
+            return X.reshape(x.shape[:-1] + (n_bins,))
+
+    elif transform == 'czt':
+        # With n * b = (n ** 2 + b ** 2 - (b - n) ** 2) / 2, the DFT at bins
+        # lb_idx + b becomes a convolution with the chirp c(m) = exp(-i pi m **
+        # 2 / pad_to), pre- and post-multiplied by chirps:
+        def chirp(m):
+            return np.exp(-1j * np.pi * ((m * m) % (2 * pad_to)) / pad_to)
+
+        pre = chirp(n) * np.exp(-2j * np.pi * ((lb_idx * n) % pad_to) /
+                                pad_to)
+        post = chirp(np.arange(n_bins))
+        h = np.zeros(n_czt, dtype=complex)
+        h[:n_bins] = chirp(np.arange(n_bins)).conj()
+        h[n_czt - NFFT + 1:] = chirp(np.arange(-NFFT + 1, 0)).conj()
+        H = fftpack.fft(h)
+
+        def band_transform(x):
+            y = fftpack.fft(x * pre, n=n_czt, axis=-1)
+            y *= H
+            return fftpack.ifft(y, axis=-1)[..., :n_bins] * post
+
+    else:
+        e_s = "transform must be one of 'auto', 'fft', 'dft' or 'czt'"
+        raise ValueError(e_s)
+
+    return band_transform, transform
+
+
+def _fft_store_file(store, time_series, NFFT, n_overlap, Fs, window_vals,
+                    pad_to, store_key=None):
+    """The file in the store directory holding the FFT slices of this data,
+    keyed by a hash of the data (or by store_key) and of the spectral
+    estimation parameters"""
+    window_vals = np.ascontiguousarray(window_vals)
+    key = hashlib.sha1()
+    key.update(repr((time_series.shape, time_series.dtype.str,
+                     window_vals.dtype.str, int(NFFT), int(n_overlap),
+                     float(Fs), int(pad_to))).encode())
+    if store_key is None:
+        key.update(np.ascontiguousarray(time_series))
+    else:
+        key.update(repr(store_key).encode())
+    key.update(window_vals)
+    return os.path.join(store, 'fft_slices_%s.npy' % key.hexdigest())
+
+
 def cache_fft(time_series, ij, lb=0, ub=None,
                   method=None, prefer_speed_over_memory=False,
-                  scale_by_freq=True):
+                  scale_by_freq=True, store=None, pad_to=None,
+                  transform='auto', store_key=None):
     """compute and cache the windowed FFTs of the time_series, in such a way
     that computing the psd and csd of any combination of them can be done
     quickly.
@@ -927,14 +1317,53 @@ def cache_fft(time_series, ij, lb=0, ub=None,
         See :func:`get_spectra` for details on how this is used. For this set
         of functions, 'this_method' has to be 'welch'
 
+    prefer_speed_over_memory: bool, optional
+        Has no effect. Kept for backwards compatibility (conjugates of the
+        FFT slices are no longer cached).
+
+    store: str, optional
+        A directory in which to keep the FFT slices on disk, for reuse across
+        analyses of the same data. The slices of all the channels and all
+        the frequencies are computed once for each combination of data, NFFT,
+        n_overlap, Fs and window, and saved into a .npy file. This file is
+        then memory-mapped (read-only), so that the returned cache holds all
+        the channels, restricted to the band set by lb and ub, and the
+        cache_to_* functions only read from disk what they use. Finding the
+        file hashes all of the data, which is a full pass over it on every
+        call, even when its slices are already stored (see store_key).
+
+    pad_to: int, optional
+        The number of points of the DFT of each (zero-padded) segment,
+        defaulting to NFFT. A larger value gives a finer frequency grid,
+        without changing the segments. Only the bins in the band set by lb
+        and ub are evaluated.
+
+    transform: str, optional
+        How to evaluate the bins in the band: 'fft' (a full FFT, from which
+        the band is sliced out), 'dft' (a DFT of each of the bins, the
+        cheapest for a narrow band), 'czt' (a chirp-z transform of the band,
+        the cheapest for a wide band on a fine grid) or 'auto' (the default),
+        which picks the cheapest of these. With a store, the full range of
+        frequencies is always computed.
+
+    store_key: str, optional
+        A name for the data in the store (such as that of the recording),
+        used instead of a hash of the data to find its file. The data is then
+        not read at all when its slices are already stored. It is up to the
+        caller to use a different name for different data (of the same
+        shape).
 
     Returns
     -------
     freqs, cache
 
         where: cache =
-             {'FFT_slices':FFT_slices,'FFT_conj_slices':FFT_conj_slices,
-             'norm_val':norm_val}
+             {'FFT_slices':FFT_slices, 'channels':channels,
+             'norm_val':norm_val, 'Fs':Fs, 'scale_by_freq':scale_by_freq}
+
+        FFT_slices is a complex array of shape (n_channels, n_slices, n_freqs),
+        holding the windowed FFT of every segment of each of the channels in
+        the sorted integer array channels (in that order).
 
     Notes
     -----
@@ -960,25 +1389,21 @@ def cache_fft(time_series, ij, lb=0, ub=None,
         e_s = "For cache_fft, spectral estimation method must be welch"
         raise ValueError(e_s)
     time_series = utils.zero_pad(time_series, NFFT)
+    if pad_to is None:
+        pad_to = NFFT
+    elif pad_to < NFFT:
+        e_s = "pad_to must be at least NFFT"
+        raise ValueError(e_s)
 
-    #The shape of the zero-padded version:
-    n_channels, n_time_points = time_series.shape
-
-    # get all the unique channels in time_series that we are interested in by
-    # checking the ij tuples
-    all_channels = set()
-    for i, j in ij:
-        all_channels.add(i)
-        all_channels.add(j)
-
-    # for real time_series, ignore the negative frequencies
-    if np.iscomplexobj(time_series):
-        n_freqs = NFFT
+    if store is None:
+        # get all the unique channels in time_series that we are interested in
+        # by checking the ij tuples
+        channels = np.unique(_cache_ij(ij))
     else:
-        n_freqs = NFFT // 2 + 1
+        channels = np.arange(time_series.shape[0])
 
     #Which frequencies
-    freqs = utils.get_freqs(Fs, NFFT)
+    freqs = utils.get_freqs(Fs, pad_to)
 
     #If there are bounds, limit the calculation to within that band,
     #potentially include the DC component:
@@ -1006,34 +1431,38 @@ def cache_fft(time_series, ij, lb=0, ub=None,
     else:
         norm_val = (np.abs(window_vals) ** 2).sum() / 2
 
-    # cache the FFT of every windowed, detrended NFFT length segement
-    # of every channel.  If prefer_speed_over_memory, cache the conjugate
-    # as well
-
-    i_times = list(range(0, n_time_points - NFFT + 1, NFFT - n_overlap))
-    n_slices = len(i_times)
-    FFT_slices = {}
-    FFT_conj_slices = {}
-
-    for i_channel in all_channels:
-        #dbg:
-        #print i_channel
-        Slices = np.zeros((n_slices, n_freqs), dtype=np.complex)
-        for iSlice in range(n_slices):
-            thisSlice = time_series[i_channel,
-                                    i_times[iSlice]:i_times[iSlice] + NFFT]
-
-            #Windowing:
-            thisSlice = window_vals * thisSlice  # No detrending
-            #Derive the fft for that slice:
-            Slices[iSlice, :] = (fftpack.fft(thisSlice)[lb_idx:ub_idx])
-
-        FFT_slices[i_channel] = Slices
-
-        if prefer_speed_over_memory:
-            FFT_conj_slices[i_channel] = np.conjugate(Slices)
-
-    cache = {'FFT_slices': FFT_slices, 'FFT_conj_slices': FFT_conj_slices,
+    # cache the FFT of every windowed NFFT length segment of every channel.
+    n_slices = (time_series.shape[-1] - NFFT) // (NFFT - n_overlap) + 1
+    if store is None:
+        FFT_slices = np.empty((len(channels), n_slices, n_freqs),
+                              dtype=complex)
+        band_transform, transform = _band_transform(NFFT, pad_to, lb_idx,
+                                                    ub_idx, transform)
+        _fft_slices(time_series, channels, NFFT, n_overlap, window_vals,
+                    band_transform, FFT_slices)
+    else:
+        fname = _fft_store_file(store, time_series, NFFT, n_overlap, Fs,
+                                window_vals, pad_to, store_key)
+        if not os.path.exists(fname):
+            if not os.path.isdir(store):
+                os.makedirs(store)
+            # Write into a temporary file, which is only renamed once it is
+            # complete:
+            tmp_fname = '%s.%d.tmp' % (fname, os.getpid())
+            out = np.lib.format.open_memmap(
+                tmp_fname, mode='w+', dtype=complex,
+                shape=(len(channels), n_slices, freqs.shape[0]))
+            band_transform, transform = _band_transform(
+                NFFT, pad_to, 0, freqs.shape[0], transform)
+            _fft_slices(time_series, channels, NFFT, n_overlap, window_vals,
+                        band_transform, out)
+            out.flush()
+            del out
+            os.rename(tmp_fname, fname)
+
+        FFT_slices = np.load(fname, mmap_mode='r')[..., lb_idx:ub_idx]
+
+    cache = {'FFT_slices': FFT_slices, 'channels': channels,
              'norm_val': norm_val, 'Fs': Fs, 'scale_by_freq': scale_by_freq}
 
     return freqs, cache
@@ -1060,35 +1489,20 @@ def cache_to_psd(cache, ij):
     """
     # This is the way it is saved by cache_spectra:
     FFT_slices = cache['FFT_slices']
-    FFT_conj_slices = cache['FFT_conj_slices']
     norm_val = cache['norm_val']
-    # Fs = cache['Fs']
-
-    # This is where the output goes to:
-    Pxx = {}
-    all_channels = set()
-    for i, j in ij:
-        all_channels.add(i)
-        all_channels.add(j)
-
-    for i in all_channels:
-        #dbg:
-        #print i
-        #If we made the conjugate slices:
-        if FFT_conj_slices:
-            Pxx[i] = FFT_slices[i] * FFT_conj_slices[i]
-        else:
-            Pxx[i] = FFT_slices[i] * np.conjugate(FFT_slices[i])
 
-        #If there is more than one window
-        if FFT_slices[i].shape[0] > 1:
-            Pxx[i] = np.mean(Pxx[i], 0)
+    channels = np.unique(_cache_ij(ij))
+    rows = _cache_rows(cache, channels)
 
-        Pxx[i] /= norm_val
-        # Correct for the NFFT/2 and DC components:
-        Pxx[i][[0, -1]] /= 2
+    Pxx = np.empty((len(rows),) + FFT_slices.shape[2:])
+    for block in _chunks(len(rows), FFT_slices[0].size):
+        Pxx[block] = np.mean(np.abs(FFT_slices[rows[block]]) ** 2, 1)
 
-    return Pxx
+    Pxx /= norm_val
+    # Correct for the NFFT/2 and DC components:
+    Pxx[:, [0, -1]] /= 2
+
+    return dict(zip(channels.tolist(), Pxx))
 
 
 def cache_to_phase(cache, ij):
@@ -1118,23 +1532,68 @@ def cache_to_phase(cache, ij):
     """
     FFT_slices = cache['FFT_slices']
 
-    Phase = {}
+    channels = np.unique(_cache_ij(ij))
+    rows = _cache_rows(cache, channels)
+
+    #Average over all the windows:
+    Phase = np.empty((len(rows),) + FFT_slices.shape[2:])
+    for block in _chunks(len(rows), FFT_slices[0].size):
+        Phase[block] = np.mean(np.angle(FFT_slices[rows[block]]), 1)
+
+    return dict(zip(channels.tolist(), Phase))
+
+
+def _cache_cross(cache, ij, func, compact=False, dtype=complex):
+    """Apply func to the cross-spectra of the FFT slices of each pair in ij
+
+    func(Sxy, i_rows, j_rows) receives the (n_pairs, n_slices, n_freqs)
+    products X_i * conj(X_j) of a block of pairs, with the cache rows of i
+    and j, and returns the (n_pairs, n_freqs) result for that block. The
+    results are put into an array of shape (max(i)+1, max(j)+1, n_freqs), at
+    [i, j], or, if compact is True, of shape (n_pairs, n_freqs), in the order
+    of ij.
+    """
+    FFT_slices = cache['FFT_slices']
+    ij = _cache_ij(ij)
+    rows = _cache_rows(cache, ij)
+
+    if compact:
+        out = np.empty((len(ij), FFT_slices.shape[-1]), dtype=dtype)
+    else:
+        channels_i = max(1, ij[:, 0].max() + 1)
+        channels_j = max(1, ij[:, 1].max() + 1)
+        out = np.zeros((channels_i, channels_j, FFT_slices.shape[-1]),
+                       dtype=dtype)
+
+    for block in _chunks(len(ij), FFT_slices[0].size):
+        i_rows, j_rows = rows[block].T
+        # take makes a (writeable) copy, even of a read-only memmap, so it can
+        # be conjugated in place:
+        Sxy = np.take(FFT_slices, j_rows, axis=0)
+        np.conjugate(Sxy, Sxy)
+        Sxy *= FFT_slices[i_rows]
+        if compact:
+            out[block] = func(Sxy, i_rows, j_rows)
+        else:
+            out[ij[block, 0], ij[block, 1]] = func(Sxy, i_rows, j_rows)
 
-    all_channels = set()
-    for i, j in ij:
-        all_channels.add(i)
-        all_channels.add(j)
+    return out
 
-    for i in all_channels:
-        Phase[i] = np.angle(FFT_slices[i])
-        #If there is more than one window, average over all the windows:
-        if FFT_slices[i].shape[0] > 1:
-            Phase[i] = np.mean(Phase[i], 0)
 
-    return Phase
+def _mean_phase(Sxy, average):
+    """The average phase of the cross-spectra Sxy over their second axis"""
+    if average == 'mean':
+        return np.mean(np.angle(Sxy), 1)
+    if average == 'circular':
+        # The mean of unit vectors, which is not affected by the wrapping of
+        # the phases at +/- pi:
+        amp = np.abs(Sxy)
+        amp[amp == 0] = 1
+        Sxy /= amp
+    return np.angle(np.sum(Sxy, 1))
 
 
-def cache_to_relative_phase(cache, ij):
+def cache_to_relative_phase(cache, ij, average='mean', compact=False):
     """ From a set of cached set of windowed fft's, calculate the
     frequency-band dependent relative phase for the combinations ij.
 
@@ -1147,12 +1606,25 @@ def cache_to_relative_phase(cache, ij):
        A list of tuples of the form (i,j), all the pairs of indices for which
        to calculate the relative phases
 
+    average: str, optional
+       How the phases in the individual windows are averaged. 'mean' (the
+       default) is the mean of the angles. 'circular' is the angle of the mean
+       of unit vectors at these angles, which is not biased by the wrapping of
+       the phases around +/- pi. 'weighted' also weights the unit vectors by
+       the magnitude of the cross-spectrum in each window, which gives the
+       phase of the coherency.
+
+    compact: bool, optional
+       Return an (n_pairs, n_freqs) float array, in the order of ij, instead
+       of an array indexed by [i, j].
+
     Returns
     -------
 
-    Phi_xy : dict
+    Phi_xy : array
         The relative phases between the time-series i and j. Such that
-        Phi_xy[i,j] is the phase from time_series[i] to time_series[j].
+        Phi_xy[i,j] is the phase from time_series[i] to time_series[j] (or,
+        if compact is True, Phi_xy[k] is the phase between the pair ij[k]).
 
     Note
     ----
@@ -1164,43 +1636,14 @@ def cache_to_relative_phase(cache, ij):
     on individual windows.
 
     """
-    # This is the way it is saved by cache_spectra:
-    FFT_slices = cache['FFT_slices']
-    FFT_conj_slices = cache['FFT_conj_slices']
-    # norm_val = cache['norm_val']
-
-    freqs = cache['FFT_slices'][ij[0][0]].shape[-1]
-
-    ij_array = np.array(ij)
-
-    channels_i = max(1, max(ij_array[:, 0]) + 1)
-    channels_j = max(1, max(ij_array[:, 1]) + 1)
-    #Pre-allocate for speed:
-    Phi_xy = np.zeros((channels_i, channels_j, freqs), dtype=np.complex)
-
-    #These checks take time, so do them up front, not in every iteration:
-    if list(FFT_slices.items())[0][1].shape[0] > 1:
-        if FFT_conj_slices:
-            for i, j in ij:
-                phi = np.angle(FFT_slices[i] * FFT_conj_slices[j])
-                Phi_xy[i, j] = np.mean(phi, 0)
-
-        else:
-            for i, j in ij:
-                phi = np.angle(FFT_slices[i] * np.conjugate(FFT_slices[j]))
-                Phi_xy[i, j] = np.mean(phi, 0)
-
-    else:
-        if FFT_conj_slices:
-            for i, j in ij:
-                Phi_xy[i, j] = np.angle(FFT_slices[i] * FFT_conj_slices[j])
-
-        else:
-            for i, j in ij:
-                Phi_xy[i, j] = np.angle(FFT_slices[i] *
-                                        np.conjugate(FFT_slices[j]))
+    if average not in ('mean', 'circular', 'weighted'):
+        e_s = "average must be one of 'mean', 'circular' or 'weighted'"
+        raise ValueError(e_s)
 
-    return Phi_xy
+    return _cache_cross(cache, ij,
+                        lambda Sxy, i, j: _mean_phase(Sxy, average),
+                        compact=compact,
+                        dtype=float if compact else complex)
 
 
 def cache_to_coherency(cache, ij):
@@ -1224,68 +1667,308 @@ def cache_to_coherency(cache, ij):
        time-series i and time-series j in the original input to
        :func:`cache_fft`
     """
+    # The power of each channel is computed only once:
+    rows = np.unique(_cache_rows(cache, _cache_ij(ij)))
+    Pxx = np.zeros((len(cache['channels']), cache['FFT_slices'].shape[-1]))
+    Pxx[rows] = _cache_power(cache, rows)
 
-    #This is the way it is saved by cache_spectra:
-    FFT_slices = cache['FFT_slices']
-    FFT_conj_slices = cache['FFT_conj_slices']
-    norm_val = cache['norm_val']
+    return _cache_cross(cache, ij, lambda Sxy, i, j:
+                        np.mean(Sxy, 1) / np.sqrt(Pxx[i] * Pxx[j]))
 
-    freqs = cache['FFT_slices'][ij[0][0]].shape[-1]
-
-    ij_array = np.array(ij)
-
-    channels_i = max(1, max(ij_array[:, 0]) + 1)
-    channels_j = max(1, max(ij_array[:, 1]) + 1)
-    Cxy = np.zeros((channels_i, channels_j, freqs), dtype=np.complex)
-
-    #These checks take time, so do them up front, not in every iteration:
-    if list(FFT_slices.items())[0][1].shape[0] > 1:
-        if FFT_conj_slices:
-            for i, j in ij:
-                #dbg:
-                #print i,j
-                Pxy = FFT_slices[i] * FFT_conj_slices[j]
-                Pxx = FFT_slices[i] * FFT_conj_slices[i]
-                Pyy = FFT_slices[j] * FFT_conj_slices[j]
-                Pxx = np.mean(Pxx, 0)
-                Pyy = np.mean(Pyy, 0)
-                Pxy = np.mean(Pxy, 0)
-                Pxy /= norm_val
-                Pxx /= norm_val
-                Pyy /= norm_val
-                Cxy[i, j] = Pxy / np.sqrt(Pxx * Pyy)
 
-        else:
-            for i, j in ij:
-                Pxy = FFT_slices[i] * np.conjugate(FFT_slices[j])
-                Pxx = FFT_slices[i] * np.conjugate(FFT_slices[i])
-                Pyy = FFT_slices[j] * np.conjugate(FFT_slices[j])
-                Pxx = np.mean(Pxx, 0)
-                Pyy = np.mean(Pyy, 0)
-                Pxy = np.mean(Pxy, 0)
-                Pxy /= norm_val
-                Pxx /= norm_val
-                Pyy /= norm_val
-                Cxy[i, j] = Pxy / np.sqrt(Pxx * Pyy)
-    else:
-        if FFT_conj_slices:
-            for i, j in ij:
-                Pxy = FFT_slices[i] * FFT_conj_slices[j]
-                Pxx = FFT_slices[i] * FFT_conj_slices[i]
-                Pyy = FFT_slices[j] * FFT_conj_slices[j]
-                Pxy /= norm_val
-                Pxx /= norm_val
-                Pyy /= norm_val
-                Cxy[i, j] = Pxy / np.sqrt(Pxx * Pyy)
 
+def cache_to_dynamic_coherency(cache, ij, n_slices, step=1):
+    """From a set of cached spectra, calculate the coherency in sliding
+    windows, each made of n_slices consecutive cached FFT slices
+
+    Parameters
+    ----------
+    cache: dict
+        the return value from :func:`cache_fft`
+
+    ij: list
+      a list of (i,j) tuples, the pairs of indices for which the
+      cross-coherency is to be calculated
+
+    n_slices: int
+      The number of FFT slices (Welch segments) in each window
+
+    step: int, optional
+      The number of slices between the starts of consecutive windows
+
+    Returns
+    -------
+    Cxy: complex array (n_windows, n_pairs, n_freqs)
+       Cxy[w, p] is the coherency between the pair ij[p] in the window w,
+       which is the same as :func:`cache_to_coherency` of a cache of only
+       the slices step * w to step * w + n_slices.
+
+    Notes
+    -----
+    The cross-spectral sums over the slices are kept as running sums, which
+    are updated by adding the products of the slices entering the window and
+    subtracting the ones leaving it. To bound the round-off drift, the sums
+    are recomputed from scratch once every window length.
+    """
+    FFT_slices = cache['FFT_slices']
+    ij = _cache_ij(ij)
+    i_rows, j_rows = _cache_rows(cache, ij).T
+    n_channels, n_total, n_freqs = FFT_slices.shape
+    n_slices = int(n_slices)
+    step = int(step)
+    if step < 1 or n_slices < 1 or n_slices > n_total:
+        e_s = "n_slices must be between 1 and the number of cached slices "
+        e_s += "(%d), and step must be at least 1" % n_total
+        raise ValueError(e_s)
+
+    n_windows = (n_total - n_slices) // step + 1
+    Cxy = np.empty((n_windows, len(ij), n_freqs), dtype=complex)
+    Sxy = np.zeros((len(ij), n_freqs), dtype=complex)
+    Pxx = np.zeros((n_channels, n_freqs))
+
+    def add(start, stop, sign):
+        X = FFT_slices[:, start:stop]
+        Pxx[:] += sign * np.sum(np.abs(X) ** 2, 1)
+        for block in _chunks(len(ij), X[0].size):
+            Sxy[block] += sign * np.sum(X[i_rows[block]] *
+                                        X[j_rows[block]].conj(), 1)
+
+    # The number of windows after which all the slices have been replaced:
+    refresh = -(-n_slices // step)
+    for w in range(n_windows):
+        start = w * step
+        if w % refresh == 0:
+            Sxy[:] = 0
+            Pxx[:] = 0
+            add(start, start + n_slices, 1)
         else:
-            for i, j in ij:
-                Pxy = FFT_slices[i] * np.conjugate(FFT_slices[j])
-                Pxx = FFT_slices[i] * np.conjugate(FFT_slices[i])
-                Pyy = FFT_slices[j] * np.conjugate(FFT_slices[j])
-                Pxy /= norm_val
-                Pxx /= norm_val
-                Pyy /= norm_val
-                Cxy[i, j] = Pxy / np.sqrt(Pxx * Pyy)
+            add(start + n_slices - step, start + n_slices, 1)
+            add(start - step, start, -1)
+        Cxy[w] = Sxy / np.sqrt(Pxx[i_rows] * Pxx[j_rows])
+
+    return Cxy
+
+def cache_to_seed_coherency(seed_cache, target_cache):
+    """From the cached spectra of a set of seeds and a set of targets,
+    calculate the coherency between every seed and every target
+
+    Parameters
+    ----------
+    seed_cache, target_cache: dict
+        Return values from :func:`cache_fft`, computed with the same method
+        and frequency band
+
+    Returns
+    -------
+    Cxy: complex array (n_seeds, n_targets, n_freqs)
+        Cxy[s, t] is the coherency between the s-th channel cached in
+        seed_cache and the t-th channel cached in target_cache
+
+    Notes
+    -----
+    The cross-spectra are computed as a single contraction over the windows,
+    one matrix product per frequency, and the power of each seed and of each
+    target is only computed once.
+    """
+    X = seed_cache['FFT_slices']
+    Y = target_cache['FFT_slices']
+    if X.shape[1:] != Y.shape[1:]:
+        e_s = "The seed and target caches must have the same number of "
+        e_s += "windows and frequencies"
+        raise ValueError(e_s)
+
+    n_slices, n_freqs = X.shape[1:]
+    Cxy = np.empty((X.shape[0], Y.shape[0], n_freqs), dtype=complex)
+    # sum_k X[s, k] * conj(Y[t, k]) is the conjugate of
+    # sum_k conj(X[s, k]) * Y[t, k], so only the (few) seeds get conjugated:
+    X_conj = X.conj()
+    for f in range(n_freqs):
+        Cxy[..., f] = np.dot(X_conj[..., f], Y[..., f].T)
+    np.conjugate(Cxy, Cxy)
+
+    Cxy /= n_slices * np.sqrt(_cache_power(seed_cache)[:, None] *
+                              _cache_power(target_cache)[None])
 
     return Cxy
+
+
+def cache_to_coherence_network(cache, average='bavg', threshold=None, k=None,
+                               tile_size=256, sparse=False):
+    """From a set of cached spectra, calculate a network of band-averaged
+    coherence between all the cached channels, keeping only the strongest
+    connections.
+
+    The channels are processed in tiles of tile_size x tile_size pairs and
+    every tile is reduced as soon as it is computed, so the memory needed is
+    set by the tile size and the number of edges kept, rather than by the
+    square of the number of channels.
+
+    Parameters
+    ----------
+    cache: dict
+        The return value from :func:`cache_fft`. The frequency band of the
+        cache (set by lb and ub in :func:`cache_fft`) is the band averaged
+        over.
+
+    average: str, optional
+        'bavg' (the default) averages the cross- and auto-spectra over the
+        band before calculating the coherence, as in :func:`coherence_bavg`.
+        'mean' averages the coherence over the frequencies in the band.
+
+    threshold: float, optional
+        Keep only the edges with a band-averaged coherence of at least this
+        value.
+
+    k: int, optional
+        Keep only the (at most) k strongest connections of each channel. This
+        can be combined with a threshold.
+
+    tile_size: int, optional
+        The number of channels in each tile.
+
+    sparse: bool, optional
+        Whether to return a scipy.sparse matrix instead of an edge list.
+
+    Returns
+    -------
+    ij, c: int array (n_edges, 2), float array (n_edges, )
+        The indices (into the time-series passed to :func:`cache_fft`) of the
+        two channels and the band-averaged coherence of each edge. Without k,
+        each edge appears once, with i < j, sorted by i and then j. With k,
+        the edges of each channel i are its k strongest connections, in
+        descending order.
+
+    or, if sparse is True:
+
+    C: scipy.sparse.coo_matrix
+        A square matrix holding the band-averaged coherence of the edges at
+        C[i, j], with a size set by the largest cached channel index.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> import nitime.algorithms as tsa
+    >>> ts = np.random.randn(100, 1000)
+    >>> f, cache = tsa.cache_fft(ts, [(i, i) for i in range(100)], lb=0.5, ub=1)
+    >>> ij, c = tsa.cache_to_coherence_network(cache, k=5)
+    >>> ij.shape
+    (500, 2)
+
+    Notes
+    -----
+    Unlike :func:`coherence_bavg`, which discards the DC component when lb is
+    0, this uses all the frequencies in the cache.
+    """
+    if average not in ('bavg', 'mean'):
+        e_s = "average must be either 'bavg' or 'mean'"
+        raise ValueError(e_s)
+
+    FFT_slices = cache['FFT_slices']
+    channels = cache['channels']
+    n_channels, n_slices, n_freqs = FFT_slices.shape
+    tile_size = int(tile_size)
+
+    if average == 'bavg':
+        # Summing the cross-spectrum over frequencies and windows is an inner
+        # product of the flattened FFT slices of the two channels:
+        Z = FFT_slices.reshape(n_channels, -1)
+        Pxx = _cache_power(cache).sum(-1)
+    else:
+        Pxx = _cache_power(cache)
+
+    def tile_coherence(a, b):
+        if average == 'bavg':
+            Sxy = np.dot(Z[a].conj(), Z[b].T) / n_slices
+            return np.abs(Sxy) ** 2 / (Pxx[a][:, None] * Pxx[b][None])
+
+        Xa = FFT_slices[a].conj()
+        Xb = FFT_slices[b]
+        c = np.zeros((Xa.shape[0], Xb.shape[0]))
+        for f in range(n_freqs):
+            Sxy = np.dot(Xa[..., f], Xb[..., f].T) / n_slices
+            c += np.abs(Sxy) ** 2 / (Pxx[a, f][:, None] * Pxx[b, f][None])
+        return c / n_freqs
+
+    if k is not None:
+        k = int(k)
+        best_c = np.empty((n_channels, k))
+        best_c.fill(-np.inf)
+        best_j = np.zeros((n_channels, k), dtype=int)
+    edges_i, edges_j, edges_c = [], [], []
+
+    starts = list(range(0, n_channels, tile_size))
+    for a_start in starts:
+        a = slice(a_start, a_start + tile_size)
+        for b_start in starts[a_start // tile_size:]:
+            b = slice(b_start, b_start + tile_size)
+            c = tile_coherence(a, b)
+            i = np.arange(a_start, a_start + c.shape[0])
+            j = np.arange(b_start, b_start + c.shape[1])
+            # Each pair only once, and no self-connections:
+            keep = j[None] > i[:, None]
+            if threshold is not None:
+                keep &= c >= threshold
+
+            if k is None:
+                ii, jj = np.nonzero(keep)
+                edges_i.append(i[ii])
+                edges_j.append(j[jj])
+                edges_c.append(c[ii, jj])
+            else:
+                c[~keep] = -np.inf
+                _merge_top_k(best_c, best_j, i, c, j)
+                _merge_top_k(best_c, best_j, j, c.T, i)
+
+    if k is None:
+        i = np.concatenate(edges_i)
+        j = np.concatenate(edges_j)
+        c = np.concatenate(edges_c)
+        # In row-major order, regardless of the tiling:
+        order = np.lexsort((j, i))
+        i, j, c = i[order], j[order], c[order]
+    else:
+        order = np.argsort(-best_c, 1)
+        rows = np.arange(n_channels)[:, None]
+        best_c = best_c[rows, order]
+        best_j = best_j[rows, order]
+        keep = np.isfinite(best_c)
+        i = np.nonzero(keep)[0]
+        j = best_j[keep]
+        c = best_c[keep]
+
+    i = channels[i]
+    j = channels[j]
+    if sparse:
+        n = channels[-1] + 1
+        return scipy_sparse.coo_matrix((c, (i, j)), shape=(n, n))
+
+    return np.column_stack([i, j]), c
+
+
+def _merge_top_k(best_c, best_j, rows, c, cols):
+    """Merge the values c[r] (for the channels cols) into the running k
+    largest values best_c[rows[r]] (for the channels best_j[rows[r]])"""
+    k = best_c.shape[1]
+    cand_c = np.concatenate([best_c[rows], c], 1)
+    cand_j = np.concatenate([best_j[rows],
+                             np.tile(cols, (len(rows), 1))], 1)
+    idx = np.argpartition(-cand_c, k - 1, axis=1)[:, :k]
+    r = np.arange(len(rows))[:, None]
+    best_c[rows] = cand_c[r, idx]
+    best_j[rows] = cand_j[r, idx]
+
+
+def _cache_power(cache, rows=None):
+    """The power of the cached channels (in the given rows of the cache, or
+    all of them), averaged over the windows.
+
+    This is not normalized by cache['norm_val'], which cancels out in the
+    coherency"""
+    FFT_slices = cache['FFT_slices']
+    if rows is None:
+        rows = np.arange(FFT_slices.shape[0])
+    Pxx = np.empty((len(rows), FFT_slices.shape[-1]))
+    for block in _chunks(len(Pxx), FFT_slices[0].size):
+        Pxx[block] = np.mean(np.abs(FFT_slices[rows[block]]) ** 2, 1)
+
+    return Pxx
@@ -11,6 +11,9 @@ XXX
 
 """
 
+import threading
+from collections import OrderedDict
+
 import numpy as np
 from nitime.lazy import matplotlib_mlab as mlab
 from nitime.lazy import scipy_linalg as linalg
@@ -29,7 +32,7 @@ from nitime.index_utils import tril_indices, triu_indices
 default_nfft = 64
 default_n_overlap = int(np.ceil(default_nfft / 2.0))
 
-def get_spectra(time_series, method=None):
+def get_spectra(time_series, method=None, condensed=False):
     r"""
     Compute the spectra of an n-tuple of time series and all of
     the pairwise cross-spectra.
@@ -42,9 +45,9 @@ def get_spectra(time_series, method=None):
     method : dict, optional
 
         contains: this_method:'welch'
-           indicates that :func:`mlab.psd` will be used in
-           order to calculate the psd/csd, in which case, additional optional
-           inputs (and default values) are:
+           indicates that Welch's averaged periodogram (as in :func:`mlab.csd`)
+           will be used in order to calculate the psd/csd, in which case,
+           additional optional inputs (and default values) are:
 
                NFFT=64
 
@@ -84,6 +87,10 @@ def get_spectra(time_series, method=None):
 
                sides = 'onesided'
 
+    condensed : bool, optional
+        Return the cross-spectra as a :class:`utils.CondensedMatrix`, which
+        only stores the upper triangle of the matrix (default: False)
+
     Returns
     -------
 
@@ -92,9 +99,9 @@ def get_spectra(time_series, method=None):
         are estimated
 
     fxy : float array
-        A semi-filled matrix with the cross-spectra of the signals. The csd of
-        signal i and signal j is in f[j][i], but not in f[i][j] (which will be
-        filled with zeros). For i=j fxy[i][j] is the psd of signal i.
+        A matrix with the cross-spectra of the signals. The csd of signal i
+        and signal j is in fxy[i][j] and fxy[j][i] = fxy[i][j].conj(). For i=j
+        fxy[i][j] is the psd of signal i.
 
     """
     if method is None:
@@ -110,46 +117,20 @@ def get_spectra(time_series, method=None):
         window = method.get('window', mlab.window_hanning)
         n_overlap = method.get('n_overlap', int(np.ceil(NFFT / 2.0)))
 
-        # The length of the spectrum depends on how many sides are taken, which
-        # depends on whether or not this is a complex object:
-        if np.iscomplexobj(time_series):
-            fxy_len = NFFT
-        else:
-            fxy_len = NFFT / 2.0 + 1
-
-        # If there is only 1 channel in the time-series:
-        if len(time_series.shape) == 1 or time_series.shape[0] == 1:
-            temp, f = mlab.csd(time_series, time_series,
-                               NFFT, Fs, detrend, window, n_overlap,
-                               scale_by_freq=True)
-
-            fxy = temp.squeeze()  # the output of mlab.csd has a weird
-                                  # shape
-        else:
-            fxy = np.zeros((time_series.shape[0],
-                            time_series.shape[0],
-                            fxy_len), dtype=complex)  # Make sure it's complex
-
-            for i in range(time_series.shape[0]):
-                for j in range(i, time_series.shape[0]):
-                    #Notice funny indexing, in order to conform to the
-                    #conventions of the other methods:
-                    temp, f = mlab.csd(time_series[j], time_series[i],
-                                       NFFT, Fs, detrend, window, n_overlap,
-                                       scale_by_freq=True)
-
-                    fxy[i][j] = temp.squeeze()  # the output of mlab.csd has a
-                                                # weird shape
+        f, fxy = _welch_csd(time_series, NFFT, Fs, detrend, window,
+                            n_overlap, scale_by_freq=True, triu=condensed)
     elif this_method in ('multi_taper_csd', 'periodogram_csd'):
         # these methods should work with similar signatures
         mdict = method.copy()
         func = eval(mdict.pop('this_method'))
-        freqs, fxy = func(time_series, **mdict)
+        freqs, fxy = func(time_series, triu=condensed, **mdict)
         f = utils.circle_to_hz(freqs, mdict.get('Fs', 2 * np.pi))
 
     else:
         raise ValueError("Unknown method provided")
 
+    if condensed:
+        return f, utils.CondensedMatrix(fxy)
     return f, fxy.squeeze()
 
 
@@ -186,6 +167,143 @@ def get_spectra_bi(x, y, method=None):
     return f, fxx, fyy, fxy
 
 
+def _welch_segments(time_series, NFFT, n_overlap):
+    """
+    A strided (no-copy) view of all the NFFT-long segments of the rows of
+    time_series, with a step of NFFT - n_overlap between segments.
+
+    Parameters
+    ----------
+    time_series : ndarray (M, N)
+        The time-series, where time is the last dimension. Inputs shorter than
+        NFFT should be zero-padded beforehand (see :func:`utils.zero_pad`).
+
+    NFFT : int
+        The length of each segment
+
+    n_overlap : int
+        The number of points shared by adjacent segments
+
+    Returns
+    -------
+    segments : ndarray (M, n_slices, NFFT)
+        A read-only view into time_series. Do not write into this array.
+    """
+    NFFT = int(NFFT)
+    step = NFFT - int(n_overlap)
+    if step < 1:
+        raise ValueError("n_overlap must be smaller than NFFT")
+    time_series = np.ascontiguousarray(time_series)
+    n_slices = (time_series.shape[-1] - NFFT) // step + 1
+    strides = time_series.strides
+    return np.lib.stride_tricks.as_strided(
+        time_series,
+        shape=(time_series.shape[0], n_slices, NFFT),
+        strides=(strides[0], step * strides[-1], strides[-1]))
+
+
+def _welch_fft(time_series, NFFT, window, n_overlap, detrend=None):
+    """
+    Window and FFT every NFFT-long segment of every row of time_series in one
+    batched transform.
+
+    Returns
+    -------
+    slices : ndarray (M, n_slices, NFFT)
+        The complex FFT of each windowed segment
+
+    window_vals : ndarray (NFFT,)
+        The values of the window applied to each segment
+    """
+    if np.iterable(window):
+        assert(len(window) == NFFT)
+        window_vals = np.asarray(window)
+    else:
+        window_vals = window(np.ones(NFFT, time_series.dtype))
+
+    segments = _welch_segments(time_series, NFFT, n_overlap)
+    if detrend is not None and detrend is not mlab.detrend_none:
+        segments = np.apply_along_axis(detrend, -1, segments)
+    slices = fftpack.fft(segments * window_vals, axis=-1)
+    return slices, window_vals
+
+
+def _welch_csd(time_series, NFFT=default_nfft, Fs=2 * np.pi, detrend=None,
+               window=None, n_overlap=None, scale_by_freq=True, triu=False):
+    """
+    Welch's averaged periodogram estimate of all the pairwise cross-spectra
+    between the rows of time_series.
+
+    Each channel is segmented (with a strided view), windowed and transformed
+    only once, and the full cross-spectral matrix is then formed from the
+    cached segment FFTs with a single contraction over segments. The
+    normalization and frequency ordering follow :func:`mlab.csd`, so that
+    fxy[i, j] equals mlab.csd(time_series[j], time_series[i], ...).
+
+    Returns
+    -------
+    f : float array
+        The frequencies
+
+    fxy : complex array (M, M, len(f))
+        The Hermitian matrix of cross-spectra, or its upper triangle, shaped
+        (M * (M + 1) / 2, len(f)), if triu is True
+    """
+    if window is None:
+        window = mlab.window_hanning
+    if n_overlap is None:
+        n_overlap = int(np.ceil(NFFT / 2.0))
+    NFFT = int(NFFT)
+
+    time_series = np.asarray(time_series)
+    time_series = time_series.reshape(-1, time_series.shape[-1])
+    time_series = utils.zero_pad(time_series, NFFT)
+
+    slices, window_vals = _welch_fft(time_series, NFFT, window, n_overlap,
+                                     detrend=detrend)
+    n_slices = slices.shape[1]
+
+    f = np.fft.fftfreq(NFFT, 1.0 / Fs)
+    if np.iscomplexobj(time_series):
+        # Two-sided spectrum, centered on zero (as mlab does):
+        slices = np.fft.fftshift(slices, axes=(-1,))
+        f = np.fft.fftshift(f)
+    else:
+        n_freqs = NFFT // 2 + 1
+        slices = slices[..., :n_freqs]
+        f = f[:n_freqs]
+        if not NFFT % 2:
+            # The last value is the Nyquist frequency (positive):
+            f[-1] *= -1
+
+    # fxy[i, j] = sum_s X_i(s) X_j^{*}(s):
+    if triu:
+        M = slices.shape[0]
+        fxy = np.empty((M * (M + 1) // 2, slices.shape[-1]), 'D')
+        start = 0
+        for i in range(M):
+            fxy[start:start + M - i] = np.einsum('sf,jsf->jf', slices[i],
+                                                 slices[i:].conj())
+            start += M - i
+    else:
+        fxy = np.einsum('isf,jsf->ijf', slices, slices.conj())
+
+    if not np.iscomplexobj(time_series):
+        # Scale everything, except the DC and the NFFT/2 components:
+        if not NFFT % 2:
+            fxy[..., 1:-1] *= 2
+        else:
+            fxy[..., 1:] *= 2
+
+    if scale_by_freq:
+        norm_val = Fs * (np.abs(window_vals) ** 2).sum()
+    else:
+        norm_val = np.abs(window_vals).sum() ** 2
+    fxy /= norm_val * n_slices
+
+    return f, fxy
+
+
 # The following spectrum estimates are normalized to the convention
 # adopted by MATLAB (or at least spectrum.psd)
 # By definition, Sxx(f) = DTFT{Rxx(n)}, where Rxx(n) is the autocovariance
@@ -267,7 +385,7 @@ def periodogram(s, Fs=2 * np.pi, Sk=None, N=None,
 
 
 def periodogram_csd(s, Fs=2 * np.pi, Sk=None, NFFT=None, sides='default',
-                    normalize=True):
+                    normalize=True, triu=False):
     """Takes an N-point periodogram estimate of all the cross spectral
     density functions between rows of s.
 
@@ -300,6 +418,10 @@ def periodogram_csd(s, Fs=2 * np.pi, Sk=None, NFFT=None, sides='default',
     normalize : boolean (optional)
         Normalizes the PSD
 
+    triu : boolean (optional)
+        Only return the upper triangle (i <= j) of the CSD matrix, in the
+        order given by triu_indices(M)
+
     Returns
     -------
 
@@ -307,7 +429,7 @@ def periodogram_csd(s, Fs=2 * np.pi, Sk=None, NFFT=None, sides='default',
         The estimated CSD and the frequency points vector.
         The CSD{i,j}(f) are returned in a square "matrix" of vectors
         holding Sij(f). For an input array that is reshaped to (M,N),
-        the output is (M,M,N)
+        the output is (M,M,N), or (M*(M+1)/2, N) if triu is True
 
     """
     s_shape = s.shape
@@ -337,35 +459,34 @@ def periodogram_csd(s, Fs=2 * np.pi, Sk=None, NFFT=None, sides='default',
 
     if sides == 'onesided':
         # putative Nyquist freq
-        Fn = N / 2 + 1
+        Fn = N // 2 + 1
         # last duplicate freq
-        Fl = (N + 1) / 2
-        csd_pairs = np.zeros((M, M, Fn), 'D')
+        Fl = (N + 1) // 2
+        Sk_loc = Sk_loc[:, :Fn]
         freqs = np.linspace(0, Fs / 2, Fn)
-        for i in range(M):
-            for j in range(i + 1):
-                csd_pairs[i, j, 0] = Sk_loc[i, 0] * Sk_loc[j, 0].conj()
-                csd_pairs[i, j, 1:Fl] = 2 * (Sk_loc[i, 1:Fl] *
-                                             Sk_loc[j, 1:Fl].conj())
-                if Fn > Fl:
-                    csd_pairs[i, j, Fn - 1] = (Sk_loc[i, Fn - 1] *
-                                               Sk_loc[j, Fn - 1].conj())
-
+        # dbl power at duplicated freqs
+        scale = np.ones(Fn)
+        scale[1:Fl] = 2
     else:
-        csd_pairs = np.zeros((M, M, N), 'D')
         freqs = np.linspace(0, Fs / 2, N, endpoint=False)
-        for i in range(M):
-            for j in range(i + 1):
-                csd_pairs[i, j] = Sk_loc[i] * Sk_loc[j].conj()
+        scale = np.ones(N)
     if normalize:
-        csd_pairs /= (Fs*N)
+        scale /= (Fs * N)
 
-    csd_mat = csd_pairs.transpose(1,0,2).conj()
-    csd_mat += csd_pairs
-    diag_idc = (np.arange(M), np.arange(M))
-    csd_mat[diag_idc] /= 2
+    # csd_pairs[i, j] = Sk[i] * Sk[j].conj(), for j >= i
+    csd_pairs = np.empty((M * (M + 1) // 2, len(freqs)), 'D')
+    start = 0
+    for i in range(M):
+        row = csd_pairs[start:start + M - i]
+        np.multiply(Sk_loc[i], Sk_loc[i:].conj(), row)
+        row *= scale
+        # the psd is real-valued
+        row[0].imag = 0
+        start += M - i
 
-    return freqs, csd_mat
+    if triu:
+        return freqs, csd_pairs
+    return freqs, utils.CondensedMatrix(csd_pairs, M).toarray()
 
 
 def dpss_windows(N, NW, Kmax, interp_from=None, interp_kind='linear'):
@@ -496,7 +617,122 @@ def dpss_windows(N, NW, Kmax, interp_from=None, interp_kind='linear'):
 
     return dpss, eigvals
 
-def tapered_spectra(s, tapers, NFFT=None, low_bias=True):
+
+class DPSSCache(object):
+    """
+    A process-wide, memory-bounded cache of DPSS tapers.
+
+    Computing the tapers (a banded eigensolve followed by inverse iteration)
+    is often the most expensive part of a multitaper estimate of a short
+    time-series, and batch jobs tend to request the same tapers over and over
+    again. Entries are keyed on (N, NW, Kmax, low_bias, interp_from,
+    interp_kind) and the least recently used entries are evicted once the
+    total size of the cached arrays exceeds max_bytes.
+
+    The cached arrays are marked as read-only, since they are shared between
+    all callers.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The memory cap for the cached tapers and eigenvalues. Setting this to
+        0 disables caching. Defaults to 64 MB.
+
+    Attributes
+    ----------
+    hits, misses, evictions : int
+        Counters of cache hits, misses and evicted entries.
+
+    """
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """The total size (in bytes) of the arrays currently in the cache"""
+        return self._nbytes
+
+    def get(self, N, NW, Kmax, low_bias=False, interp_from=None,
+            interp_kind='linear'):
+        """
+        Return the DPSS tapers and their eigenvalues, computing them with
+        :func:`dpss_windows` only if they are not already in the cache.
+
+        Parameters
+        ----------
+        N, NW, Kmax, interp_from, interp_kind :
+            See :func:`dpss_windows`
+
+        low_bias : bool
+            Keep only the tapers with > 90% energy concentration.
+
+        Returns
+        -------
+        dpss, eigvals : read-only ndarrays
+        """
+        key = (int(N), float(NW), int(Kmax), bool(low_bias),
+               None if interp_from is None else int(interp_from),
+               interp_kind)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # Re-insert, marking this as the most recently used entry:
+                self._entries[key] = entry
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        dpss, eigvals = dpss_windows(N, NW, Kmax, interp_from=interp_from,
+                                     interp_kind=interp_kind)
+        if low_bias:
+            keepers = (eigvals > 0.9)
+            dpss = dpss[keepers]
+            eigvals = eigvals[keepers]
+        dpss.flags.writeable = False
+        eigvals.flags.writeable = False
+        entry = (dpss, eigvals)
+
+        nbytes = dpss.nbytes + eigvals.nbytes
+        with self._lock:
+            if nbytes <= self.max_bytes and key not in self._entries:
+                self._entries[key] = entry
+                self._nbytes += nbytes
+                self._evict()
+        return entry
+
+    def resize(self, max_bytes):
+        """Set a new memory cap, evicting entries as needed"""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def clear(self):
+        """Remove all the entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, (dpss, eigvals) = self._entries.popitem(last=False)
+            self._nbytes -= dpss.nbytes + eigvals.nbytes
+            self.evictions += 1
+
+
+# The process-wide cache used by all the multitaper routines:
+dpss_cache = DPSSCache()
+
+def tapered_spectra(s, tapers, NFFT=None, low_bias=True, sides='twosided'):
     """
     Compute the tapered spectra of the rows of s.
 
@@ -508,7 +744,8 @@ def tapered_spectra(s, tapers, NFFT=None, low_bias=True):
 
     tapers : ndarray or container
         Either the precomputed DPSS tapers, or the pair of parameters
-        (NW, K) needed to compute K tapers of length n_pts.
+        (NW, K) needed to compute K tapers of length n_pts. In the latter
+        case, the tapers are taken from (and stored in) :data:`dpss_cache`.
 
     NFFT : int
         Number of FFT bins to compute
@@ -517,10 +754,15 @@ def tapered_spectra(s, tapers, NFFT=None, low_bias=True):
         If compute DPSS, automatically select tapers corresponding to
         > 90% energy concentration.
 
+    sides : str in {'onesided', 'twosided'}
+        If 'onesided', only the NFFT // 2 + 1 non-negative frequencies are
+        returned. For real-valued s these are computed with a real-input FFT,
+        which takes roughly half the time and memory of the full transform.
+
     Returns
     -------
 
-    t_spectra : ndarray, shaped (n_arr, K, NFFT)
+    t_spectra : ndarray, shaped (n_arr, K, NFFT) or (n_arr, K, NFFT//2 + 1)
       The FFT of the tapered sequences in s. First dimension is squeezed
       out if n_arr is 1.
     eigvals : ndarray
@@ -540,13 +782,8 @@ def tapered_spectra(s, tapers, NFFT=None, low_bias=True):
 
     if not isinstance(tapers, np.ndarray):
         # then tapers is (NW, K)
-        args = (N,) + tuple(tapers)
-        dpss, eigvals = dpss_windows(*args)
-        if low_bias:
-            keepers = (eigvals > 0.9)
-            dpss = dpss[keepers]
-            eigvals = eigvals[keepers]
-        tapers = dpss
+        NW, Kmax = tapers
+        tapers, eigvals = dpss_cache.get(N, NW, Kmax, low_bias=low_bias)
     else:
         eigvals = None
     K = tapers.shape[0]
@@ -556,15 +793,23 @@ def tapered_spectra(s, tapers, NFFT=None, low_bias=True):
     # tapered.shape is (M, Kmax, N)
     tapered = s[sig_sl] * tapers
 
-    # compute the y_{i,k}(f) -- full FFT takes ~1.5x longer, but unpacking
-    # results of real-valued FFT eats up memory
-    t_spectra = fftpack.fft(tapered, n=NFFT, axis=-1)
-    t_spectra.shape = rest_of_dims + (K, NFFT)
+    # compute the y_{i,k}(f)
+    if sides == 'onesided':
+        if np.iscomplexobj(tapered):
+            t_spectra = fftpack.fft(tapered, n=NFFT, axis=-1)
+            t_spectra = t_spectra[..., :NFFT // 2 + 1]
+        else:
+            # numpy's rfft (unlike fftpack's) returns the complex
+            # non-negative frequencies, with no unpacking needed:
+            t_spectra = np.fft.rfft(tapered, n=NFFT, axis=-1)
+    else:
+        t_spectra = fftpack.fft(tapered, n=NFFT, axis=-1)
+    t_spectra.shape = rest_of_dims + (K, t_spectra.shape[-1])
     if eigvals is None:
         return t_spectra
     return t_spectra, eigvals
 
-def mtm_cross_spectrum(tx, ty, weights, sides='twosided'):
+def mtm_cross_spectrum(tx, ty, weights, sides='twosided', NFFT=None):
     r"""
 
     The cross-spectrum between two tapered time-series, derived from a
@@ -591,6 +836,11 @@ def mtm_cross_spectrum(tx, ty, weights, sides='twosided'):
        of the frequencies and scale the duplicate frequencies in the range
        (0, F_nyquist).
 
+    NFFT : int (optional)
+       The length of the transforms in tx, ty. Defaults to tx.shape[-1]. If
+       sides is 'onesided' and tx holds only the NFFT // 2 + 1 non-negative
+       frequencies (see :func:`tapered_spectra`), NFFT needs to be provided.
+
     Notes
     -----
 
@@ -602,6 +852,8 @@ def mtm_cross_spectrum(tx, ty, weights, sides='twosided'):
 
     """
     N = tx.shape[-1]
+    if NFFT is None:
+        NFFT = N
     if ty.shape != tx.shape:
         raise ValueError('shape mismatch between tx, ty')
 
@@ -619,9 +871,9 @@ def mtm_cross_spectrum(tx, ty, weights, sides='twosided'):
         weights_y = weights
         denom = (np.abs(weights) ** 2).sum(axis=0)
 
-    if sides == 'onesided':
+    if sides == 'onesided' and N > NFFT // 2 + 1:
         # where the nyq freq should be
-        Fn = N / 2 + 1
+        Fn = NFFT // 2 + 1
         truncated_slice = [slice(None)] * len(tx.shape)
         truncated_slice[-1] = slice(0, Fn)
         tsl = tuple(truncated_slice)
@@ -640,7 +892,7 @@ def mtm_cross_spectrum(tx, ty, weights, sides='twosided'):
 
     if sides == 'onesided':
         # dbl power at duplicated freqs
-        Fl = (N + 1) / 2
+        Fl = (NFFT + 1) // 2
         sub_slice = [slice(None)] * len(sf.shape)
         sub_slice[-1] = slice(1, Fl)
         sf[tuple(sub_slice)] *= 2
@@ -740,27 +992,29 @@ def multi_taper_psd(
     elif sides in ('default', 'onesided'):
         sides = 'onesided'
 
+    if NFFT is None or NFFT < N:
+        NFFT = N
+
     # Find the direct spectral estimators S_k(f) for k tapered signals..
     # don't normalize the periodograms by 1/N as normal.. since the taper
     # windows are orthonormal, they effectively scale the signal by 1/N
+    # For a one-sided estimate, only the non-negative frequencies are
+    # computed
     spectra, eigvals = tapered_spectra(
-        s, (NW, Kmax), NFFT=NFFT, low_bias=low_bias
+        s, (NW, Kmax), NFFT=NFFT, low_bias=low_bias, sides=sides
         )
-    NFFT = spectra.shape[-1]
     K = len(eigvals)
+    last_freq = spectra.shape[-1]
     # collapse spectra's shape back down to 3 dimensions
-    spectra.shape = (M, K, NFFT)
-
-    last_freq = NFFT / 2 + 1 if sides == 'onesided' else NFFT
+    spectra.shape = (M, K, last_freq)
 
     # degrees of freedom at each timeseries, at each freq
     nu = np.empty((M, last_freq))
     if adaptive:
-        weights = np.empty((M, K, last_freq))
-        for i in range(M):
-            weights[i], nu[i] = utils.adaptive_weights(
-                spectra[i], eigvals, sides=sides
-                )
+        # all the channels are weighted together
+        weights, nu[:] = utils.adaptive_weights(
+            spectra, eigvals, sides=sides, NFFT=NFFT
+            )
     else:
         # let the weights simply be the square-root of the eigenvalues.
         # repeat these values across all n_chan channels of data
@@ -768,11 +1022,9 @@ def multi_taper_psd(
         nu.fill(2 * K)
 
     if jackknife:
-        jk_var = np.empty_like(nu)
-        for i in range(M):
-            jk_var[i] = utils.jackknifed_sdf_variance(
-                spectra[i], eigvals, sides=sides, adaptive=adaptive
-                )
+        jk_var = utils.jackknifed_sdf_variance(
+            spectra, eigvals, sides=sides, adaptive=adaptive, NFFT=NFFT
+            )
 
     # Compute the unbiased spectral estimator for S(f) as the sum of
     # the S_k(f) weighted by the function w_k(f)**2, all divided by the
@@ -782,12 +1034,12 @@ def multi_taper_psd(
     spectra = np.rollaxis(spectra, 1, start=0)
     weights = np.rollaxis(weights, 1, start=0)
     sdf_est = mtm_cross_spectrum(
-        spectra, spectra, weights, sides=sides
+        spectra, spectra, weights, sides=sides, NFFT=NFFT
         )
     sdf_est /= Fs
     
     if sides == 'onesided':
-        freqs = np.linspace(0, Fs / 2, NFFT / 2 + 1)
+        freqs = np.linspace(0, Fs / 2, NFFT // 2 + 1)
     else:
         freqs = np.linspace(0, Fs, NFFT, endpoint=False)
 
@@ -801,8 +1053,135 @@ def multi_taper_psd(
         return freqs, sdf_est, nu
 
 
+def multi_taper_spectrogram(s, Fs=2 * np.pi, window=default_nfft, step=None,
+                            NW=4, adaptive=False, low_bias=True,
+                            sides='default', NFFT=None, max_bytes=64 * 2 ** 20):
+    """Returns a time-frequency estimate of the PSD of s, computed with the
+    multitaper method over sliding windows.
+
+    Parameters
+    ----------
+    s : ndarray
+        An array of sampled random processes, where the time axis is assumed to
+        be on the last axis
+
+    Fs : float
+        Sampling rate of the signal
+
+    window : int
+        The length of each window, in samples
+
+    step : int
+        The number of samples between the starts of adjacent windows.
+        Defaults to window // 2
+
+    NW : float
+        The normalized half-bandwidth of the data tapers, indicating a
+        multiple of the fundamental frequency of the window. The number
+        of tapers used is 2 * NW
+
+    adaptive : {True/False}
+       Use an adaptive weighting routine to combine the PSD estimates of
+       different tapers.
+
+    low_bias : {True/False}
+       Rather than use 2NW tapers, only use the tapers that have better than
+       90% spectral concentration within the bandwidth (still using
+       a maximum of 2NW tapers)
+
+    sides : str (optional)   [ 'default' | 'onesided' | 'twosided' ]
+         This determines which sides of the spectrum to return.
+         For complex-valued inputs, the default is two-sided, for real-valued
+         inputs, default is one-sided Indicates whether to return a one-sided
+         or two-sided
+
+    NFFT : int (optional)
+        The length of the FFT of each window. Defaults to window
+
+    max_bytes : int (optional)
+        The approximate memory used for the tapered spectra of each chunk of
+        windows that is transformed at once
+
+    Returns
+    -------
+    (times, freqs, S) : ndarrays
+        The centers of the windows (in the units of 1 / Fs), the frequency
+        points vector and the estimated PSD of each window, shaped
+        s.shape[:-1] + (len(times), len(freqs)).
+
+    Notes
+    -----
+
+    Every window is estimated just as :func:`multi_taper_psd` estimates a
+    whole signal. The tapers are computed only once, the windows are
+    strided views into s, and the windows are transformed in chunks
+    bounded by max_bytes.
+
+    """
+    N = s.shape[-1]
+    window = int(window)
+    step = window // 2 if step is None else int(step)
+    if window > N:
+        e_s = "The window (%d samples) is longer than " % window
+        e_s += "the time-series (%d samples)" % N
+        raise ValueError(e_s)
+    if step < 1:
+        raise ValueError("step must be a positive number of samples")
+
+    # if the time series is a complex vector, a one sided PSD is invalid:
+    if (sides == 'default' and np.iscomplexobj(s)) or sides == 'twosided':
+        sides = 'twosided'
+    elif sides in ('default', 'onesided'):
+        sides = 'onesided'
+
+    if NFFT is None or NFFT < window:
+        NFFT = window
+
+    rest_of_dims = s.shape[:-1]
+    s = s.reshape(-1, N)
+    M = s.shape[0]
+
+    tapers, eigvals = dpss_cache.get(window, NW, int(2 * NW),
+                                     low_bias=low_bias)
+    K = len(eigvals)
+    if not adaptive:
+        weights = np.sqrt(eigvals)[:, None, None, None]
+
+    segments = _welch_segments(s, window, window - step)
+    n_windows = segments.shape[1]
+    L = NFFT // 2 + 1 if sides == 'onesided' else NFFT
+    # the number of windows whose tapered spectra fit in max_bytes
+    chunk = max(1, int(max_bytes // (M * K * NFFT * 16)))
+
+    S = np.empty((M, n_windows, L))
+    for start in range(0, n_windows, chunk):
+        sl = slice(start, start + chunk)
+        # spectra.shape is (M, n_chunk, K, L)
+        spectra = tapered_spectra(segments[:, sl], tapers, NFFT=NFFT,
+                                  sides=sides)
+        if adaptive:
+            weights, _ = utils.adaptive_weights(spectra, eigvals,
+                                                sides=sides, NFFT=NFFT)
+            weights = np.rollaxis(weights, 2)
+        # roll the tapers axis forward
+        spectra = np.rollaxis(spectra, 2)
+        S[:, sl] = mtm_cross_spectrum(spectra, spectra, weights, sides=sides,
+                                      NFFT=NFFT)
+    S /= Fs
+
+    times = (np.arange(n_windows) * step + window / 2.0) / Fs
+    if sides == 'onesided':
+        freqs = np.linspace(0, Fs / 2, NFFT // 2 + 1)
+    else:
+        freqs = np.linspace(0, Fs, NFFT, endpoint=False)
+
+    S.shape = rest_of_dims + (n_windows, L)
+    return times, freqs, S
+
+
 def multi_taper_csd(s, Fs=2 * np.pi, NW=None, BW=None, low_bias=True,
-                    adaptive=False, sides='default', NFFT=None):
+                    adaptive=False, sides='default', NFFT=None, out=None,
+                    triu=False):
     """Returns an estimate of the Cross Spectral Density (CSD) function
     between all (N choose 2) pairs of timeseries in s, using the multitaper
     method. If the NW product, or the BW and Fs in Hz are not specified by
@@ -842,12 +1221,25 @@ def multi_taper_csd(s, Fs=2 * np.pi, NW=None, BW=None, low_bias=True,
          inputs, default is one-sided Indicates whether to return a one-sided
          or two-sided
 
+    NFFT : int (optional)
+        Number of FFT bins to compute
+
+    out : ndarray (optional)
+        A complex array to write the CSD into, shaped like the returned
+        csd_est
+
+    triu : {True, False}
+        Only compute the upper triangle (i <= j) of the CSD matrix, in the
+        order given by triu_indices(M). This halves the memory needed for
+        many channels.
+
     Returns
     -------
     (freqs, csd_est) : ndarrays
         The estimatated CSD and the frequency points vector.
         The CSD{i,j}(f) are returned in a square "matrix" of vectors
-        holding Sij(f). For an input array of (M,N), the output is (M,M,N)
+        holding Sij(f). For an input array of (M,N), the output is (M,M,N),
+        or (M*(M+1)/2, N) if triu is True
 
     Notes
     -----
@@ -880,57 +1272,74 @@ def multi_taper_csd(s, Fs=2 * np.pi, NW=None, BW=None, low_bias=True,
     elif sides in ('default', 'onesided'):
         sides = 'onesided'
 
+    if NFFT is None or NFFT < N:
+        NFFT = N
+
     # Find the direct spectral estimators S_k(f) for k tapered signals..
     # don't normalize the periodograms by 1/N as normal.. since the taper
     # windows are orthonormal, they effectively scale the signal by 1/N
+    # For a one-sided estimate, only the non-negative frequencies are
+    # computed
     spectra, eigvals = tapered_spectra(
-        s, (NW, Kmax), NFFT=NFFT, low_bias=low_bias
+        s, (NW, Kmax), NFFT=NFFT, low_bias=low_bias, sides=sides
         )
-    NFFT = spectra.shape[-1]
     K = len(eigvals)
+    last_freq = spectra.shape[-1]
     # collapse spectra's shape back down to 3 dimensions
-    spectra.shape = (M, K, NFFT)
+    spectra.shape = (M, K, last_freq)
 
     # compute the cross-spectral density functions
-    last_freq = NFFT / 2 + 1 if sides == 'onesided' else NFFT
 
     if adaptive:
-        w = np.empty((M, K, last_freq))
-        nu = np.empty((M, last_freq))
-        for i in range(M):
-            w[i], nu[i] = utils.adaptive_weights(
-                spectra[i], eigvals, sides=sides
-                )
+        # all the channels are weighted together
+        w, nu = utils.adaptive_weights(
+            spectra, eigvals, sides=sides, NFFT=NFFT
+            )
     else:
-        weights = np.sqrt(eigvals).reshape(K, 1)
+        w = np.sqrt(eigvals).reshape(K, 1)
 
-    csd_pairs = np.zeros((M, M, last_freq), 'D')
-    for i in range(M):
-        if adaptive:
-            wi = w[i]
+    # CSD_ij(f) is the inner product of the weighted spectra of channels i
+    # and j (see mtm_cross_spectrum), so pre-weight the spectra and find
+    # all the pairs at each frequency with a single matrix product
+    spectra *= w
+    spectra /= np.sqrt((w ** 2).sum(axis=-2))[..., None, :]
+    spectra = np.ascontiguousarray(spectra.transpose(2, 0, 1))
+
+    # the power at the duplicated freqs is doubled
+    scale = np.ones(last_freq) / Fs
+    if sides == 'onesided':
+        scale[1:(NFFT + 1) // 2] *= 2
+
+    if triu:
+        out_shape = (M * (M + 1) // 2, last_freq)
+    else:
+        out_shape = (M, M, last_freq)
+    if out is None:
+        out = np.empty(out_shape, 'D')
+    elif out.shape != out_shape:
+        e_s = "out has shape %s, but the CSD has shape %s" % (out.shape,
+                                                              out_shape)
+        raise ValueError(e_s)
+    iu = triu_indices(M, 1)
+    diag = (np.arange(M), np.arange(M))
+    iu_diag = triu_indices(M)
+    for f in range(last_freq):
+        csd_f = np.dot(spectra[f], spectra[f].conj().T)
+        # make the matrix exactly Hermitian
+        csd_f[iu] = csd_f.T[iu].conj()
+        csd_f[diag] = csd_f[diag].real
+        csd_f *= scale[f]
+        if triu:
+            out[:, f] = csd_f[iu_diag]
         else:
-            wi = weights
-        for j in range(i + 1):
-            if adaptive:
-                wj = w[j]
-            else:
-                wj = weights
-            ti = spectra[i]
-            tj = spectra[j]
-            csd_pairs[i, j] = mtm_cross_spectrum(ti, tj, (wi, wj), sides=sides)
-
-    csdfs = csd_pairs.transpose(1,0,2).conj()
-    csdfs += csd_pairs
-    diag_idc = (np.arange(M), np.arange(M))
-    csdfs[diag_idc] /= 2
-    csdfs /= Fs
-    
+            out[..., f] = csd_f
+
     if sides == 'onesided':
-        freqs = np.linspace(0, Fs / 2, NFFT / 2 + 1)
+        freqs = np.linspace(0, Fs / 2, NFFT // 2 + 1)
     else:
         freqs = np.linspace(0, Fs, NFFT, endpoint=False)
 
-    return freqs, csdfs
+    return freqs, out
 
 
 def freq_response(b, a=1., n_freqs=1024, sides='onesided'):
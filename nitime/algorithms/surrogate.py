@@ -0,0 +1,232 @@
+"""
+Surrogate-based significance testing.
+
+Statistics of the data (such as the coherence between all pairs of
+time-series) are compared against their distribution over surrogate data, in
+which the relationships between the time-series are destroyed, while the
+spectrum of each time-series is kept. The surrogates are generated directly in
+the frequency domain, from a single FFT of the data.
+
+"""
+
+import multiprocessing
+
+import numpy as np
+
+from .cohere import coherence
+from .correlation import seed_corrcoef
+
+__all__ = ["surrogate_test", "surrogates", "coherence_statistic",
+           "seed_corrcoef_statistic"]
+
+# The data of the worker processes (see _init_worker):
+_worker_data = {}
+
+
+def surrogates(time_series, n_surrogates=1, method='phase', seed=None,
+               fft=None):
+    """
+    Generate surrogate time-series, with the same power spectrum as each of
+    the input time-series, but with random relationships between them.
+
+    Parameters
+    ----------
+    time_series : float array
+       An array of time-series, with time as the last dimension
+
+    n_surrogates : int, optional
+       The number of surrogates to generate
+
+    method : str, optional
+       'phase' (the default) randomizes the phase of every frequency of every
+       time-series, independently. 'shift' circularly shifts each time-series
+       by a random number of samples.
+
+    seed : int, array or RandomState, optional
+       The seed of the random number generator (or the generator itself)
+
+    fft : complex array, optional
+       The real FFT of time_series (np.fft.rfft along the last dimension), if
+       it was already computed
+
+    Returns
+    -------
+    s : float array (n_surrogates, ) + time_series.shape
+       The surrogate time-series
+    """
+    time_series = np.asarray(time_series)
+    if np.iscomplexobj(time_series):
+        e_s = "Surrogates can only be generated for real time-series"
+        raise ValueError(e_s)
+    if fft is None:
+        fft = np.fft.rfft(time_series, axis=-1)
+    if isinstance(seed, np.random.RandomState):
+        rng = seed
+    else:
+        rng = np.random.RandomState(seed)
+
+    n_time = time_series.shape[-1]
+    shape = (n_surrogates,) + fft.shape
+    if method == 'phase':
+        phases = rng.uniform(0, 2 * np.pi, shape)
+        # The DC (and Nyquist) components need to stay real:
+        phases[..., 0] = 0
+        if n_time % 2 == 0:
+            phases[..., -1] = 0
+    elif method == 'shift':
+        shifts = rng.randint(0, n_time, shape[:-1])
+        phases = (-2 * np.pi / n_time) * (shifts[..., None] *
+                                          np.arange(fft.shape[-1]))
+    else:
+        e_s = "method must be either 'phase' or 'shift'"
+        raise ValueError(e_s)
+
+    return np.fft.irfft(fft * np.exp(1j * phases), n=n_time, axis=-1)
+
+
+def coherence_statistic(time_series, csd_method=None):
+    """The coherence between all the pairs of time-series (see
+    :func:`coherence`), without the frequencies"""
+    return coherence(time_series, csd_method)[1]
+
+
+def seed_corrcoef_statistic(time_series, n_seeds=1):
+    """The correlation of each of the first n_seeds time-series (the seeds)
+    with each of the other time-series (the targets), shaped (n_seeds,
+    n_targets). See :func:`seed_corrcoef`"""
+    targets = time_series[n_seeds:]
+    return np.array([seed_corrcoef(seed, targets)
+                     for seed in time_series[:n_seeds]])
+
+
+def _init_worker(time_series, fft, stat, method, seed, observed, keep_null):
+    """Keep the data in each worker process, so that it is only sent once"""
+    _worker_data.update(time_series=time_series, fft=fft, stat=stat,
+                        method=method, seed=seed, observed=observed,
+                        keep_null=keep_null)
+
+
+def _surrogate_batch(batch):
+    """Compare the statistic of a batch of surrogates with the observed one.
+
+    Each batch has its own random stream, seeded by (seed, batch index), so
+    that the results do not depend on how the batches are distributed.
+    """
+    index, n_surrogates = batch
+    d = _worker_data
+    rng = np.random.RandomState([d['seed'], index])
+    counts = np.zeros(d['observed'].shape, dtype=int)
+    null = []
+    for s in surrogates(d['time_series'], n_surrogates, d['method'], rng,
+                        d['fft']):
+        this_stat = np.asarray(d['stat'](s))
+        counts += this_stat >= d['observed']
+        if d['keep_null']:
+            null.append(this_stat)
+    return counts, null
+
+
+def surrogate_test(time_series, stat, n_surrogates=1000, method='phase',
+                   quantiles=None, seed=0, n_jobs=1, batch_size=50):
+    """
+    Test the significance of a statistic of a set of time-series against its
+    distribution over surrogate data.
+
+    Parameters
+    ----------
+    time_series : float array
+       An array of time-series, with time as the last dimension
+
+    stat : callable
+       A function of a time_series array, returning an array of statistics
+       (for example, :func:`coherence_statistic`, for the coherence of all
+       pairs at all frequencies). Large values are taken to be significant.
+       With n_jobs > 1, it needs to be picklable (a module-level function, or
+       a functools.partial of one).
+
+    n_surrogates : int, optional
+       The number of surrogates
+
+    method : str, optional
+       How the surrogates are generated (see :func:`surrogates`)
+
+    quantiles : float or sequence of floats, optional
+       Quantiles (between 0 and 1) of the null distribution of the statistic
+       to return. Calculating these requires keeping the statistic of all the
+       surrogates.
+
+    seed : int, RandomState or None, optional
+       The seed of the random number generators. The surrogates are generated
+       in batches, the i-th of which uses a generator seeded with (seed, i),
+       so the results do not depend on n_jobs. With None (or a RandomState),
+       the integer seed is drawn at random (or from the RandomState).
+
+    n_jobs : int, optional
+       The number of processes to run the batches of surrogates in. -1 uses
+       all the CPUs.
+
+    batch_size : int, optional
+       The number of surrogates in each batch
+
+    Returns
+    -------
+    observed : array
+       The statistic of the data
+
+    p : array
+       The p-value of each element of observed: the fraction of surrogates
+       (counting the data as one) with a statistic at least as large
+
+    null_quantiles : array or None
+       The requested quantiles of the null distribution, shaped
+       (len(quantiles), ) + observed.shape, or None if no quantiles were
+       requested
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> import nitime.algorithms as tsa
+    >>> x = np.random.randn(3, 1024)
+    >>> x[1] += x[0]
+    >>> c, p, q = tsa.surrogate_test(x, tsa.coherence_statistic,
+    ...                              n_surrogates=99, quantiles=0.95)
+    >>> bool(np.all(p[0, 1] < 0.05))
+    True
+    """
+    time_series = np.asarray(time_series)
+    if seed is None:
+        seed = np.random.RandomState()
+    if isinstance(seed, np.random.RandomState):
+        seed = seed.randint(2 ** 31)
+    observed = np.asarray(stat(time_series))
+    fft = np.fft.rfft(time_series, axis=-1)
+    keep_null = quantiles is not None
+    init_args = (time_series, fft, stat, method, seed, observed, keep_null)
+
+    batches = [(i, min(batch_size, n_surrogates - start))
+               for i, start in enumerate(range(0, n_surrogates, batch_size))]
+
+    if n_jobs == -1:
+        n_jobs = multiprocessing.cpu_count()
+    if n_jobs > 1:
+        pool = multiprocessing.Pool(n_jobs, _init_worker, init_args)
+        try:
+            results = pool.map(_surrogate_batch, batches)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init_worker(*init_args)
+        results = [_surrogate_batch(batch) for batch in batches]
+    _worker_data.clear()
+
+    counts = np.sum([r[0] for r in results], 0)
+    p = (counts + 1.0) / (n_surrogates + 1)
+
+    null_quantiles = None
+    if keep_null:
+        null = np.array([s for r in results for s in r[1]])
+        null_quantiles = np.array([np.percentile(null, 100 * q, axis=0)
+                                   for q in np.atleast_1d(quantiles)])
+
+    return observed, p, null_quantiles
@@ -214,3 +214,67 @@ def test_lwr():
 
         # compute |Ax-b| / |b| metric
         npt.assert_almost_equal(l2_d / l2_r, 0, decimal=5)
+
+
+def test_lwr_batch():
+    "test that a batch of systems gives the same solutions as each system"
+    x = np.random.randn(5, 3, 500)
+    r = np.array([utils.autocov_vector(this_x, nlags=4).transpose(2, 0, 1)
+                  for this_x in x])
+    a, Va = tsa.lwr_recursion(r)
+    npt.assert_equal(a.shape, (5, 3, 3, 3))
+    npt.assert_equal(Va.shape, (5, 3, 3))
+    for this_r, this_a, this_Va in zip(r, a, Va):
+        a1, Va1 = tsa.lwr_recursion(this_r)
+        npt.assert_almost_equal(this_a, a1)
+        npt.assert_almost_equal(this_Va, Va1)
+
+
+def test_granger_causality_xy_batch():
+    "test that a batch of models gives the same causality as each model"
+    a = 0.2 * np.random.randn(4, 3, 2, 2)
+    cov = np.array([[1, 0.3], [0.3, 0.8]]) * np.arange(1, 5)[:, None, None]
+    w, f_x2y, f_y2x, f_xy, Sw = tsa.granger_causality_xy(a, cov, n_freqs=64)
+    npt.assert_equal(f_x2y.shape, (4, 33))
+    npt.assert_equal(Sw.shape, (4, 2, 2, 33))
+    for k in range(4):
+        w1, Hw = tsa.transfer_function_xy(a[k], n_freqs=64)
+        npt.assert_almost_equal(Sw[k], tsa.spectral_matrix_xy(Hw, cov[k]))
+        out = tsa.granger_causality_xy(a[k], cov[k], n_freqs=64)
+        for batch_out, this_out in zip((w, f_x2y[k], f_y2x[k], f_xy[k]), out):
+            npt.assert_almost_equal(batch_out, this_out)
+
+    # The transfer function is the inverse of the z-transform of the
+    # coefficients (with a(0) the identity), on the grid of freq_response:
+    w1, Hw = tsa.transfer_function_xy(a[0], n_freqs=64)
+    for i, j in [(0, 0), (0, 1)]:
+        w2, aw = tsa.freq_response(np.r_[float(i == j), a[0, :, i, j]],
+                                   n_freqs=64)
+        npt.assert_almost_equal(w1, w2)
+        Aw = np.linalg.inv(np.rollaxis(Hw, -1))
+        npt.assert_almost_equal(Aw[:, i, j], aw)
+
+
+def test_conditional_granger_causality():
+    "test that the reduced models are those fit to the data without a source"
+    x = np.random.randn(4, 2000)
+    for t in range(1, 2000):
+        x[1, t] += 0.6 * x[0, t - 1]
+        x[2, t] += 0.6 * x[1, t - 1]
+    gc = tsa.conditional_granger_causality(x, 2)
+    npt.assert_(np.all(np.isnan(np.diag(gc))))
+    a, ecov = tsa.MAR_est_LWR(x, 3)
+    for j in range(4):
+        keep = np.delete(np.arange(4), j)
+        a_j, ecov_j = tsa.MAR_est_LWR(x[keep], 3)
+        npt.assert_almost_equal(gc[keep, j],
+                                np.log(np.diag(ecov_j) / np.diag(ecov)[keep]))
+    # The chain x0 -> x1 -> x2 has no direct causality from x0 to x2:
+    npt.assert_(gc[1, 0] > 0.1 and gc[2, 1] > 0.1)
+    npt.assert_(gc[2, 0] < 0.01)
+    gc1 = tsa.conditional_granger_causality(x, 2, sources=[1])
+    npt.assert_almost_equal(gc1[:, 1], gc[:, 1])
+    npt.assert_(np.all(np.isnan(gc1[:, [0, 2, 3]])))
+    # With the full model already fit:
+    gc2 = tsa.conditional_granger_causality(x, 2, sources=[1], ecov=ecov)
+    npt.assert_almost_equal(gc2[:, 1], gc[:, 1])
@@ -6,6 +6,8 @@ Tests of functions under algorithms.coherence
 """
 
 import os
+import shutil
+import tempfile
 import warnings
 
 import numpy as np
@@ -104,6 +106,24 @@ def test_coherence_regularized():
         npt.assert_array_almost_equal(c[0, 1], c[1, 0])
 
 
+def test_coherence_condensed():
+    """
+    Tests that the condensed outputs hold the upper triangle of the full
+    matrices
+    """
+    ts3 = np.vstack([tseries, x[::-1]])
+    for method in methods:
+        f, fxy = tsa.get_spectra(ts3, method)
+        f, fxy_c = tsa.get_spectra(ts3, method, condensed=True)
+        npt.assert_array_almost_equal(fxy_c.toarray(), fxy)
+        for func in (tsa.coherency, tsa.coherence):
+            f, c = func(ts3, csd_method=method)
+            f, c_c = func(ts3, csd_method=method, condensed=True)
+            npt.assert_(isinstance(c_c, utils.CondensedMatrix))
+            npt.assert_array_almost_equal(c_c.toarray(), c)
+            npt.assert_array_almost_equal(c_c[2, 0], c[2, 0])
+
+
 # Define as global for the following functions:
 
 def test_coherency_bavg():
@@ -136,6 +156,37 @@ def test_coherence_bavg():
                 npt.assert_almost_equal(c[0, 1], c[1, 0].conjugate())
 
 
+def test_coherence_bands():
+    """Test the multi-band summaries against the single-band functions"""
+    x = np.random.randn(3, 1000)
+    x[1] += x[0]
+    bands = [(0, np.pi / 2), (0.2, None), (1, 2)]
+    iu = np.triu_indices(3, 1)
+    for method in methods:
+        c = tsa.coherence_bands(x, bands, csd_method=method)
+        cy = tsa.coherence_bands(x, bands, csd_method=method,
+                                 measure='coherency')
+        ph = tsa.coherence_bands(x, bands, csd_method=method,
+                                 measure='phase')
+        npt.assert_equal(c.shape, (3, 3))
+        for b, (lb, ub) in enumerate(bands):
+            c_bavg = tsa.coherence_bavg(x, lb=lb, ub=ub, csd_method=method)
+            npt.assert_almost_equal(c[:, b], c_bavg[iu])
+            cy_bavg = tsa.coherency_bavg(x, lb=lb, ub=ub, csd_method=method)
+            npt.assert_almost_equal(cy[:, b], cy_bavg[iu])
+            npt.assert_almost_equal(np.exp(1j * ph[:, b]),
+                                    np.exp(1j * np.angle(cy_bavg[iu])))
+
+    # Any pairs, in any order:
+    c = tsa.coherence_bands(x, bands, ij=[(2, 0), (1, 1)])
+    c_bavg = tsa.coherence_bavg(x, lb=1, ub=2)
+    npt.assert_almost_equal(c[:, 2], [c_bavg[2, 0], 1])
+
+    npt.assert_raises(ValueError, tsa.coherence_bands, x, [(1, 1.01)])
+    npt.assert_raises(ValueError, tsa.coherence_bands, x, bands,
+                      measure='delay')
+
+
 # XXX FIXME: This doesn't work for the periodogram method:
 def test_coherence_partial():
     """ Test partial coherence"""
@@ -151,6 +202,38 @@ def test_coherence_partial():
             npt.assert_array_almost_equal(c[0, 1], c[1, 0].conjugate())
 
 
+def test_coherence_partial_matrix():
+    """ Test the partial coherence given each and given all other channels"""
+    x = np.random.randn(4, 2000)
+    x[1] += np.roll(x[0], 3)
+    x[2] += np.roll(x[1], 2) + x[3]
+    f, fxy = tsa.get_spectra(x)
+
+    c = tsa.coherence_partial_matrix(fxy)
+    npt.assert_equal(c.shape, (4, 4, 4, f.shape[0]))
+    # Symmetric, and 0 when conditioning on one of the pair:
+    npt.assert_almost_equal(c, c.transpose(1, 0, 2, 3))
+    npt.assert_equal(c[0, 1, 1], 0)
+    # Against the calculation for one pair:
+    npt.assert_almost_equal(c[0, 2, 1],
+                            tsa.coherence_partial_spec(fxy[0, 2], fxy[0, 0],
+                                                       fxy[2, 2], fxy[0, 1],
+                                                       fxy[1, 2], fxy[1, 1]))
+    # And against the time-domain function:
+    f, c02 = tsa.coherence_partial(x[[0, 2]], x[1])
+    npt.assert_almost_equal(c02[0, 1], c[0, 2, 1])
+
+    # With three channels, partialing out all others is partialing out the
+    # third one:
+    c_full = tsa.coherence_partial_full(fxy[:3, :3])
+    npt.assert_almost_equal(c_full[0, 2], c[0, 2, 1])
+    npt.assert_almost_equal(c_full[1, 1], np.ones(f.shape[0]))
+
+    # x[0] only relates to x[2] through x[1]:
+    c_full = tsa.coherence_partial_full(fxy)
+    npt.assert_(np.mean(c_full[0, 2]) < np.mean(c_full[0, 1]))
+
+
 def test_coherence_phase_delay():
     """
 
@@ -174,6 +257,35 @@ def test_coherence_phase_delay():
                                 pdelay[0, 1][1:] / (2 * np.pi * f2))
 
 
+def test_pair_phase():
+    """The phases of a set of pairs are the same as those in the full matrix
+    of pairs, and circular averaging is not biased by phase wrapping"""
+    x = np.random.randn(4, t.shape[-1])
+    pairs = np.array([[0, 1], [3, 2], [1, 3]])
+    f1, p_all = tsa.coherency_phase_spectrum(x)
+    f2, p_pairs = tsa.coherency_phase_spectrum(x, ij=pairs)
+    npt.assert_almost_equal(p_pairs, p_all[pairs[:, 0], pairs[:, 1]])
+    f1, d_all = tsa.coherency_phase_delay(x, ub=0.3)
+    f2, d_pairs = tsa.coherency_phase_delay(x, ub=0.3, ij=pairs)
+    npt.assert_almost_equal(d_pairs, d_all[pairs[:, 0], pairs[:, 1]])
+
+    # Two time-series with a phase difference of about pi at all frequencies,
+    # so that the phases in individual windows wrap around +/- pi:
+    y = np.vstack([x[0], -x[0] + 0.1 * x[1]])
+    f, cache = tsa.cache_fft(y, [(0, 1)])
+    ph_mean = tsa.cache_to_relative_phase(cache, [(0, 1)], compact=True)
+    ph_circ = tsa.cache_to_relative_phase(cache, [(0, 1)], compact=True,
+                                          average='circular')
+    npt.assert_equal(ph_circ.shape, (1, f.shape[0]))
+    npt.assert_(np.all(np.cos(ph_circ) < -0.9))
+    npt.assert_(np.any(np.abs(ph_mean) < np.pi / 2))
+    ph = tsa.cache_to_relative_phase(cache, [(0, 1)], average='weighted')
+    coh = tsa.cache_to_coherency(cache, [(0, 1)])
+    npt.assert_almost_equal(ph[0, 1], np.angle(coh[0, 1]))
+    npt.assert_raises(ValueError, tsa.cache_to_relative_phase, cache,
+                      [(0, 1)], average='foo')
+
+
 def test_coherency_cached():
     """Tests that the cached coherency gives the same result as the standard
     coherency"""
@@ -387,3 +499,172 @@ def test_cache_to_coherency():
 
     cxy_one_window = tsa.cache_to_coherency(cache, ij)
     ph_one_window = tsa.cache_to_relative_phase(cache, ij)
+
+
+def test_cache_fft_channels():
+    """
+    Test that the cache only holds the channels in ij, and that the cached
+    quantities match the direct calculation for every pair
+
+    """
+    ts = np.random.randn(5, 1000)
+    ij = [(3, 1), (1, 3), (4, 1), (4, 4)]
+    freqs, cache = tsa.cache_fft(ts, ij)
+    npt.assert_equal(cache['channels'], [1, 3, 4])
+    npt.assert_equal(cache['FFT_slices'].shape[0], 3)
+
+    f, c = tsa.coherency(ts)
+    Cxy = tsa.cache_to_coherency(cache, ij)
+    for i, j in ij:
+        npt.assert_almost_equal(Cxy[i, j], c[i, j])
+
+    f, s = tsa.get_spectra(ts)
+    psd = tsa.cache_to_psd(cache, ij)
+    npt.assert_equal(sorted(psd.keys()), [1, 3, 4])
+    for i in psd:
+        npt.assert_almost_equal(psd[i], s[i, i].real)
+
+    # Asking for a channel that was not cached raises an error:
+    npt.assert_raises(ValueError, tsa.cache_to_coherency, cache, [(0, 1)])
+
+
+def test_cache_to_seed_coherency():
+    """
+    Test the seed coherency against the pairwise cached coherency
+
+    """
+    ts = np.random.randn(6, 1000)
+    seeds = [0, 2]
+    targets = [1, 3, 4, 5]
+    ij = [(i, j) for i in seeds for j in targets]
+    freqs, cache = tsa.cache_fft(ts, ij)
+    Cxy = tsa.cache_to_coherency(cache, ij)
+
+    freqs, seed_cache = tsa.cache_fft(ts[seeds], [(0, 1)])
+    freqs, target_cache = tsa.cache_fft(ts[targets], [(0, 1), (2, 3)])
+    Cst = tsa.cache_to_seed_coherency(seed_cache, target_cache)
+    npt.assert_equal(Cst.shape, (2, 4, freqs.shape[0]))
+    npt.assert_almost_equal(Cst, Cxy[seeds][:, targets])
+
+    # The caches need to match:
+    freqs, other_cache = tsa.cache_fft(ts[targets], [(0, 1)], lb=0.5)
+    npt.assert_raises(ValueError, tsa.cache_to_seed_coherency, seed_cache,
+                      other_cache)
+
+
+def test_cache_to_coherence_network():
+    """
+    Test the tiled coherence network against the dense band-averaged
+    coherence
+
+    """
+    n = 13
+    ts = np.random.randn(n, 1000)
+    ts[1:] += ts[:-1]
+    f, c_dense = tsa.coherence(ts)
+    lb_idx, ub_idx = 3, 20
+    c_bavg = tsa.coherence_bavg(ts, lb=f[lb_idx], ub=f[ub_idx])
+    c_mean = np.mean(c_dense[..., lb_idx:ub_idx + 1], -1)
+
+    freqs, cache = tsa.cache_fft(ts, [(i, i) for i in range(n)],
+                                 lb=f[lb_idx], ub=f[ub_idx])
+    iu = np.triu_indices(n, 1)
+    for average, c_full in [('bavg', c_bavg), ('mean', c_mean)]:
+        # All the pairs:
+        ij, c = tsa.cache_to_coherence_network(cache, average=average,
+                                               tile_size=4)
+        npt.assert_equal(ij, np.column_stack(iu))
+        npt.assert_almost_equal(c, c_full[iu])
+
+        # Thresholded, as a sparse matrix:
+        thresh = np.median(c_full[iu])
+        C = tsa.cache_to_coherence_network(cache, average=average,
+                                           threshold=thresh, tile_size=5,
+                                           sparse=True).toarray()
+        npt.assert_almost_equal(C, np.where(c_full >= thresh,
+                                            np.triu(c_full, 1), 0))
+
+        # The 3 strongest connections of each channel:
+        ij, c = tsa.cache_to_coherence_network(cache, average=average, k=3,
+                                               tile_size=4)
+        c_full[np.diag_indices(n)] = -np.inf
+        top = np.argsort(-c_full, 1)[:, :3]
+        npt.assert_equal(ij[:, 0], np.repeat(np.arange(n), 3))
+        npt.assert_equal(ij[:, 1], top.ravel())
+        npt.assert_almost_equal(c, np.sort(c_full, 1)[:, ::-1][:, :3].ravel())
+
+    npt.assert_raises(ValueError, tsa.cache_to_coherence_network, cache,
+                      average='max')
+
+
+def test_cache_fft_store():
+    """
+    Test that the FFT slices kept on disk give the same results as the ones
+    computed in memory, and that they are reused
+
+    """
+    ts = np.random.randn(4, 1000)
+    ij = [(0, 1), (2, 1), (3, 3)]
+    store = tempfile.mkdtemp()
+    try:
+        for lb, ub in [(0, None), (0.5, 1.5)]:
+            f1, cache1 = tsa.cache_fft(ts, ij, lb=lb, ub=ub, transform='fft')
+            f2, cache2 = tsa.cache_fft(ts, ij, lb=lb, ub=ub, store=store)
+            npt.assert_equal(f1, f2)
+            npt.assert_equal(cache2['channels'], np.arange(4))
+            npt.assert_equal(cache2['FFT_slices'][cache1['channels']],
+                             cache1['FFT_slices'])
+            npt.assert_equal(tsa.cache_to_psd(cache2, ij),
+                             tsa.cache_to_psd(cache1, ij))
+            npt.assert_almost_equal(tsa.cache_to_coherency(cache2, ij),
+                                    tsa.cache_to_coherency(cache1, ij))
+            npt.assert_almost_equal(tsa.cache_to_relative_phase(cache2, ij),
+                                    tsa.cache_to_relative_phase(cache1, ij))
+
+        # Both bands were answered from a single file:
+        files = os.listdir(store)
+        npt.assert_equal(len(files), 1)
+
+        # Other data, or other parameters, are kept separately:
+        tsa.cache_fft(ts[:, ::-1], ij, store=store)
+        tsa.cache_fft(ts, ij, method=dict(NFFT=128), store=store)
+        npt.assert_equal(len(os.listdir(store)), 3)
+
+        # With a store_key, the data is found by its name, not its hash:
+        f3, cache3 = tsa.cache_fft(ts, ij, store=store, store_key='rec')
+        npt.assert_equal(len(os.listdir(store)), 4)
+        f4, cache4 = tsa.cache_fft(np.zeros_like(ts), ij, store=store,
+                                   store_key='rec')
+        npt.assert_equal(cache4['FFT_slices'], cache3['FFT_slices'])
+        npt.assert_equal(cache3['FFT_slices'],
+                         tsa.cache_fft(ts, ij, store=store)[1]['FFT_slices'])
+    finally:
+        shutil.rmtree(store)
+
+
+def test_cache_fft_transform():
+    """
+    Test that the band-limited transforms give the same FFT slices as the
+    full FFT, also on a finer (zero-padded) frequency grid
+
+    """
+    ts = np.random.randn(3, 1000)
+    ij = [(0, 1), (2, 2)]
+    for pad_to, lb, ub in [(None, 0, None), (None, 1, 1.2), (1024, 0.5, 1.5)]:
+        freqs, cache = tsa.cache_fft(ts, ij, lb=lb, ub=ub, pad_to=pad_to,
+                                     transform='fft')
+        for transform in ['dft', 'czt', 'auto']:
+            f, c = tsa.cache_fft(ts, ij, lb=lb, ub=ub, pad_to=pad_to,
+                                 transform=transform)
+            npt.assert_equal(f, freqs)
+            npt.assert_almost_equal(c['FFT_slices'], cache['FFT_slices'])
+
+    # The finer grid is the one of a zero-padded FFT:
+    freqs, cache = tsa.cache_fft(ts, ij, pad_to=256, transform='czt')
+    npt.assert_equal(freqs, utils.get_freqs(2 * np.pi, 256))
+    hann = mlab.window_hanning(np.ones(64))
+    npt.assert_almost_equal(cache['FFT_slices'][0, 0],
+                            fftpack.fft(ts[0, :64] * hann, 256)[:129])
+
+    npt.assert_raises(ValueError, tsa.cache_fft, ts, ij, transform='fast')
+    npt.assert_raises(ValueError, tsa.cache_fft, ts, ij, pad_to=32)
@@ -103,6 +103,30 @@ def test_get_spectra_unknown_method():
                     tsa.get_spectra, tseries, method=dict(this_method='foo'))
 
 
+def test_get_spectra_welch_matches_mlab():
+    """
+    Test that the batched welch estimate of all the cross-spectra reproduces
+    the pairwise calls to mlab.csd
+
+    """
+    import matplotlib.mlab as mlab
+    for dtype in (float, complex):
+        for NFFT, n_overlap in ((64, 32), (63, 10)):
+            tseries = np.random.randn(3, 500).astype(dtype)
+            if dtype is complex:
+                tseries += 1j * np.random.randn(3, 500)
+            method = dict(this_method='welch', NFFT=NFFT, n_overlap=n_overlap)
+            f, fxy = tsa.get_spectra(tseries, method=method)
+            for i in range(3):
+                for j in range(3):
+                    pxy, f_mlab = mlab.csd(tseries[j], tseries[i], NFFT,
+                                           2 * np.pi, mlab.detrend_none,
+                                           mlab.window_hanning, n_overlap,
+                                           scale_by_freq=True)
+                    npt.assert_array_almost_equal(fxy[i, j], pxy.squeeze())
+            npt.assert_array_almost_equal(f, f_mlab)
+
+
 def test_periodogram():
     """Test some of the inputs to periodogram """
 
@@ -195,6 +219,32 @@ def test_dpss_properties():
         t = t and np.sum( np.arange(1,p+1) * f[:p] ) >= 0
     nt.assert_true(t, 'Odd Slepians should begin positive-going')
 
+def test_dpss_cache():
+    """ Test the memoization and LRU eviction of the DPSS cache """
+    cache = tsa.DPSSCache()
+    d, lam = cache.get(256, 4, 8, low_bias=True)
+    d_ref, lam_ref = tsa.dpss_windows(256, 4, 8)
+    keepers = lam_ref > 0.9
+    npt.assert_array_almost_equal(d, d_ref[keepers])
+    npt.assert_array_almost_equal(lam, lam_ref[keepers])
+    # Shared arrays can't be modified by the callers:
+    nt.assert_false(d.flags.writeable)
+
+    d2, _ = cache.get(256, 4, 8, low_bias=True)
+    nt.assert_true(d2 is d)
+    nt.assert_equal((cache.hits, cache.misses), (1, 1))
+    # low_bias is part of the key:
+    cache.get(256, 4, 8)
+    nt.assert_equal((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+
+    # Shrinking the cache evicts the least recently used entry first:
+    cache.get(256, 4, 8, low_bias=True)
+    cache.resize(cache.nbytes - 1)
+    nt.assert_equal((len(cache), cache.evictions), (1, 1))
+    nt.assert_true(cache.get(256, 4, 8, low_bias=True)[0] is d)
+    cache.clear()
+    nt.assert_equal((len(cache), cache.nbytes, cache.hits), (0, 0, 0))
+
 def test_get_spectra_bi():
     """
 
@@ -317,6 +367,34 @@ def test_mtm_cross_spectrum():
                       (w, w))
 
 
+def test_tapered_spectra_onesided():
+    """
+    Test that the real-input (one-sided) tapered spectra give the same
+    multitaper estimates as the full transforms
+    """
+    for N in (128, 127):
+        x = np.random.randn(2, N)
+        d, eigs = tsa.dpss_windows(N, 3, 5)
+        full = tsa.tapered_spectra(x, d, NFFT=2 * N)
+        half = tsa.tapered_spectra(x, d, NFFT=2 * N, sides='onesided')
+        nt.assert_equal(half.shape[-1], N + 1)
+        npt.assert_array_almost_equal(half, full[..., :N + 1])
+
+        w, _ = utils.adaptive_weights(full[0], eigs)
+        w_half, _ = utils.adaptive_weights(half[0], eigs, NFFT=2 * N)
+        npt.assert_array_almost_equal(w_half, w)
+
+        sxy = tsa.mtm_cross_spectrum(full[0], full[1], (w, w),
+                                     sides='onesided')
+        sxy_half = tsa.mtm_cross_spectrum(half[0], half[1], (w, w),
+                                          sides='onesided', NFFT=2 * N)
+        npt.assert_array_almost_equal(sxy_half, sxy)
+
+        jk = utils.jackknifed_sdf_variance(full[0], eigs)
+        jk_half = utils.jackknifed_sdf_variance(half[0], eigs, NFFT=2 * N)
+        npt.assert_array_almost_equal(jk_half, jk)
+
+
 @dec.slow
 def test_multi_taper_psd_csd():
     """
@@ -361,6 +439,61 @@ def test_multi_taper_psd_csd():
         npt.assert_array_almost_equal(psd_ratio2, 1, decimal=-1)
 
 
+def test_multi_taper_csd_out():
+    """The CSD can be written into a given array, or as its upper triangle"""
+    x = np.random.randn(5, 256)
+    for adaptive in (False, True):
+        f, csd = tsa.multi_taper_csd(x, adaptive=adaptive)
+        # compare with the pairwise estimate
+        spectra, eigs = tsa.tapered_spectra(x, (4, 8), sides='onesided')
+        if adaptive:
+            w, _ = utils.adaptive_weights(spectra, eigs, NFFT=256)
+        else:
+            w = np.tile(np.sqrt(eigs)[:, None], (5, 1, 1))
+        for i, j in [(0, 0), (3, 1), (1, 3)]:
+            csd_ij = tsa.mtm_cross_spectrum(spectra[i], spectra[j],
+                                            (w[i], w[j]), sides='onesided',
+                                            NFFT=256)
+            npt.assert_array_almost_equal(csd[i, j], csd_ij / (2 * np.pi))
+
+        out = np.empty_like(csd)
+        f, csd_out = tsa.multi_taper_csd(x, adaptive=adaptive, out=out)
+        nt.assert_true(csd_out is out)
+        npt.assert_array_almost_equal(out, csd)
+
+        f, csd_triu = tsa.multi_taper_csd(x, adaptive=adaptive, triu=True)
+        npt.assert_equal(csd_triu.shape, (15, len(f)))
+        iu = np.triu_indices(5)
+        npt.assert_array_almost_equal(csd_triu, csd[iu])
+
+    npt.assert_raises(ValueError, tsa.multi_taper_csd, x,
+                      out=np.empty((5, 5, 10), 'D'))
+
+
+def test_multi_taper_spectrogram():
+    """Each window of the spectrogram is the multitaper PSD of that window"""
+    x = np.random.randn(2, 600)
+    window, step = 128, 40
+    for adaptive in (False, True):
+        for sides, data in (('onesided', x), ('twosided', x + 1j * x[::-1])):
+            # a small max_bytes forces several chunks of windows
+            t, f, S = tsa.multi_taper_spectrogram(
+                data, Fs=10., window=window, step=step, NW=3,
+                adaptive=adaptive, sides=sides, max_bytes=2 ** 16)
+            npt.assert_equal(len(t), (600 - window) // step + 1)
+            npt.assert_equal(S.shape, (2, len(t), len(f)))
+            npt.assert_almost_equal(t[0], window / 20.)
+            for i in (0, len(t) // 2, len(t) - 1):
+                f_i, S_i, _ = tsa.multi_taper_psd(
+                    data[:, i * step:i * step + window], Fs=10., NW=3,
+                    adaptive=adaptive, jackknife=False, sides=sides)
+                npt.assert_array_almost_equal(f, f_i)
+                npt.assert_array_almost_equal(S[:, i], S_i)
+
+    npt.assert_raises(ValueError, tsa.multi_taper_spectrogram, x[0],
+                      window=1024)
+
+
 def test_gh57():
     """
     https://github.com/nipy/nitime/issues/57
@@ -0,0 +1,52 @@
+import functools
+
+import numpy as np
+import numpy.testing as npt
+
+import nitime.algorithms as tsa
+
+
+def test_surrogates():
+    """Surrogates keep the amplitude spectrum of each time-series"""
+    x = np.random.randn(2, 256)
+    amp = np.abs(np.fft.rfft(x))
+    for method in ['phase', 'shift']:
+        s = tsa.surrogates(x, 3, method=method, seed=1)
+        npt.assert_equal(s.shape, (3, 2, 256))
+        npt.assert_array_almost_equal(np.abs(np.fft.rfft(s)),
+                                      np.tile(amp, (3, 1, 1)))
+    npt.assert_raises(ValueError, tsa.surrogates, x, method='foo')
+    npt.assert_raises(ValueError, tsa.surrogates, x + 1j)
+
+
+def test_surrogate_test():
+    np.random.seed(0)
+    x = np.random.randn(3, 512)
+    x[1] += x[0]
+    c, p, q = tsa.surrogate_test(x, tsa.coherence_statistic,
+                                 n_surrogates=60, quantiles=[0.5, 0.95],
+                                 batch_size=25)
+    npt.assert_equal(p.shape, c.shape)
+    npt.assert_equal(q.shape, (2,) + c.shape)
+    # The coupled pair is significant, the others are not:
+    npt.assert_(np.all(p[0, 1] < 0.05))
+    npt.assert_(np.median(p[0, 2]) > 0.1)
+    npt.assert_(np.all(q[0] <= q[1]))
+
+    # The results do not depend on the number of processes:
+    stat = functools.partial(tsa.seed_corrcoef_statistic, n_seeds=2)
+    r1, p1, _ = tsa.surrogate_test(x, stat, n_surrogates=40, batch_size=10,
+                                   method='shift')
+    r2, p2, _ = tsa.surrogate_test(x, stat, n_surrogates=40, batch_size=10,
+                                   method='shift', n_jobs=2)
+    npt.assert_equal(r1.shape, (2, 1))
+    npt.assert_array_equal(p1, p2)
+
+    # The seed can be None, or a RandomState:
+    _, p3, _ = tsa.surrogate_test(x, stat, n_surrogates=20, seed=None)
+    npt.assert_equal(p3.shape, p1.shape)
+    _, p4, _ = tsa.surrogate_test(x, stat, n_surrogates=20,
+                                  seed=np.random.RandomState(1))
+    _, p5, _ = tsa.surrogate_test(x, stat, n_surrogates=20,
+                                  seed=np.random.RandomState(1))
+    npt.assert_array_equal(p4, p5)
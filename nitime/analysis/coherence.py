@@ -8,8 +8,8 @@ from nitime import descriptors as desc
 from nitime import utils as tsu
 from nitime import algorithms as tsa
 
-# To suppport older versions of numpy that don't have tril_indices:
-from nitime.index_utils import tril_indices, triu_indices
+# To suppport older versions of numpy that don't have triu_indices:
+from nitime.index_utils import triu_indices
 
 from .base import BaseAnalyzer
 
@@ -17,7 +17,8 @@ from .base import BaseAnalyzer
 class CoherenceAnalyzer(BaseAnalyzer):
     """Analyzer object for coherence/coherency analysis """
 
-    def __init__(self, input=None, method=None, unwrap_phases=False):
+    def __init__(self, input=None, method=None, unwrap_phases=False,
+                 condensed=False):
         """
 
         Parameters
@@ -36,6 +37,11 @@ class CoherenceAnalyzer(BaseAnalyzer):
            the time-delay is the same for all the frequency bands. See
            _[Sun2005] for details. Default : False
 
+        condensed: bool, optional
+           Whether to return the spectrum, coherency and coherence as a
+           :class:`utils.CondensedMatrix`, which only stores the upper
+           triangle of the matrix. Default : False
+
         Examples
         --------
         >>> import nitime.timeseries as ts
@@ -76,6 +82,7 @@ class CoherenceAnalyzer(BaseAnalyzer):
         self.method['Fs'] = self.method.get('Fs', self.input.sampling_rate)
 
         self._unwrap_phases = unwrap_phases
+        self._condensed = condensed
 
         # The following only applies to the welch method:
         if (self.method.get('this_method') == 'welch' or
@@ -96,24 +103,14 @@ class CoherenceAnalyzer(BaseAnalyzer):
     @desc.setattr_on_read
     def coherency(self):
         """The standard output for this kind of analyzer is the coherency """
-        data = self.input.data
-        tseries_length = data.shape[0]
-        spectrum_length = self.spectrum.shape[-1]
-
-        coherency = np.zeros((tseries_length,
-                              tseries_length,
-                              spectrum_length), dtype=complex)
-
-        for i in range(tseries_length):
-            for j in range(i, tseries_length):
-                coherency[i][j] = tsa.coherency_spec(self.spectrum[i][j],
-                                                     self.spectrum[i][i],
-                                                     self.spectrum[j][j])
+        return self._pairwise(tsa.coherency_spec, complex)
 
-        idx = tril_indices(tseries_length, -1)
-        coherency[idx[0], idx[1], ...] = coherency[idx[1], idx[0], ...].conj()
-
-        return coherency
+    def _pairwise(self, func, dtype):
+        """Apply func to all the pairs of spectra (see tsa.pairwise_spec)"""
+        c = tsa.pairwise_spec(self.spectrum, func, dtype=dtype)
+        if self._condensed:
+            return c
+        return c.toarray()
 
     @desc.setattr_on_read
     def spectrum(self):
@@ -121,7 +118,8 @@ class CoherenceAnalyzer(BaseAnalyzer):
         The spectra of each of the channels and cross-spectra between
         different channles  in the input TimeSeries object
         """
-        f, spectrum = tsa.get_spectra(self.input.data, method=self.method)
+        f, spectrum = tsa.get_spectra(self.input.data, method=self.method,
+                                      condensed=self._condensed)
         return spectrum
 
     @desc.setattr_on_read
@@ -141,104 +139,48 @@ class CoherenceAnalyzer(BaseAnalyzer):
         The coherence between the different channels in the input TimeSeries
         object
         """
-
-        #XXX Calculate this from the standard output, instead of recalculating
-        #the coherence:
-
-        tseries_length = self.input.data.shape[0]
-        spectrum_length = self.spectrum.shape[-1]
-        coherence = np.zeros((tseries_length,
-                              tseries_length,
-                              spectrum_length))
-
-        for i in range(tseries_length):
-            for j in range(i, tseries_length):
-                coherence[i][j] = tsa.coherence_spec(self.spectrum[i][j],
-                                                     self.spectrum[i][i],
-                                                     self.spectrum[j][j])
-
-        idx = tril_indices(tseries_length, -1)
-        coherence[idx[0], idx[1], ...] = coherence[idx[1], idx[0], ...].conj()
-
-        return coherence
+        return self._pairwise(tsa.coherence_spec, float)
 
     @desc.setattr_on_read
     def phase(self):
         """ The frequency-dependent phase relationship between all the pairwise
         combinations of time-series in the data"""
 
-        #XXX calcluate this from the standard output, instead of recalculating:
-
-        tseries_length = self.input.data.shape[0]
-        spectrum_length = self.spectrum.shape[-1]
-
-        phase = np.zeros((tseries_length,
-                            tseries_length,
-                            spectrum_length))
-
-        for i in range(tseries_length):
-            for j in range(i, tseries_length):
-                phase[i][j] = np.angle(
-                    self.spectrum[i][j])
-
-                phase[j][i] = np.angle(
-                    self.spectrum[i][j].conjugate())
+        phase = np.angle(np.asarray(self.spectrum))
+        i, j = triu_indices(phase.shape[0], 1)
+        phase[j, i] = -phase[i, j]
+        # The phase of the psd on the diagonal is 0:
+        phase[np.arange(phase.shape[0]), np.arange(phase.shape[0])] = 0
         return phase
 
     @desc.setattr_on_read
     def delay(self):
         """ The delay in seconds between the two time series """
-        p_shape = self.phase.shape[:-1]
-        delay = np.zeros(self.phase.shape)
-        for i in range(p_shape[0]):
-            for j in range(p_shape[1]):
-                this_phase = self.phase[i, j]
-                #If requested, unwrap the phases:
-                if self._unwrap_phases:
-                    this_phase = tsu.unwrap_phases(this_phase)
-
-                delay[i, j] = this_phase / (2 * np.pi * self.frequencies)
+        phase = self.phase
+        #If requested, unwrap the phases:
+        if self._unwrap_phases:
+            phase = tsu.unwrap_phases(phase.copy())
 
-        return delay
+        return phase / (2 * np.pi * self.frequencies)
 
     @desc.setattr_on_read
     def coherence_partial(self):
         """The partial coherence between data[i] and data[j], given data[k], as
         a function of frequency band"""
+        return tsa.coherence_partial_matrix(np.asarray(self.spectrum))
 
-        tseries_length = self.input.data.shape[0]
-        spectrum_length = self.spectrum.shape[-1]
-
-        p_coherence = np.zeros((tseries_length,
-                                tseries_length,
-                                tseries_length,
-                                spectrum_length))
-
-        for i in range(tseries_length):
-            for j in range(tseries_length):
-                for k in range(tseries_length):
-                    if j == k or i == k:
-                        pass
-                    else:
-                        p_coherence[i][j][k] = tsa.coherence_partial_spec(
-                            self.spectrum[i][j],
-                            self.spectrum[i][i],
-                            self.spectrum[j][j],
-                            self.spectrum[i][k],
-                            self.spectrum[j][k],
-                            self.spectrum[k][k])
-
-        idx = tril_indices(tseries_length, -1)
-        p_coherence[idx[0], idx[1], ...] =\
-                            p_coherence[idx[1], idx[0], ...].conj()
-
-        return p_coherence
+    @desc.setattr_on_read
+    def coherence_partial_full(self):
+        """The partial coherence between data[i] and data[j], given all the
+        other channels, as a function of frequency band"""
+        return tsa.coherence_partial_full(np.asarray(self.spectrum))
 
 
 class MTCoherenceAnalyzer(BaseAnalyzer):
     """ Analyzer for multi-taper coherence analysis, including jack-knife
     estimate of confidence interval """
-    def __init__(self, input=None, bandwidth=None, alpha=0.05, adaptive=True):
+    def __init__(self, input=None, bandwidth=None, alpha=0.05, adaptive=True,
+                 condensed=False):
 
         """
         Initializer function for the MTCoherenceAnalyzer
@@ -265,6 +207,11 @@ class MTCoherenceAnalyzer(BaseAnalyzer):
             Whether to set the weights for the tapered spectra according to the
             adaptive algorithm (Thompson, 2007).
 
+        condensed: bool, default to False
+            Whether to return the coherence as a
+            :class:`utils.CondensedMatrix`, which only stores the upper
+            triangle of the matrix.
+
         Notes
         -----
 
@@ -288,18 +235,19 @@ class MTCoherenceAnalyzer(BaseAnalyzer):
                 self.bandwidth = self.NW * (2 * Fs) / N
 
         self.alpha = alpha
-        self._L = self.input.data.shape[-1] / 2 + 1
+        self._L = self.input.data.shape[-1] // 2 + 1
         self._adaptive = adaptive
+        self._condensed = condensed
 
     @desc.setattr_on_read
     def tapers(self):
-        return tsa.dpss_windows(self.input.shape[-1], self.NW,
-                                2 * self.NW - 1)[0]
+        return tsa.dpss_cache.get(self.input.shape[-1], self.NW,
+                                  2 * self.NW - 1)[0]
 
     @desc.setattr_on_read
     def eigs(self):
-        return tsa.dpss_windows(self.input.shape[-1], self.NW,
-                                      2 * self.NW - 1)[1]
+        return tsa.dpss_cache.get(self.input.shape[-1], self.NW,
+                                  2 * self.NW - 1)[1]
 
     @desc.setattr_on_read
     def df(self):
@@ -312,21 +260,31 @@ class MTCoherenceAnalyzer(BaseAnalyzer):
         tspectra = fftpack.fft(tdata)
         return tspectra
 
+    @desc.setattr_on_read
+    def _spectra_onesided(self):
+        """The tapered spectra of real input at the non-negative frequencies
+        only (the ones used for the weights and the coherence), computed with
+        an rfft. For complex input, these are the full spectra"""
+        if np.iscomplexobj(self.input.data):
+            return self.spectra
+        tdata = self.tapers[None, :, :] * self.input.data[:, None, :]
+        return np.fft.rfft(tdata)
+
     @desc.setattr_on_read
     def weights(self):
         channel_n = self.input.data.shape[0]
         w = np.empty((channel_n, self.df, self._L))
 
         if self._adaptive:
-            for i in range(channel_n):
-                # this is always a one-sided spectrum?
-                w[i] = tsu.adaptive_weights(self.spectra[i],
-                                            self.eigs,
-                                            sides='onesided')[0]
+            # this is always a one-sided spectrum?
+            w[:] = tsu.adaptive_weights(self._spectra_onesided,
+                                        self.eigs,
+                                        sides='onesided',
+                                        NFFT=self.input.shape[-1])[0]
 
         # Set the weights to be the square root of the eigen-values:
         else:
-            wshape = [1] * len(self.spectra.shape)
+            wshape = [1] * len(self._spectra_onesided.shape)
             wshape[0] = channel_n
             wshape[-2] = int(self.df)
             pre_w = np.sqrt(self.eigs) + np.zeros((wshape[0],
@@ -339,51 +297,55 @@ class MTCoherenceAnalyzer(BaseAnalyzer):
     @desc.setattr_on_read
     def coherence(self):
         nrows = self.input.data.shape[0]
-        psd_mat = np.zeros((2, nrows, nrows, self._L), 'd')
-        coh_mat = np.zeros((nrows, nrows, self._L), 'd')
-
-        for i in range(self.input.data.shape[0]):
-            for j in range(i):
-                sxy = tsa.mtm_cross_spectrum(self.spectra[i], self.spectra[j],
-                                           (self.weights[i], self.weights[j]),
-                                           sides='onesided')
-                sxx = tsa.mtm_cross_spectrum(self.spectra[i], self.spectra[i],
-                                             self.weights[i],
-                                             sides='onesided')
-                syy = tsa.mtm_cross_spectrum(self.spectra[j], self.spectra[j],
-                                             self.weights[i],
-                                             sides='onesided')
-                psd_mat[0, i, j] = sxx
-                psd_mat[1, i, j] = syy
-                coh_mat[i, j] = np.abs(sxy) ** 2
-                coh_mat[i, j] /= (sxx * syy)
-
-        idx = triu_indices(self.input.data.shape[0], 1)
-        coh_mat[idx[0], idx[1], ...] = coh_mat[idx[1], idx[0], ...].conj()
-
-        return coh_mat
+        # The normalization of the cross- and auto-spectra (see
+        # mtm_cross_spectrum) cancels out in the coherence, so only the
+        # weighted spectra are needed:
+        wspectra = self.weights * self._spectra_onesided[..., :self._L]
+        psd = np.sum(np.abs(wspectra) ** 2, axis=-2)
+
+        # The upper triangle, one row at a time. The diagonal is left at 0
+        coh = np.zeros((nrows * (nrows + 1) // 2, self._L))
+        start = 0
+        for i in range(nrows):
+            sxy = np.sum(wspectra[i] * wspectra[i + 1:].conj(), axis=-2)
+            coh[start + 1:start + nrows - i] = np.abs(sxy) ** 2
+            coh[start + 1:start + nrows - i] /= psd[i] * psd[i + 1:]
+            start += nrows - i
+
+        coh = tsu.CondensedMatrix(coh, nrows)
+        if self._condensed:
+            return coh
+        return coh.toarray()
 
     @desc.setattr_on_read
     def confidence_interval(self):
         """The size of the 1-alpha confidence interval"""
-        coh_var = np.zeros((self.input.data.shape[0],
-                            self.input.data.shape[0],
-                            self._L), 'd')
-        for i in range(self.input.data.shape[0]):
-            for j in range(i):
-                if i != j:
-                    coh_var[i, j] = tsu.jackknifed_coh_variance(
-                        self.spectra[i],
-                        self.spectra[j],
-                        self.eigs,
-                        adaptive=self._adaptive
-                        )
+        M = self.input.data.shape[0]
+        NFFT = self.input.shape[-1]
+        coh_var = np.zeros((M, M, self._L), 'd')
+        if self._adaptive:
+            # the leave-one-out weights of each channel are found once and
+            # shared by all the pairs it is part of
+            w = tsu.jackknifed_weights(self._spectra_onesided, self.eigs,
+                                       NFFT=NFFT)
+        for i in range(1, M):
+            # pair channel i with all the channels before it at once
+            coh_var[i, :i] = tsu.jackknifed_coh_variance(
+                self._spectra_onesided[i],
+                self._spectra_onesided[:i],
+                self.eigs,
+                adaptive=self._adaptive,
+                NFFT=NFFT,
+                weights=(w[i], w[:i]) if self._adaptive else None
+                )
 
         idx = triu_indices(self.input.data.shape[0], 1)
         coh_var[idx[0], idx[1], ...] = coh_var[idx[1], idx[0], ...].conj()
 
-        coh_mat_xform = tsu.normalize_coherence(self.coherence,
-                                                2 * self.df - 2)
+        coherence = self.coherence
+        if self._condensed:
+            coherence = coherence.toarray()
+        coh_mat_xform = tsu.normalize_coherence(coherence, 2 * self.df - 2)
 
         lb = coh_mat_xform + dist.t.ppf(self.alpha / 2,
                                         self.df - 1) * np.sqrt(coh_var)
@@ -412,7 +374,8 @@ class SparseCoherenceAnalyzer(BaseAnalyzer):
     """
 
     def __init__(self, time_series=None, ij=(0, 0), method=None, lb=0, ub=None,
-                 prefer_speed_over_memory=True, scale_by_freq=True):
+                 prefer_speed_over_memory=True, scale_by_freq=True,
+                 store=None, store_key=None):
         """The constructor for the SparseCoherenceAnalyzer
 
         Parameters
@@ -431,12 +394,23 @@ class SparseCoherenceAnalyzer(BaseAnalyzer):
 
         prefer_speed_over_memory: Boolean, optional, default=True
 
-            Does exactly what the name implies. If you have enough memory
+            Has no effect. Kept for backwards compatibility.
 
         method: optional, dict
 
         The method for spectral estimation (see :func:`algorithms.get_spectra`)
 
+        store: str, optional
+
+            A directory in which the FFT slices are kept on disk, for reuse
+            across analyses of the same data (see
+            :func:`algorithms.cache_fft`)
+
+        store_key: str, optional
+
+            A name for the data in the store, so that the data is not hashed
+            to find its FFT slices (see :func:`algorithms.cache_fft`)
+
         """
 
         BaseAnalyzer.__init__(self, time_series)
@@ -463,6 +437,8 @@ class SparseCoherenceAnalyzer(BaseAnalyzer):
         self.ub = ub
         self.prefer_speed_over_memory = prefer_speed_over_memory
         self.scale_by_freq = scale_by_freq
+        self.store = store
+        self.store_key = store_key
 
     @desc.setattr_on_read
     def coherency(self):
@@ -490,8 +466,9 @@ class SparseCoherenceAnalyzer(BaseAnalyzer):
                                 lb=self.lb,
                                 ub=self.ub,
                                 method=self.method,
-                        prefer_speed_over_memory=self.prefer_speed_over_memory,
-                                scale_by_freq=self.scale_by_freq)
+                                scale_by_freq=self.scale_by_freq,
+                                store=self.store,
+                                store_key=self.store_key)
 
         return cache
 
@@ -523,6 +500,20 @@ class SparseCoherenceAnalyzer(BaseAnalyzer):
         """ The delay in seconds between the two time series """
         return self.relative_phases / (2 * np.pi * self.frequencies)
 
+    @desc.setattr_on_read
+    def pair_phases(self):
+        """The relative phase between each of the pairs in ij, shaped (n_pairs,
+        n_freqs). This is the phase of the coherency, but calculated only for
+        the pairs in ij."""
+        return tsa.cache_to_relative_phase(self.cache, self.ij,
+                                           average='weighted', compact=True)
+
+    @desc.setattr_on_read
+    def pair_delay(self):
+        """ The delay in seconds between each of the pairs in ij, shaped
+        (n_pairs, n_freqs)"""
+        return self.pair_phases / (2 * np.pi * self.frequencies)
+
     @desc.setattr_on_read
     def frequencies(self):
         """Get the central frequencies for the frequency bands, given the
@@ -554,7 +545,7 @@ class SeedCoherenceAnalyzer(object):
 
     def __init__(self, seed_time_series=None, target_time_series=None,
                  method=None, lb=0, ub=None, prefer_speed_over_memory=True,
-                 scale_by_freq=True):
+                 scale_by_freq=True, store=None, store_key=None):
 
         """
 
@@ -573,8 +564,20 @@ class SeedCoherenceAnalyzer(object):
 
         prefer_speed_over_memory: Boolean, optional, default=True
 
-            Makes things go a bit faster, if you have enough memory
+            Has no effect. Kept for backwards compatibility.
+
+        store: str, optional
 
+            A directory in which the FFT slices are kept on disk, for reuse
+            across analyses of the same data (see
+            :func:`algorithms.cache_fft`)
+
+        store_key: str, optional
+
+            A name for the data in the store, so that the data is not hashed
+            to find its FFT slices (see :func:`algorithms.cache_fft`). The
+            slices of the seed and of the target are stored under this name,
+            followed by '-seed' and '-target'.
 
         """
 
@@ -601,11 +604,16 @@ class SeedCoherenceAnalyzer(object):
             e_s += "spectral estimation method must be welch"
             raise ValueError(e_s)
 
+        # Get the sampling rate from the seed time-series:
+        self.method['Fs'] = self.method.get('Fs', self.seed.sampling_rate)
+
         #Additional parameters for the coherency estimation:
         self.lb = lb
         self.ub = ub
         self.prefer_speed_over_memory = prefer_speed_over_memory
         self.scale_by_freq = scale_by_freq
+        self.store = store
+        self.store_key = store_key
 
     @desc.setattr_on_read
     def coherence(self):
@@ -620,9 +628,6 @@ class SeedCoherenceAnalyzer(object):
     def frequencies(self):
         """Get the central frequencies for the frequency bands, given the
            method of estimating the spectrum """
-
-        # Get the sampling rate from the seed time-series:
-        self.method['Fs'] = self.method.get('Fs', self.seed.sampling_rate)
         NFFT = self.method.get('NFFT', 64)
         Fs = self.method.get('Fs')
         freqs = tsu.get_freqs(Fs, NFFT)
@@ -642,80 +647,36 @@ class SeedCoherenceAnalyzer(object):
 
         f, cache = tsa.cache_fft(data, ij, lb=self.lb, ub=self.ub,
                                  method=self.method,
-                        prefer_speed_over_memory=self.prefer_speed_over_memory,
-                        scale_by_freq=self.scale_by_freq)
+                                 scale_by_freq=self.scale_by_freq,
+                                 store=self.store,
+                                 store_key=self._store_key('target'))
 
         return cache
 
-    @desc.setattr_on_read
-    def coherency(self):
+    def _store_key(self, name):
+        """The name of the seed or the target data in the store"""
+        if self.store_key is None:
+            return None
+        return '%s-%s' % (self.store_key, name)
 
-        #Pre-allocate the final result:
-        if len(self.seed.shape) > 1:
-            Cxy = np.empty((self.seed.data.shape[0],
-                            self.target.data.shape[0],
-                            self.frequencies.shape[0]), dtype=np.complex)
-        else:
-            Cxy = np.empty((self.target.data.shape[0],
-                            self.frequencies.shape[0]), dtype=np.complex)
-
-        #Get the fft window cache for the target time-series:
-        cache = self.target_cache
-
-        #A list of indices for the target:
-        target_chan_idx = np.arange(self.target.data.shape[0])
-
-        #This is a list of indices into the cached fft window libraries,
-        #setting the index of the seed to be -1, so that it is easily
-        #distinguished from the target indices:
-        ij = list(zip(np.ones_like(target_chan_idx) * -1, target_chan_idx))
-
-        #If there is more than one channel in the seed time-series:
-        if len(self.seed.shape) > 1:
-            for seed_idx, this_seed in enumerate(self.seed.data):
-                #Here ij is 0, because it is just one channel and we stack the
-                #channel onto itself in order for the input to the function to
-                #make sense:
-                f, seed_cache = tsa.cache_fft(
-                    np.vstack([this_seed, this_seed]),
-                    [(0, 0)],
-                    lb=self.lb,
-                    ub=self.ub,
-                    method=self.method,
-                    prefer_speed_over_memory=self.prefer_speed_over_memory,
-                    scale_by_freq=self.scale_by_freq)
-
-                #Insert the seed_cache into the target_cache:
-                cache['FFT_slices'][-1] = seed_cache['FFT_slices'][0]
-
-                #If this is true, the cache contains both FFT_slices and
-                #FFT_conj_slices:
-                if self.prefer_speed_over_memory:
-                    cache['FFT_conj_slices'][-1] = \
-                                            seed_cache['FFT_conj_slices'][0]
-
-                #This performs the caclulation for this seed:
-                Cxy[seed_idx] = tsa.cache_to_coherency(cache, ij)
-
-        #In the case where there is only one channel in the seed time-series:
-        else:
-            f, seed_cache = tsa.cache_fft(
-                np.vstack([self.seed.data,
-                           self.seed.data]),
-                [(0, 0)],
-                lb=self.lb,
-                ub=self.ub,
-                method=self.method,
-                prefer_speed_over_memory=self.prefer_speed_over_memory,
-                scale_by_freq=self.scale_by_freq)
+    @desc.setattr_on_read
+    def seed_cache(self):
+        #Make a cache with all the fft windows for each of the channels in the
+        #seed, computed in one batch:
+        data = self.seed.data.reshape(-1, self.seed.data.shape[-1])
+        ij = list(zip(np.arange(data.shape[0]), np.arange(data.shape[0])))
 
-            cache['FFT_slices'][-1] = seed_cache['FFT_slices'][0]
+        f, cache = tsa.cache_fft(data, ij, lb=self.lb, ub=self.ub,
+                                 method=self.method,
+                                 scale_by_freq=self.scale_by_freq,
+                                 store=self.store,
+                                 store_key=self._store_key('seed'))
 
-            if self.prefer_speed_over_memory:
-                cache['FFT_conj_slices'][-1] = \
-                                            seed_cache['FFT_conj_slices'][0]
+        return cache
 
-            Cxy = tsa.cache_to_coherency(cache, ij)
+    @desc.setattr_on_read
+    def coherency(self):
+        Cxy = tsa.cache_to_seed_coherency(self.seed_cache, self.target_cache)
 
         return Cxy.squeeze()
 
@@ -729,3 +690,134 @@ class SeedCoherenceAnalyzer(object):
     def delay(self):
         """ The delay in seconds between the two time series """
         return self.relative_phases / (2 * np.pi * self.frequencies)
+
+
+class DynamicCoherenceAnalyzer(BaseAnalyzer):
+    """
+    This analyzer calculates the coherency between pairs of time-series in
+    sliding (possibly overlapping) windows, for the analysis of dynamic
+    connectivity.
+
+    The windowed FFT of every Welch segment is computed only once (see
+    :func:`algorithms.cache_fft`), and the cross-spectra of consecutive
+    windows are updated as running sums, adding the segments which enter
+    the window and subtracting the ones which leave it (see
+    :func:`algorithms.cache_to_dynamic_coherency`). Like the
+    SparseCoherenceAnalyzer, this only implements the welch method of
+    spectral estimation.
+    """
+
+    def __init__(self, input=None, window=None, step=None, ij=None,
+                 method=None, lb=0, ub=None):
+        """The constructor for the DynamicCoherenceAnalyzer
+
+        Parameters
+        ----------
+
+        input: TimeSeries object
+           Containing the data to analyze.
+
+        window: int, optional
+
+            The length of each window, in samples. Defaults to 8 Welch
+            segments.
+
+        step: int, optional
+
+            The number of samples between the starts of consecutive
+            windows. This needs to be a multiple of the step between Welch
+            segments (NFFT - n_overlap), which is also the default.
+
+        ij: a list of tuples, each containing a pair of indices, optional
+
+           The pairs of time-series to compare. Defaults to all the pairs
+           i < j.
+
+        method: optional, dict
+
+            The method for spectral estimation (see
+            :func:`algorithms.get_spectra`). Only 'welch' is available.
+
+        lb,ub: float,optional, default: lb=0, ub=None (max frequency)
+
+            define a frequency band of interest
+
+        """
+        BaseAnalyzer.__init__(self, input)
+
+        if method is None:
+            self.method = {'this_method': 'welch'}
+        else:
+            self.method = method
+
+        if self.method.get('this_method', 'welch') != 'welch':
+            e_s = "For DynamicCoherenceAnalyzer, "
+            e_s += "spectral estimation method must be welch"
+            raise ValueError(e_s)
+
+        self.method['Fs'] = self.method.get('Fs', self.input.sampling_rate)
+        NFFT = self.method.get('NFFT', 64)
+        n_overlap = self.method.get('n_overlap', int(np.ceil(NFFT / 2.0)))
+        seg_step = NFFT - n_overlap
+
+        if window is None:
+            window = NFFT + 7 * seg_step
+        if step is None:
+            step = seg_step
+
+        if window < NFFT:
+            e_s = "The window needs to be at least NFFT samples long"
+            raise ValueError(e_s)
+        if step < 1 or step % seg_step:
+            e_s = "The step between windows needs to be a multiple of the "
+            e_s += "step between Welch segments (%d samples)" % seg_step
+            raise ValueError(e_s)
+
+        if ij is None:
+            ij = np.column_stack(triu_indices(self.input.shape[0], 1))
+        self.ij = ij
+        self.window = window
+        self.step = step
+        self.lb = lb
+        self.ub = ub
+        # The windows, in units of Welch segments:
+        self._n_slices = (window - NFFT) // seg_step + 1
+        self._slice_step = step // seg_step
+
+    @desc.setattr_on_read
+    def cache(self):
+        """The windowed FFT of every Welch segment of the time-series in ij"""
+        f, cache = tsa.cache_fft(self.input.data, self.ij, lb=self.lb,
+                                 ub=self.ub, method=self.method)
+        return cache
+
+    @desc.setattr_on_read
+    def coherency(self):
+        """The coherency in each window, for each pair in ij, shaped
+        (n_windows, n_pairs, n_freqs)"""
+        return tsa.cache_to_dynamic_coherency(self.cache, self.ij,
+                                              self._n_slices,
+                                              self._slice_step)
+
+    @desc.setattr_on_read
+    def coherence(self):
+        """The coherence in each window, for each pair in ij"""
+        return np.abs(self.coherency) ** 2
+
+    @desc.setattr_on_read
+    def frequencies(self):
+        """Get the central frequencies for the frequency bands, given the
+           method of estimating the spectrum """
+        NFFT = self.method.get('NFFT', 64)
+        freqs = tsu.get_freqs(self.method['Fs'], NFFT)
+        lb_idx, ub_idx = tsu.get_bounds(freqs, self.lb, self.ub)
+
+        return freqs[lb_idx:ub_idx]
+
+    @desc.setattr_on_read
+    def times(self):
+        """The centers of the windows, in seconds from the beginning of the
+        time-series"""
+        n_windows = (self.input.shape[-1] - self.window) // self.step + 1
+        return ((np.arange(n_windows) * self.step + self.window / 2.0) /
+                self.method['Fs'])
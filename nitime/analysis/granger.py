@@ -4,6 +4,8 @@ Analyzers for the calculation of Granger 'causality'
 
 """
 
+import multiprocessing
+
 import numpy as np
 import nitime.algorithms as alg
 import nitime.utils as utils
@@ -32,49 +34,143 @@ def fit_model(x1, x2, order=None, max_order=10,
        A function which defines an information criterion, used to determine the
         order of the model.
 
+    Notes
+    -----
+    If the order is not known, the models of all the orders up to max_order
+    are found in a single LWR recursion (see :func:`model_order_criterion`)
+    and the order chosen is the first one for which the criterion is smaller
+    than for the next order.
+
     """
-    c_old = np.inf
-    n_process = 2
-    Ntotal = n_process * x1.shape[-1]
+    x = np.vstack([x1, x2])
+    Rxx = utils.autocov_vector(x, nlags=_n_lags(order, max_order))
+    order, Rxx, coef, ecov, c = _fit_models(Rxx[None], x.size, order,
+                                            max_order, criterion)
+    return order[0], Rxx[0], coef[0], ecov[0]
 
-    # If model order was provided as an input:
-    if order is not None:
-        lag = order + 1
-        Rxx = utils.autocov_vector(np.vstack([x1, x2]), nlags=lag)
-        coef, ecov = alg.lwr_recursion(np.array(Rxx).transpose(2, 0, 1))
-
-    # If the model order is not known and provided as input:
-    else:
-        for lag in range(1, max_order):
-            Rxx_new = utils.autocov_vector(np.vstack([x1, x2]), nlags=lag)
-            coef_new, ecov_new = alg.lwr_recursion(
-                                        np.array(Rxx_new).transpose(2, 0, 1))
-            order_new = coef_new.shape[0]
-            c_new = criterion(ecov_new, n_process, order_new, Ntotal)
-            if c_new > c_old:
-                # Keep the values you got in the last round and break out:
-                break
-
-            else:
-                # Replace the output values with the new calculated values and
-                # move on to the next order:
-                c_old = c_new
-                order = order_new
-                Rxx = Rxx_new
-                coef = coef_new
-                ecov = ecov_new
-        else:
-            e_s = ("Model estimation order did not converge at max_order = %s"
-                                                                  % max_order)
-            raise ValueError(e_s)
 
-    return order, Rxx, coef, ecov
+def model_order_criterion(x1, x2, max_order=10,
+                          criterion=utils.bayesian_information_criterion):
+    """
+    The information criterion of the bivariate auto-regressive models of x1,
+    x2 of all the orders considered by :func:`fit_model`
+
+    Parameters
+    ----------
+
+    x1,x2: float arrays (n)
+        x1,x2 bivariate combination.
+    max_order: int (optional)
+        The maximal order to fit.
+    criterion: callable
+       A function which defines an information criterion
+
+    Returns
+    -------
+    c : float array (max_order - 1,)
+        c[m] is the value of the criterion for the model of order m. All the
+        models are found in a single LWR recursion.
+    """
+    x = np.vstack([x1, x2])
+    Rxx = utils.autocov_vector(x, nlags=_n_lags(None, max_order))
+    return _order_criterion(Rxx[None], x.size, criterion)[0]
+
+
+def _n_lags(order, max_order):
+    """The number of lags of the autocovariance needed to fit the model of
+    the given order, or to choose one up to max_order"""
+    if order is None:
+        return max(max_order - 1, 1)
+    return order + 1
+
+
+def _order_criterion(Rxx, Ntotal, criterion):
+    """The criterion for the models of all orders, from a batch of
+    autocovariance sequences Rxx (batch, nc, nc, lags)"""
+    coef, ecov = alg.lwr_recursion(Rxx.transpose(0, 3, 1, 2),
+                                   all_orders=True)
+    return np.array([[criterion(this_ecov, Rxx.shape[1], m, Ntotal)
+                      for m, this_ecov in enumerate(pair_ecov)]
+                     for pair_ecov in ecov])
+
+
+def _fit_models(Rxx, Ntotal, order, max_order, criterion):
+    """
+    Fit the models of a batch of autocovariance sequences Rxx (batch, nc, nc,
+    lags), with the lags given by :func:`_n_lags`. Returns lists of the order,
+    autocovariance, coefficients, error covariance and criterion curve (None
+    if the order is known) of each model
+    """
+    n_batch = Rxx.shape[0]
+    if order is not None:
+        coef, ecov = alg.lwr_recursion(Rxx.transpose(0, 3, 1, 2))
+        return ([order] * n_batch, list(Rxx), list(coef), list(ecov),
+                [None] * n_batch)
+
+    c = _order_criterion(Rxx, Ntotal, criterion)
+    # The first order for which the next one is worse:
+    increase = np.diff(c, axis=-1) > 0
+    if not np.all(np.any(increase, -1)):
+        e_s = ("Model estimation order did not converge at max_order = %s"
+                                                              % max_order)
+        raise ValueError(e_s)
+    orders = np.argmax(increase, -1)
+
+    Rxx_out = [None] * n_batch
+    coef_out = [None] * n_batch
+    ecov_out = [None] * n_batch
+    # The models of each order are fit together:
+    for this_order in np.unique(orders):
+        idx = np.nonzero(orders == this_order)[0]
+        this_Rxx = Rxx[idx, ..., :this_order + 1]
+        coef, ecov = alg.lwr_recursion(this_Rxx.transpose(0, 3, 1, 2))
+        for k, b in enumerate(idx):
+            Rxx_out[b] = this_Rxx[k]
+            coef_out[b] = coef[k]
+            ecov_out[b] = ecov[k]
+
+    return orders.tolist(), Rxx_out, coef_out, ecov_out, list(c)
+
+
+def _fit_models_chunk(args):
+    """Call :func:`_fit_models` with a tuple of arguments, in a worker"""
+    return _fit_models(*args)
+
+
+def _granger_causality_chunk(args):
+    """The Granger causality of a chunk of pairs, from their model
+    coefficients and error covariances. Returns the (n_pairs, n_freqs)
+    causality arrays and the spectral matrices of the pairs"""
+    coefs, ecovs, n_freqs = args
+    n_w = n_freqs // 2 + 1
+    f_x2y = np.empty((len(coefs), n_w))
+    f_y2x = np.empty_like(f_x2y)
+    f_xy = np.empty_like(f_x2y)
+    Sw = np.empty((len(coefs), 2, 2, n_w), dtype=complex)
+    # The models of the same order are evaluated together:
+    orders = np.array([coef.shape[0] for coef in coefs])
+    for order in np.unique(orders):
+        idx = np.nonzero(orders == order)[0]
+        _, f_x2y[idx], f_y2x[idx], f_xy[idx], Sw[idx] = \
+            alg.granger_causality_xy(np.array([coefs[k] for k in idx]),
+                                     np.array([ecovs[k] for k in idx]),
+                                     n_freqs=n_freqs)
+    return f_x2y, f_y2x, f_xy, Sw
+
+
+def _conditional_causality_chunk(args):
+    """The conditional Granger causality from a chunk of sources, in a
+    worker (see :func:`conditional_granger_causality`)"""
+    rxx, order, sources, ecov = args
+    return alg.conditional_granger_causality(None, order, rxx=rxx,
+                                             sources=sources, ecov=ecov)
 
 
 class GrangerAnalyzer(BaseAnalyzer):
     """Analyzer for computing all-to-all Granger 'causality' """
     def __init__(self, input=None, ij=None, order=None, max_order=10,
-                 criterion=utils.bayesian_information_criterion, n_freqs=1024):
+                 criterion=utils.bayesian_information_criterion, n_freqs=1024,
+                 n_jobs=1, executor=None):
         """
         Initializer for the GrangerAnalyzer.
 
@@ -95,6 +191,20 @@ class GrangerAnalyzer(BaseAnalyzer):
             Defaults to 1024
         criterion:
             XXX
+        n_jobs: int (optional)
+            The number of processes over which chunks of pairs are fit and
+            evaluated. -1 uses all the CPUs. Defaults to 1 (no parallelism).
+        executor: object (optional)
+            An executor with a map method (such as a multiprocessing.Pool or a
+            concurrent.futures.ProcessPoolExecutor) to use instead of
+            creating a pool of n_jobs processes.
+
+        Notes
+        -----
+        The autocovariance of all the channels is computed once, so that
+        each chunk of pairs sent to the workers carries only the blocks of
+        the autocovariance (or the model coefficients) of its pairs, rather
+        than the time-series.
         """
         self.data = input.data
         self.sampling_rate = input.sampling_rate
@@ -103,6 +213,8 @@ class GrangerAnalyzer(BaseAnalyzer):
         self._order = order
         self._criterion = criterion
         self._max_order = max_order
+        self._n_jobs = n_jobs
+        self._executor = executor
         if ij is None:
             # The following gets the full list of combinations of
             # non-same i's and j's:
@@ -115,21 +227,62 @@ class GrangerAnalyzer(BaseAnalyzer):
 
     @desc.setattr_on_read
     def _model(self):
-        model = dict(order={}, autocov={}, model_coef={}, error_cov={})
-        for i, j in self.ij:
+        model = dict(order={}, autocov={}, model_coef={}, error_cov={},
+                     criterion={})
+        ij = np.array(self.ij, dtype=int).reshape(-1, 2)
+        # The 2 x 2 blocks of the autocovariance of each pair:
+        Rxx = self._autocov_all[ij[:, :, None], ij[:, None, :]]
+        chunks = self._map(_fit_models_chunk,
+                           [(Rxx[idx], 2 * self.data.shape[-1], self._order,
+                             self._max_order, self._criterion)
+                            for idx in self._chunks()])
+        fits = [sum([list(c[n]) for c in chunks], []) for n in range(5)]
+        for k, (i, j) in enumerate(self.ij):
             model[i, j] = dict()
-            order_t, Rxx_t, coef_t, ecov_t = fit_model(self.data[i],
-                                                   self.data[j],
-                                                   order=self._order,
-                                                   max_order=self._max_order,
-                                                   criterion=self._criterion)
-            model['order'][i, j] = order_t
-            model['autocov'][i, j] = Rxx_t
-            model['model_coef'][i, j] = coef_t
-            model['error_cov'][i, j] = ecov_t
+            model['order'][i, j] = fits[0][k]
+            model['autocov'][i, j] = fits[1][k]
+            model['model_coef'][i, j] = fits[2][k]
+            model['error_cov'][i, j] = fits[3][k]
+            model['criterion'][i, j] = fits[4][k]
 
         return model
 
+    def _chunks(self):
+        """Split the indices of the pairs into chunks for the workers"""
+        n_chunks = 1
+        if self._executor is not None or self._n_jobs != 1:
+            n_chunks = 4 * self._n_workers()
+        n_chunks = max(1, min(n_chunks, len(self.ij)))
+        return [idx for idx in np.array_split(np.arange(len(self.ij)),
+                                              n_chunks) if len(idx)]
+
+    def _n_workers(self):
+        if self._n_jobs == -1:
+            return multiprocessing.cpu_count()
+        return max(1, self._n_jobs)
+
+    def _map(self, func, tasks):
+        """Apply func to each of the tasks, using the executor, or a pool of
+        n_jobs processes"""
+        if self._executor is not None:
+            return list(self._executor.map(func, tasks))
+        if self._n_workers() == 1 or len(tasks) == 1:
+            return [func(task) for task in tasks]
+        pool = multiprocessing.Pool(self._n_workers())
+        try:
+            return pool.map(func, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    @desc.setattr_on_read
+    def _autocov_all(self):
+        """The autocovariance of all the channels, (M, M, lags), which all the
+        pairwise models are fit from"""
+        return utils.autocov_vector(self.data,
+                                    nlags=_n_lags(self._order,
+                                                  self._max_order))
+
     @desc.setattr_on_read
     def order(self):
         if self._order is None:
@@ -140,6 +293,19 @@ class GrangerAnalyzer(BaseAnalyzer):
                 order[i, j] = self._order
             return order
 
+    @desc.setattr_on_read
+    def order_criterion(self):
+        """The information criterion of the models of each pair, for all the
+        orders up to max_order (see :func:`model_order_criterion`)"""
+        if self._order is None:
+            return self._model['criterion']
+        ij = np.array(self.ij, dtype=int).reshape(-1, 2)
+        Rxx = utils.autocov_vector(self.data,
+                                   nlags=_n_lags(None, self._max_order))
+        c = _order_criterion(Rxx[ij[:, :, None], ij[:, None, :]],
+                             2 * self.data.shape[-1], self._criterion)
+        return dict(zip(self.ij, c))
+
     @desc.setattr_on_read
     def autocov(self):
         return self._model['autocov']
@@ -156,60 +322,85 @@ class GrangerAnalyzer(BaseAnalyzer):
     def _granger_causality(self):
         """
         This returns a dict with the values computed by
-        :func:`granger_causality_xy`, rather than arrays, so that we can delay
-        the allocation of arrays as much as possible.
+        :func:`granger_causality_xy`. The causality measures are put into
+        (n_process, n_process, n_freqs) arrays, which are nan for the pairs
+        not in ij, and the spectral densities are in a dict.
 
         """
-        gc = dict(frequencies={}, gc_xy={}, gc_yx={}, gc_sim={},
-                  spectral_density={})
-        for i, j in self.ij:
-            w, f_x2y, f_y2x, f_xy, Sw = \
-               alg.granger_causality_xy(self.model_coef[i, j],
-                                        self.error_cov[i, j],
-                                        n_freqs=self._n_freqs)
-
+        gc = dict(spectral_density={})
+        for key in ['gc_xy', 'gc_yx', 'gc_sim']:
+            gc[key] = np.empty((self._n_process,
+                                self._n_process,
+                                self.frequencies.shape[0]))
+            gc[key].fill(np.nan)
+
+        pairs = [tuple(pair) for pair in self.ij]
+        chunks = self._chunks()
+        results = self._map(_granger_causality_chunk,
+                            [([self.model_coef[pairs[k]] for k in idx],
+                              [self.error_cov[pairs[k]] for k in idx],
+                              self._n_freqs) for idx in chunks])
+        for idx, (f_x2y, f_y2x, f_xy, Sw) in zip(chunks, results):
+            i, j = np.array([pairs[k] for k in idx], dtype=int).T
             # All other measures are dependent on i, j:
-            gc['gc_xy'][i, j] = f_x2y
-            gc['gc_yx'][i, j] = f_y2x
-            gc['gc_sim'][i, j] = f_xy
-            gc['spectral_density'][i, j] = Sw
+            gc['gc_xy'][j, i] = f_x2y
+            gc['gc_yx'][j, i] = f_y2x
+            gc['gc_sim'][j, i] = f_xy
+            for k, this_Sw in zip(idx, Sw):
+                gc['spectral_density'][pairs[k]] = this_Sw
 
         return gc
 
     @desc.setattr_on_read
-    def frequencies(self):
-        return utils.get_freqs(self.sampling_rate, self._n_freqs)
-
-    def _dict2arr(self, key):
+    def conditional_causality(self):
         """
-        A helper function that will generate an array with all nan's and insert
-        the measure defined by 'key' into the array and return it to the
-        calling function. This allows us to get matrices of the measures of
-        interest, instead of a dict.
+        The time-domain Granger causality between all the time-series,
+        conditional on all the other ones, from a single multivariate model
+        (see :func:`conditional_granger_causality`). A (n_process,
+        n_process) array, with the causality from j to i in [i, j].
+
+        If the order is not known, it is chosen for the multivariate model,
+        using the information criterion. The reduced models, without each of
+        the sources, are fit in parallel, over chunks of the sources.
         """
-        # Prepare the matrix for the output:
-        arr = np.empty((self._n_process,
-                        self._n_process,
-                        self.frequencies.shape[0]))
-
-        arr.fill(np.nan)
+        Rxx = self._autocov_all
+        order = self._order
+        if order is None:
+            fit = _fit_models(Rxx[None], self._n_process * self.data.shape[-1],
+                              None, self._max_order, self._criterion)
+            order, Rxx = fit[0][0], fit[1][0]
+
+        # The full model is fit once, for all the chunks:
+        ecov = alg.MAR_est_LWR(None, order + 1, rxx=Rxx)[1]
+
+        n_chunks = 1
+        if self._executor is not None or self._n_jobs != 1:
+            n_chunks = 4 * self._n_workers()
+        chunks = np.array_split(np.arange(self._n_process),
+                                min(n_chunks, self._n_process))
+        results = self._map(_conditional_causality_chunk,
+                            [(Rxx, order, idx, ecov) for idx in chunks])
+        gc = np.empty((self._n_process, self._n_process))
+        gc.fill(np.nan)
+        for idx, this_gc in zip(chunks, results):
+            gc[:, idx] = this_gc[:, idx]
+        return gc
 
-        # 'Translate' from dict form into matrix form:
-        for i, j in self.ij:
-            arr[j, i, :] = self._granger_causality[key][i, j]
-        return arr
+    @desc.setattr_on_read
+    def frequencies(self):
+        return utils.get_freqs(self.sampling_rate, self._n_freqs)
 
     @desc.setattr_on_read
     def causality_xy(self):
-        return self._dict2arr('gc_xy')
+        return self._granger_causality['gc_xy']
 
     @desc.setattr_on_read
     def causality_yx(self):
-        return self._dict2arr('gc_yx')
+        return self._granger_causality['gc_yx']
 
     @desc.setattr_on_read
     def simultaneous_causality(self):
-        return self._dict2arr('gc_sim')
+        return self._granger_causality['gc_sim']
 
     @desc.setattr_on_read
     def spectral_matrix(self):
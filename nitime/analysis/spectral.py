@@ -229,6 +229,35 @@ class SpectralAnalyzer(BaseAnalyzer):
 
         return f, spectrum_multi_taper
 
+    @desc.setattr_on_read
+    def spectrogram_multi_taper(self):
+        """
+
+        The multitaper spectrogram, computed using
+        :func:`multi_taper_spectrogram`. The windows are 'NFFT' samples long
+        and overlap by 'n_overlap' samples, as set in the method dict.
+
+        Returns
+        -------
+        (t, f, s): t are the centers of the windows, f the frequencies and s
+        the PSD of each window, shaped (..., len(t), len(f))
+
+        """
+        window = self.method.get('NFFT', 64)
+        n_overlap = self.method.get('n_overlap', int(np.ceil(window / 2.0)))
+        Fs = self.input.sampling_rate
+        if self.BW is not None:
+            NW = np.round(self.BW * window / Fs) / 2.0
+        else:
+            NW = 4
+        return tsa.multi_taper_spectrogram(self.input.data,
+                                           Fs=Fs,
+                                           window=window,
+                                           step=window - n_overlap,
+                                           NW=NW,
+                                           adaptive=self.adaptive,
+                                           low_bias=self.low_bias)
+
 
 class FilterAnalyzer(desc.ResetMixin):
     """ A class for performing filtering operations on time-series and
@@ -74,6 +74,20 @@ def test_CoherenceAnalyzer():
             # Test that partial coherence runs through and has the right number
             # of dimensions:
             npt.assert_equal(len(C.coherence_partial.shape), 4)
+            if method is not None and method['this_method'] == 'welch':
+                npt.assert_equal(C.coherence_partial_full.shape,
+                                 C.coherence.shape)
+
+            # The condensed outputs hold the same values:
+            C_c = nta.CoherenceAnalyzer(T, method, unwrap_phases=unwrap,
+                                        condensed=True)
+            npt.assert_array_almost_equal(C_c.coherence.toarray(),
+                                          C.coherence)
+            npt.assert_array_almost_equal(C_c.coherency[1, 2],
+                                          C.coherency[1, 2])
+            # (up to the sign of phases of +/-pi)
+            npt.assert_array_almost_equal(np.exp(1j * C_c.phase),
+                                          np.exp(1j * C.phase))
 
 
 @npt.dec.skipif(old_mpl)
@@ -108,6 +122,10 @@ def test_SparseCoherenceAnalyzer():
 
     # The delay is equal:
     npt.assert_almost_equal(C2.delay[0, 1], C1.delay[0, 1])
+    # Also for the pairs only:
+    npt.assert_almost_equal(C2.delay[0, 1], C1.pair_delay[0])
+    npt.assert_almost_equal(np.exp(1j * C2.phase[1, 0]),
+                            np.exp(1j * C1.pair_phases[1]))
     # Make sure that you would get an error if you provided a method other than
     # 'welch':
     npt.assert_raises(ValueError, nta.SparseCoherenceAnalyzer, T,
@@ -130,6 +148,14 @@ def test_MTCoherenceAnalyzer():
         npt.assert_equal(C.coherence.shape, (n_series, n_series, NFFT))
         npt.assert_equal(C.confidence_interval.shape, (n_series, n_series,
                                                        NFFT))
+        C_c = nta.MTCoherenceAnalyzer(T, adaptive=adaptive, condensed=True)
+        npt.assert_array_almost_equal(C_c.coherence.toarray(), C.coherence)
+        npt.assert_array_almost_equal(C_c.confidence_interval,
+                                      C.confidence_interval)
+
+    # The tapered spectra are two-sided, also for real input:
+    npt.assert_equal(C.spectra.shape, (n_series, C.df, t.shape[0]))
+    npt.assert_almost_equal(C.spectra[..., :NFFT], C._spectra_onesided)
 
 
 @npt.dec.skipif(old_python)
@@ -208,3 +234,68 @@ def test_SeedCoherenceAnalyzer_same_Fs():
                        sampling_rate=Fs2)
 
     npt.assert_raises(ValueError, nta.SeedCoherenceAnalyzer, T1, T2)
+
+
+def test_DynamicCoherenceAnalyzer():
+    """
+
+    The coherency in each window is the one of the data in that window
+
+    """
+    x = np.random.randn(3, 2000)
+    x[1] += x[0]
+    T = ts.TimeSeries(x, sampling_rate=2.)
+    method = dict(NFFT=64, n_overlap=48)
+    for window, step in [(256, 16), (256, 64), (160, 320)]:
+        D = nta.DynamicCoherenceAnalyzer(T, window=window, step=step,
+                                         method=dict(method), lb=0.1, ub=0.6)
+        n_windows = (2000 - window) // step + 1
+        # The window times are known before the coherency is computed:
+        npt.assert_equal(D.times.shape, (n_windows,))
+        npt.assert_('coherency' not in D.__dict__)
+        npt.assert_equal(D.coherency.shape,
+                         (n_windows, 3, D.frequencies.shape[0]))
+        for w in [0, 1, n_windows // 2, n_windows - 1]:
+            T_w = ts.TimeSeries(x[:, w * step:w * step + window],
+                                sampling_rate=2.)
+            C = nta.CoherenceAnalyzer(T_w, method=dict(method))
+            band = (C.frequencies >= 0.1) & (C.frequencies <= 0.6)
+            for p, (i, j) in enumerate(D.ij):
+                npt.assert_almost_equal(D.coherency[w, p],
+                                        C.coherency[i, j][band])
+
+    npt.assert_raises(ValueError, nta.DynamicCoherenceAnalyzer, T,
+                      step=20, method=dict(method))
+
+
+def test_SeedCoherenceAnalyzer_Fs():
+    """
+
+    The band of the coherency is taken with the sampling rate of the
+    time-series, even when the coherency is read before the frequencies
+
+    """
+    Fs = 100.
+    t = np.arange(1024)
+    seed = np.sin(10 * t) + np.random.rand(t.shape[-1])
+    target = np.sin(10 * t) + np.random.rand(2, t.shape[-1])
+    T_seed = ts.TimeSeries(seed, sampling_rate=Fs)
+    T_target = ts.TimeSeries(target, sampling_rate=Fs)
+    C = nta.SeedCoherenceAnalyzer(T_seed, T_target, lb=5, ub=20)
+    coherency = C.coherency
+    npt.assert_equal(coherency.shape, (2, C.frequencies.shape[0]))
+    npt.assert_equal(C.delay.shape, coherency.shape)
+    C1 = nta.CoherenceAnalyzer(ts.TimeSeries(np.vstack([seed, target]),
+                                             sampling_rate=Fs))
+    band = (C1.frequencies >= 5) & (C1.frequencies <= 20)
+    npt.assert_almost_equal(C.frequencies, C1.frequencies[band])
+    npt.assert_almost_equal(coherency[1], C1.coherency[0, 2][band])
+
+    # With several seeds, batched into one cache:
+    T_seed2 = ts.TimeSeries(np.vstack([seed, target[0]]), sampling_rate=Fs)
+    C2 = nta.SeedCoherenceAnalyzer(T_seed2, T_target, lb=5, ub=20)
+    npt.assert_equal(C2.seed_cache['FFT_slices'][0].shape[-1],
+                     C2.frequencies.shape[0])
+    npt.assert_equal(C2.delay.shape, (2, 2, C2.frequencies.shape[0]))
+    npt.assert_almost_equal(C2.coherency[0], coherency)
+    npt.assert_almost_equal(C2.delay[1, 1], C1.delay[1, 2][band])
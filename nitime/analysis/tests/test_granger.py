@@ -7,6 +7,7 @@ Testing the analysis.granger submodule
 import numpy as np
 import numpy.testing as npt
 
+import nitime.algorithms as alg
 import nitime.analysis.granger as gc
 import nitime.utils as utils
 import nitime.timeseries as ts
@@ -111,3 +112,79 @@ def test_GrangerAnalyzer():
 
     # x => y for one is like y => x for the other:
     npt.assert_almost_equal(g1.causality_yx[1, 0], g2.causality_xy[0, 1])
+
+
+def test_model_order_criterion():
+    """
+    The criterion curve from the single recursion matches fitting the models
+    of each order separately, and determines the order chosen by fit_model
+    """
+    am = np.array([[[-0.9, 0], [-0.16, -0.8]], [[0.5, 0], [0.2, 0.5]]])
+    z, nz = utils.generate_mar(am, np.eye(2), 1024)
+    c = gc.model_order_criterion(z[0], z[1], max_order=6)
+    npt.assert_equal(c.shape, (5,))
+    for m in range(1, 5):
+        order, Rxx, coef, ecov = gc.fit_model(z[0], z[1], order=m)
+        npt.assert_almost_equal(
+            c[m], utils.bayesian_information_criterion(ecov, 2, m, z.size))
+
+    order = gc.fit_model(z[0], z[1], max_order=6)[0]
+    npt.assert_equal(order, np.nonzero(np.diff(c) > 0)[0][0])
+
+    g = gc.GrangerAnalyzer(ts.TimeSeries(data=z, sampling_rate=1),
+                           max_order=6)
+    npt.assert_almost_equal(g.order_criterion[0, 1], c)
+
+
+def test_GrangerAnalyzer_shared_autocov():
+    """
+    The models of all the pairs, fit from the autocovariance of all the
+    channels, are the same as the models fit for each pair
+    """
+    am = np.array([[[-0.9, 0], [-0.16, -0.8]], [[0.5, 0], [0.2, 0.5]]])
+    z, nz = utils.generate_mar(am, np.eye(2), 1024)
+    x = np.vstack([z, np.random.randn(1024)])
+    for order in [None, 2]:
+        g = gc.GrangerAnalyzer(ts.TimeSeries(data=x, sampling_rate=1),
+                               order=order)
+        npt.assert_equal(g._autocov_all.shape[:2], (3, 3))
+        for i, j in g.ij:
+            this_order, Rxx, coef, ecov = gc.fit_model(x[i], x[j],
+                                                       order=order)
+            npt.assert_equal(g.order[i, j], this_order)
+            npt.assert_almost_equal(g.autocov[i, j], Rxx)
+            npt.assert_almost_equal(g.model_coef[i, j], coef)
+            npt.assert_almost_equal(g.error_cov[i, j], ecov)
+
+
+def test_GrangerAnalyzer_n_jobs():
+    """Running the pairs in a pool of processes gives the same results"""
+    x = np.random.randn(4, 512)
+    x[1:, 1:] += 0.5 * x[:-1, :-1]
+    T = ts.TimeSeries(data=x, sampling_rate=1)
+    g1 = gc.GrangerAnalyzer(T, order=1, n_freqs=64)
+    g2 = gc.GrangerAnalyzer(T, order=1, n_freqs=64, n_jobs=2)
+    npt.assert_almost_equal(g1.causality_xy, g2.causality_xy)
+    npt.assert_almost_equal(g1.simultaneous_causality,
+                            g2.simultaneous_causality)
+    npt.assert_almost_equal(g1.spectral_matrix[0, 3],
+                            g2.spectral_matrix[0, 3])
+    # The pairs not in ij are nan:
+    npt.assert_(np.all(np.isnan(g2.causality_yx[np.diag_indices(4)])))
+
+
+def test_GrangerAnalyzer_conditional():
+    """The conditional causality is the same in a pool of processes"""
+    x = np.random.randn(4, 1024)
+    x[1:, 1:] += 0.5 * x[:-1, :-1]
+    T = ts.TimeSeries(data=x, sampling_rate=1)
+    g1 = gc.GrangerAnalyzer(T, order=1)
+    g2 = gc.GrangerAnalyzer(T, order=1, n_jobs=2)
+    npt.assert_almost_equal(g1.conditional_causality,
+                            alg.conditional_granger_causality(x, 1))
+    npt.assert_almost_equal(g1.conditional_causality,
+                            g2.conditional_causality)
+    # With the order chosen from the data:
+    g3 = gc.GrangerAnalyzer(T, max_order=6)
+    npt.assert_equal(g3.conditional_causality.shape, (4, 4))
+    npt.assert_(g3.conditional_causality[1, 0] > 0.1)
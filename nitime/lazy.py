@@ -25,6 +25,7 @@ with ``_``) ::
     scipy.linalg
     scipy.signal
     scipy.signal.signaltools
+    scipy.sparse
     scipy.stats
     scipy.stats.distributions
 
@@ -48,6 +49,7 @@ scipy_interpolate = LazyImport('scipy.interpolate')
 scipy_linalg = LazyImport('scipy.linalg')
 scipy_signal = LazyImport('scipy.signal')
 scipy_signal_signaltools = LazyImport('scipy.signal.signaltools')
+scipy_sparse = LazyImport('scipy.sparse')
 scipy_stats = LazyImport('scipy.stats')
 scipy_stats_distributions = LazyImport('scipy.stats.distributions')
 
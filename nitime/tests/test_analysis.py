@@ -46,6 +46,10 @@ def test_SpectralAnalyzer():
     npt.assert_equal(f.shape, (t.shape[0] / 2 + 1,))
     npt.assert_equal(c.shape, (2, t.shape[0] / 2 + 1))
 
+    t_s, f, c = C.spectrogram_multi_taper
+    npt.assert_equal(f.shape, (33,))  # window-length of 64
+    npt.assert_equal(c.shape, (2, t_s.shape[0], 33))
+
     # Test for data with only one channel
     T = ts.TimeSeries(x, sampling_rate=Fs)
     C = nta.SpectralAnalyzer(T)
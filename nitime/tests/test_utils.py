@@ -121,6 +121,21 @@ def test_crosscov():
                'Large mean square error w.r.t. reference cross covariance')
 
 
+def test_crosscov_vector():
+    """The FFT and direct methods give the mean of the lagged products"""
+    x = np.random.randn(3, 100)
+    y = np.random.randn(3, 100) + 1j * np.random.randn(3, 100)
+    for this_y in (x, y):
+        ref = np.empty((3, 3, 20), dtype=this_y.dtype)
+        for k in range(20):
+            ref[..., k] = np.mean(x[:, None, k:] *
+                                  this_y[None, :, :100 - k].conj(), -1)
+        for method in ('direct', 'fft', 'auto'):
+            rxy = utils.crosscov_vector(x, this_y, nlags=20, method=method)
+            npt.assert_almost_equal(rxy, ref)
+    nt.assert_raises(ValueError, utils.crosscov_vector, x, y, method='foo')
+
+
 def test_autocorr():
     N = 128
     ar_seq, _, _ = utils.ar_generator(N=N)
@@ -307,3 +322,113 @@ def test_detect_lines_2dmode():
 
     nt.assert_true(consistent1 and consistent2, 'Inconsistent results')
 
+
+
+def test_adaptive_weights_batched():
+    """
+    Test that weighting several channels together gives the same weights as
+    weighting each channel on its own
+    """
+    N = 512
+    x = np.array([utils.ar_generator(N=N)[0] for i in range(3)])
+    tapers, eigs = alg.dpss_windows(N, 4, 7)
+    spectra = alg.tapered_spectra(x, tapers)
+
+    w, nu = utils.adaptive_weights(spectra, eigs, sides='onesided')
+    npt.assert_equal(w.shape, (3, 7, N // 2 + 1))
+    npt.assert_equal(nu.shape, (3, N // 2 + 1))
+    for i in range(3):
+        w_i, nu_i = utils.adaptive_weights(spectra[i], eigs, sides='onesided')
+        npt.assert_array_almost_equal(w[i], w_i)
+        npt.assert_array_almost_equal(nu[i], nu_i)
+
+
+def test_jackknifed_variance_leave_one_out():
+    """
+    Test the closed-form leave-one-out jackknife against explicitly
+    deleting each taper
+    """
+    N = 256
+    K = 7
+    x = np.array([utils.ar_generator(N=N)[0] for i in range(3)])
+    tapers, eigs = alg.dpss_windows(N, 4, K)
+    spectra = alg.tapered_spectra(x, tapers, sides='onesided')
+
+    jk_sdf = np.empty((K, 3, N // 2 + 1))
+    jk_coh = np.empty((K, 2, N // 2 + 1))
+    for i in range(K):
+        keep = [k for k in range(K) if k != i]
+        s = spectra[:, keep]
+        w = eigs[keep][:, None]
+        for m in range(3):
+            jk_sdf[i, m] = alg.mtm_cross_spectrum(s[m], s[m], w,
+                                                  sides='onesided', NFFT=N)
+        for m in range(2):
+            sxy = alg.mtm_cross_spectrum(s[0], s[m + 1], (w, w),
+                                         sides='onesided', NFFT=N)
+            jk_coh[i, m] = np.abs(sxy) / np.sqrt(jk_sdf[i, 0] *
+                                                 jk_sdf[i, m + 1])
+    jk_sdf = np.log(jk_sdf)
+    sdf_var = np.sum((jk_sdf - jk_sdf.mean(0)) ** 2, 0)
+    sdf_var *= (K - 1.) ** 2 / K / (K - 0.5)
+    npt.assert_array_almost_equal(
+        utils.jackknifed_sdf_variance(spectra, eigs, adaptive=False, NFFT=N),
+        sdf_var)
+    utils.normalize_coherence(jk_coh, 2 * K - 2, copy=False)
+    coh_var = np.sum((jk_coh - jk_coh.mean(0)) ** 2, 0) * (K - 1.) / K
+    npt.assert_array_almost_equal(
+        utils.jackknifed_coh_variance(spectra[0], spectra[1:], eigs,
+                                      adaptive=False, NFFT=N),
+        coh_var)
+
+    # The adaptive leave-one-out weights solve the adaptive weighting
+    # equations with the deleted taper removed
+    w = utils.jackknifed_weights(spectra, eigs, NFFT=N)
+    npt.assert_equal(w.shape, (3, K, K, N // 2 + 1))
+    npt.assert_equal(w[:, np.arange(K), np.arange(K)], 0)
+    for i in range(K):
+        keep = [k for k in range(K) if k != i]
+        s = spectra[:, keep]
+        d_sdfs = 2 * np.abs(s) ** 2
+        w_i = w[:, i][:, keep]
+        sdf = np.sum(w_i ** 2 * d_sdfs, 1) / np.sum(w_i ** 2, 1)
+        var_est = np.array([alg.mtm_cross_spectrum(
+            s[m], s[m], eigs[keep][:, None], sides='onesided', NFFT=N).sum()
+            for m in range(3)]) / N
+        bband = (1 - eigs[keep])[None, :, None] * var_est[:, None, None]
+        d_k = np.sqrt(eigs[keep])[:, None] * sdf[:, None]
+        d_k /= eigs[keep][:, None] * sdf[:, None] + bband
+        converged = np.abs(d_k - w_i).max(1) < 1e-4
+        nt.assert_true(converged.mean() > 0.95)
+
+    # With fewer than 3 tapers, the kept tapers are not adaptively weighted:
+    tapers, eigs = alg.dpss_windows(N, 2, 2)
+    spectra = alg.tapered_spectra(x, tapers, sides='onesided')
+    w = utils.jackknifed_weights(spectra, eigs, NFFT=N)
+    for i, keep in enumerate([[1], [0]]):
+        w_i = utils.adaptive_weights(spectra[:, keep], eigs[keep], NFFT=N)[0]
+        npt.assert_array_almost_equal(w[:, i][:, keep], w_i)
+        npt.assert_equal(w[:, i, i], 0)
+
+
+def test_CondensedMatrix():
+    """Test indexing into and expanding a condensed Hermitian matrix"""
+    M = 5
+    x = np.random.randn(M, M, 4) + 1j * np.random.randn(M, M, 4)
+    x += x.transpose(1, 0, 2).conj()
+    c = utils.CondensedMatrix.from_dense(x)
+    npt.assert_equal(c.data.shape, (M * (M + 1) // 2, 4))
+    npt.assert_equal(c.shape, x.shape)
+    npt.assert_equal(len(c), M)
+    npt.assert_equal(c.toarray(), x)
+    npt.assert_equal(np.asarray(c), x)
+    npt.assert_equal(c.diagonal(), x[np.arange(M), np.arange(M)])
+    for key in [(3, 1), (1, 3), (-1, 0), 2, (slice(None), 2),
+                (slice(1, 4), slice(None, None, 2)), ([0, 4, 2], [3, 1, 2]),
+                (4, 1, 2)]:
+        npt.assert_equal(c[key], x[key])
+
+    # The number of rows is checked against the data:
+    npt.assert_raises(ValueError, utils.CondensedMatrix, np.ones((7, 4)))
+    npt.assert_raises(ValueError, utils.CondensedMatrix, np.ones((6, 4)), 4)
+    npt.assert_raises(IndexError, c.__getitem__, (5, 0))
@@ -304,7 +304,8 @@ def expected_jk_variance(K):
             ((kf - 1) / (kf - 2)) ** 2 * (kf - 3) / (kf - 2))
 
 
-def jackknifed_sdf_variance(yk, eigvals, sides='onesided', adaptive=True):
+def jackknifed_sdf_variance(yk, eigvals, sides='onesided', adaptive=True,
+                            NFFT=None):
     r"""
     Returns the variance of the log-sdf estimated through jack-knifing
     a group of independent sdf estimates.
@@ -312,8 +313,9 @@ def jackknifed_sdf_variance(yk, eigvals, sides='onesided', adaptive=True):
     Parameters
     ----------
 
-    yk : ndarray (K, L)
-       The K DFTs of the tapered sequences
+    yk : ndarray (K, L) or (..., K, L)
+       The K DFTs of the tapered sequences. Any leading dimensions index
+       independent channels
     eigvals : ndarray (K,)
        The eigenvalues corresponding to the K DPSS tapers
     sides : str, optional
@@ -321,11 +323,14 @@ def jackknifed_sdf_variance(yk, eigvals, sides='onesided', adaptive=True):
        two-sided spectra
     adpative : bool, optional
        Compute the adaptive weighting for each jackknife pseudovalue
+    NFFT : int, optional
+       The length of the DFTs. Only needed if yk holds just the non-negative
+       frequencies of a real-input transform (see :func:`mtm_cross_spectrum`)
 
     Returns
     -------
 
-    var : The estimate for log-sdf variance
+    var : The estimate for log-sdf variance, shaped (..., L)
 
     Notes
     -----
@@ -335,48 +340,47 @@ def jackknifed_sdf_variance(yk, eigvals, sides='onesided', adaptive=True):
     standard error equal to sqrt(var). However, Thompson and Chave [1]
     point out that this variance better describes the sample mean.
 
+    Without adaptive weighting, each leave-one-out estimate is found by
+    subtracting the deleted taper from the full weighted sum. With
+    adaptive weighting, the weights of each leave-one-out estimate are
+    found by :func:`jackknifed_weights`.
 
     [1] Thomson D J, Chave A D (1991) Advances in Spectrum Analysis and Array
     Processing (Prentice-Hall, Englewood Cliffs, NJ), 1, pp 58-113.
     """
-    K = yk.shape[0]
-
-    from nitime.algorithms import mtm_cross_spectrum
+    N = yk.shape[-1] if NFFT is None else NFFT
+    if sides == 'onesided':
+        yk = yk[..., :N // 2 + 1]
+    K = yk.shape[-2]
 
     # the samples {S_k} are defined, with or without weights, as
     # S_k = | x_k |**2
     # | x_k |**2 = | y_k * d_k |**2          (with adaptive weights)
     # | x_k |**2 = | y_k * sqrt(eig_k) |**2  (without adaptive weights)
+    #
+    # The one-sided doubling of power is left out, since it cancels in the
+    # variance of the log-sdf
+    sdfs = np.abs(yk) ** 2
+    if adaptive:
+        w2 = jackknifed_weights(yk, eigvals, sides=sides, NFFT=N) ** 2
+        jk_sdf = np.sum(w2 * sdfs[..., None, :, :], axis=-2)
+        jk_sdf /= np.sum(w2, axis=-2)
+    else:
+        # the fixed weights of mtm_cross_spectrum are the eigenvalues
+        lam = eigvals ** 2
+        jk_sdf = _leave_one_out_sum(lam[:, None] * sdfs)
+        jk_sdf /= (lam.sum() - lam)[:, None]
 
-    all_orders = set(range(K))
-    jk_sdf = []
-    # get the leave-one-out estimates -- ideally, weights are recomputed
-    # for each leave-one-out. This is now the case.
-    for i in range(K):
-        items = list(all_orders.difference([i]))
-        spectra_i = np.take(yk, items, axis=0)
-        eigs_i = np.take(eigvals, items)
-        if adaptive:
-            # compute the weights
-            weights, _ = adaptive_weights(spectra_i, eigs_i, sides=sides)
-        else:
-            weights = eigs_i[:, None]
-        # this is the leave-one-out estimate of the sdf
-        jk_sdf.append(
-            mtm_cross_spectrum(
-                spectra_i, spectra_i, weights, sides=sides
-                )
-            )
     # log-transform the leave-one-out estimates and the mean of estimates
-    jk_sdf = np.log(jk_sdf)
+    np.log(jk_sdf, jk_sdf)
     # jk_avg should be the mean of the log(jk_sdf(i))
-    jk_avg = jk_sdf.mean(axis=0)
+    jk_avg = jk_sdf.mean(axis=-2)
 
     K = float(K)
 
-    jk_var = (jk_sdf - jk_avg)
+    jk_var = (jk_sdf - jk_avg[..., None, :])
     np.power(jk_var, 2, jk_var)
-    jk_var = jk_var.sum(axis=0)
+    jk_var = jk_var.sum(axis=-2)
 
     # Thompson's recommended factor, eq 18
     # Jackknifing Multitaper Spectrum Estimates
@@ -386,7 +390,8 @@ def jackknifed_sdf_variance(yk, eigvals, sides='onesided', adaptive=True):
     return jk_var
 
 
-def jackknifed_coh_variance(tx, ty, eigvals, adaptive=True):
+def jackknifed_coh_variance(tx, ty, eigvals, adaptive=True, NFFT=None,
+                            weights=None):
     """
     Returns the variance of the coherency between x and y, estimated
     through jack-knifing the tapered samples in {tx, ty}.
@@ -394,12 +399,20 @@ def jackknifed_coh_variance(tx, ty, eigvals, adaptive=True):
     Parameters
     ----------
 
-    tx : ndarray, (K, L)
+    tx : ndarray, (K, L) or (..., K, L)
        The K complex spectra of tapered timeseries x
-    ty : ndarray, (K, L)
-       The K complex spectra of tapered timeseries y
+    ty : ndarray, (K, L) or (..., K, L)
+       The K complex spectra of tapered timeseries y. The leading
+       dimensions of tx and ty are broadcast against each other, so that
+       one channel can be paired with many
     eigvals : ndarray (K,)
        The eigenvalues associated with the K DPSS tapers
+    NFFT : int, optional
+       The length of the DFTs. Only needed if tx, ty hold just the
+       non-negative frequencies of a real-input transform
+    weights : (wx, wy), optional
+       Precomputed leave-one-out adaptive weights of tx and ty (see
+       :func:`jackknifed_weights`). Only used if adaptive is True
 
     Returns
     -------
@@ -408,46 +421,46 @@ def jackknifed_coh_variance(tx, ty, eigvals, adaptive=True):
        The variance computed in the transformed domain (see
        normalize_coherence)
     """
-
-    K = tx.shape[0]
-
-    # calculate leave-one-out estimates of MSC (magnitude squared coherence)
-    jk_coh = []
-    # coherence is symmetric (right??)
+    N = tx.shape[-1] if NFFT is None else NFFT
+    if ty.shape[-2:] != tx.shape[-2:]:
+        raise ValueError('shape mismatch between tx, ty')
+    # coherence is symmetric, so use one-sided spectra
     sides = 'onesided'
-    all_orders = set(range(K))
-
-    import nitime.algorithms as alg
-
-    # get the leave-one-out estimates
-    for i in range(K):
-        items = list(all_orders.difference([i]))
-        tx_i = np.take(tx, items, axis=0)
-        ty_i = np.take(ty, items, axis=0)
-        eigs_i = np.take(eigvals, items)
-        if adaptive:
-            wx, _ = adaptive_weights(tx_i, eigs_i, sides=sides)
-            wy, _ = adaptive_weights(ty_i, eigs_i, sides=sides)
+    tx = tx[..., :N // 2 + 1]
+    ty = ty[..., :N // 2 + 1]
+    K = len(eigvals)
+
+    # calculate leave-one-out estimates of MSC (magnitude squared
+    # coherence). The normalization of the cross- and auto-spectra cancels
+    # out, so only the weighted sums are needed
+    if adaptive:
+        if weights is None:
+            wx = jackknifed_weights(tx, eigvals, sides=sides, NFFT=N)
+            wy = jackknifed_weights(ty, eigvals, sides=sides, NFFT=N)
         else:
-            wx = wy = eigs_i[:, None]
-        # The CSD
-        sxy_i = alg.mtm_cross_spectrum(tx_i, ty_i, (wx, wy), sides=sides)
-        # The PSDs
-        sxx_i = alg.mtm_cross_spectrum(tx_i, tx_i, wx, sides=sides)
-        syy_i = alg.mtm_cross_spectrum(ty_i, ty_i, wy, sides=sides)
-        # these are the | c_i | samples
-        msc = np.abs(sxy_i)
-        msc /= np.sqrt(sxx_i * syy_i)
-        jk_coh.append(msc)
-
-    jk_coh = np.array(jk_coh)
+            wx, wy = weights
+        tx = tx[..., None, :, :]
+        ty = ty[..., None, :, :]
+        sxy = np.sum(wx * wy * tx * ty.conj(), axis=-2)
+        sxx = np.sum(wx ** 2 * np.abs(tx) ** 2, axis=-2)
+        syy = np.sum(wy ** 2 * np.abs(ty) ** 2, axis=-2)
+    else:
+        lam = eigvals[:, None] ** 2
+        sxy = _leave_one_out_sum(lam * tx * ty.conj())
+        sxx = _leave_one_out_sum(lam * np.abs(tx) ** 2)
+        syy = _leave_one_out_sum(lam * np.abs(ty) ** 2)
+
+    # these are the | c_i | samples
+    jk_coh = np.abs(sxy)
+    jk_coh /= np.sqrt(sxx * syy)
+
     # now normalize the coherence estimates and take the mean
     normalize_coherence(jk_coh, 2 * K - 2, copy=False)  # inplace
-    jk_avg = np.mean(jk_coh, axis=0)
+    jk_avg = np.mean(jk_coh, axis=-2)
 
-    jk_var = (jk_coh - jk_avg)
+    jk_var = (jk_coh - jk_avg[..., None, :])
     np.power(jk_var, 2, jk_var)
-    jk_var = jk_var.sum(axis=0)
+    jk_var = jk_var.sum(axis=-2)
 
     # Do/Don't use the alternative scaling here??
     f = float(K - 1) / K
@@ -457,10 +470,114 @@ def jackknifed_coh_variance(tx, ty, eigvals, adaptive=True):
     return jk_var
 
 
+def _leave_one_out_sum(x):
+    """
+    Sum x over its taper axis (-2) K times, leaving out each taper in turn.
+    The i-th leave-one-out sum is placed at index i of the taper axis.
+    """
+    return x.sum(axis=-2)[..., None, :] - x
+
+
+def jackknifed_weights(yk, eigvals, sides='onesided', max_iter=150,
+                       NFFT=None):
+    """
+    Find the adaptive weights of the K leave-one-out estimates formed from
+    K DFTs of DPSS tapered sequences.
+
+    Parameters
+    ----------
+
+    yk : ndarray (K, N) or (..., K, N)
+       The K DFTs of the tapered sequences. Any leading dimensions index
+       independent channels
+    eigvals : ndarray, length-K
+       The eigenvalues of the DPSS tapers
+    sides : str
+       Whether to compute weights on a one-sided or two-sided spectrum
+    max_iter : int
+       Maximum number of iterations for weight computation
+    NFFT : int, optional
+       The length of the DFTs (see :func:`adaptive_weights`)
+
+    Returns
+    -------
+
+    weights : ndarray (..., K, K, L)
+       weights[..., i, :, :] are the weights of the estimate that leaves
+       out taper i. The weight of the deleted taper itself is 0.
+
+    Notes
+    -----
+
+    The iterations for every deletion are started from the adaptive
+    estimate of the full set of tapers with the deleted taper subtracted
+    out, which is usually within a few iterations of the solution. Taper i
+    is deleted by zeroing its eigenvalue, so that all K deletions are
+    solved together.
+
+    """
+    K = len(eigvals)
+    N = yk.shape[-1] if NFFT is None else NFFT
+    if K < 3:
+        # adaptive_weights does not weight fewer than 3 tapers: each of the
+        # kept tapers keeps the square root of its own eigenvalue
+        w = np.sqrt(eigvals)[None, :] * (1 - np.eye(K))
+        L = N // 2 + 1 if sides == 'onesided' else N
+        return w[..., None] * np.ones(yk.shape[:-2] + (1, 1, L))
+    w_full, _ = adaptive_weights(yk, eigvals, sides=sides, max_iter=max_iter,
+                                 NFFT=N)
+    out_shape = w_full.shape[:-1]
+    L = w_full.shape[-1]
+    w2 = w_full.reshape((-1, K, L)) ** 2
+    M = w2.shape[0]
+    rt_eig = np.sqrt(eigvals)
+
+    # the direct spectral estimates, scaled as in adaptive_weights
+    d_sdfs = np.abs(yk[..., :L].reshape((M, K, L))) ** 2
+    lam = eigvals ** 2
+    sdf_fixed = _leave_one_out_sum(lam[:, None] * d_sdfs)
+    sdf_fixed /= (lam.sum() - lam)[:, None]
+    if L < N:
+        d_sdfs *= 2
+        # dbl power at duplicated freqs
+        sdf_fixed[..., 1:(N + 1) // 2] *= 2
+    # the broadband bias of each leave-one-out estimate, (M, K, K)
+    var_est = np.sum(sdf_fixed, axis=-1) / N
+    bband_sup = var_est[..., None] * (1 - eigvals)
+
+    # start each leave-one-out estimate from the full adaptive estimate
+    sdf_iter = _leave_one_out_sum(w2 * d_sdfs)
+    sdf_iter /= _leave_one_out_sum(w2)
+
+    # cells far below the peak power keep the first iterate, as in
+    # adaptive_weights
+    min_pwr = sdf_iter.max(axis=-1) * 10 ** (-150/20.)
+    m_idx, i_idx, f_idx = np.nonzero(sdf_iter >= min_pwr[..., None])
+
+    eig_del = eigvals * (1 - np.eye(K))
+    weights = rt_eig[:, None] * sdf_iter[:, :, None, :]
+    weights /= (eigvals[:, None] * sdf_iter[:, :, None, :] +
+                bband_sup[..., None])
+    weights[:, np.arange(K), np.arange(K)] = 0
+
+    d_k, converged = _adaptive_iterate(
+        d_sdfs[m_idx, :, f_idx], sdf_iter[m_idx, i_idx, f_idx],
+        eig_del[i_idx], bband_sup[m_idx, i_idx], m_idx * K + i_idx, M * K,
+        max_iter
+        )
+    if not converged:
+        e_s = 'Breaking due to iterative meltdown in '
+        e_s += 'nitime.utils.jackknifed_weights.'
+        warnings.warn(e_s, RuntimeWarning)
+    weights[m_idx, i_idx, :, f_idx] = d_k
+    weights.shape = out_shape + (K, L)
+    return weights
+
+
 #-----------------------------------------------------------------------------
 # Multitaper utils
 #-----------------------------------------------------------------------------
-def adaptive_weights(yk, eigvals, sides='onesided', max_iter=150):
+def adaptive_weights(yk, eigvals, sides='onesided', max_iter=150, NFFT=None):
     r"""
     Perform an iterative procedure to find the optimal weights for K
     direct spectral estimators of DPSS tapered signals.
@@ -468,22 +585,27 @@ def adaptive_weights(yk, eigvals, sides='onesided', max_iter=150):
     Parameters
     ----------
 
-    yk : ndarray (K, N)
-       The K DFTs of the tapered sequences
+    yk : ndarray (K, N) or (..., K, N)
+       The K DFTs of the tapered sequences. Any leading dimensions index
+       independent channels, which are all weighted together
     eigvals : ndarray, length-K
        The eigenvalues of the DPSS tapers
     sides : str
        Whether to compute weights on a one-sided or two-sided spectrum
     max_iter : int
        Maximum number of iterations for weight computation
+    NFFT : int, optional
+       The length of the DFTs. Defaults to yk.shape[-1]. Needs to be provided
+       if yk holds only the non-negative frequencies of a real-input
+       transform (see :func:`tapered_spectra`)
 
     Returns
     -------
 
     weights, nu
 
-       The weights (array like sdfs), and the
-       "equivalent degrees of freedom" (array length-L)
+       The weights (array like sdfs, shaped (..., K, L)), and the
+       "equivalent degrees of freedom" (array shaped (..., L))
 
     Notes
     -----
@@ -495,27 +617,40 @@ def adaptive_weights(yk, eigvals, sides='onesided', max_iter=150):
     found. The square root of the eigenvalues are returned as weights,
     and the degrees of freedom are 2*K
 
+    Each (channel, frequency) cell stops iterating as soon as its own cost
+    function has converged, and a channel stops iterating once 95% of its
+    frequencies have converged.
+
     """
     from nitime.algorithms import mtm_cross_spectrum
     K = len(eigvals)
+    N = yk.shape[-1] if NFFT is None else NFFT
     if len(eigvals) < 3:
         print("""
         Warning--not adaptively combining the spectral estimators
         due to a low number of tapers.
         """)
         # we'll hope this is a correct length for L
-        N = yk.shape[-1]
-        L = N / 2 + 1 if sides == 'onesided' else N
-        return (np.multiply.outer(np.sqrt(eigvals), np.ones(L)), 2 * K)
+        L = N // 2 + 1 if sides == 'onesided' else N
+        weights = np.multiply.outer(np.sqrt(eigvals), np.ones(L))
+        weights = weights * np.ones(yk.shape[:-2] + (1, 1))
+        return (weights, 2 * K)
     rt_eig = np.sqrt(eigvals)
 
+    # collapse any leading dimensions into a single channel dimension
+    out_shape = yk.shape[:-2]
+    yk = yk.reshape((-1,) + yk.shape[-2:])
+    M = yk.shape[0]
+    # mtm_cross_spectrum expects the tapers on the first axis
+    yk_t = np.rollaxis(yk, 1)
+
     # combine the SDFs in the traditional way in order to estimate
     # the variance of the timeseries
-    N = yk.shape[1]
-    sdf = mtm_cross_spectrum(yk, yk, eigvals[:, None], sides=sides)
+    sdf = mtm_cross_spectrum(yk_t, yk_t, eigvals[:, None, None], sides=sides,
+                             NFFT=N)
     L = sdf.shape[-1]
     var_est = np.sum(sdf, axis=-1) / N
-    bband_sup = (1-eigvals)*var_est
+    bband_sup = (1 - eigvals)[None, :] * var_est[:, None]
 
     # The process is to iteratively switch solving for the following
     # two expressions:
@@ -531,52 +666,114 @@ def adaptive_weights(yk, eigvals, sides='onesided', max_iter=150):
     # (1/2pi) int_{-pi}^{pi} E{B_k(f)} = sig^2(1-lam_k)
 
     # start with an estimate from incomplete data--the first 2 tapers
-    sdf_iter = mtm_cross_spectrum(yk[:2], yk[:2], eigvals[:2, None],
-                                  sides=sides)
-    err = np.zeros((K, L))
+    sdf_iter = mtm_cross_spectrum(yk_t[:2], yk_t[:2], eigvals[:2, None, None],
+                                  sides=sides, NFFT=N)
     # for numerical considerations, don't bother doing adaptive
     # weighting after 150 dB down
-    min_pwr = sdf_iter.max() * 10 ** (-150/20.)
-    default_weights = np.where(sdf_iter < min_pwr)[0]
-    adaptiv_weights = np.where(sdf_iter >= min_pwr)[0]
+    min_pwr = sdf_iter.max(axis=-1) * 10 ** (-150/20.)
+    m_idx, f_idx = np.nonzero(sdf_iter >= min_pwr[:, None])
 
-    w_def = rt_eig[:,None] * sdf_iter[default_weights]
-    w_def /= eigvals[:, None] * sdf_iter[default_weights] + bband_sup[:,None]
+    # the default weights are the first iterate of (2)
+    weights = rt_eig[None, :, None] * sdf_iter[:, None, :]
+    weights /= (eigvals[None, :, None] * sdf_iter[:, None, :] +
+                bband_sup[:, :, None])
 
-    d_sdfs = np.abs(yk[:,adaptiv_weights])**2
+    # gather the (channel, frequency) cells that get adaptive weights,
+    # each as a row of K direct spectral estimates
+    d_sdfs = np.abs(yk[m_idx, :, f_idx]) ** 2
     if L < N:
         d_sdfs *= 2
-    sdf_iter = sdf_iter[adaptiv_weights]
-    yk = yk[:,adaptiv_weights]
-    for n in range(max_iter):
-        d_k = rt_eig[:,None] * sdf_iter[None, :]
-        d_k /= eigvals[:, None]*sdf_iter[None, :] + bband_sup[:,None]
-        # Test for convergence -- this is overly conservative, since
-        # iteration only stops when all frequencies have converged.
-        # A better approach is to iterate separately for each freq, but
-        # that is a nonvectorized algorithm.
-        #sdf_iter = mtm_cross_spectrum(yk, yk, d_k, sides=sides)
-        sdf_iter = np.sum( d_k**2 * d_sdfs, axis=0 )
-        sdf_iter /= np.sum( d_k**2, axis=0 )
-        # Compute the cost function from eq 5.4 in Thomson 1982
-        cfn = eigvals[:,None] * (sdf_iter[None,:] - d_sdfs)
-        cfn /= (eigvals[:,None] * sdf_iter[None,:] + bband_sup[:,None])**2
-        cfn = np.sum(cfn, axis=0)
-        # there seem to be some pathological freqs sometimes ..
-        # this should be a good heuristic
-        if np.percentile(cfn**2, 95) < 1e-12:
-            break
-    else:  # If you have reached maximum number of iterations
+
+    d_k, converged = _adaptive_iterate(d_sdfs, sdf_iter[m_idx, f_idx],
+                                       eigvals, bband_sup[m_idx], m_idx, M,
+                                       max_iter)
+    if not converged:  # If you have reached maximum number of iterations
         # Issue a warning and return non-converged weights:
         e_s = 'Breaking due to iterative meltdown in '
         e_s += 'nitime.utils.adaptive_weights.'
         warnings.warn(e_s, RuntimeWarning)
-    weights = np.zeros( (K,L) )
-    weights[:,adaptiv_weights] = d_k
-    weights[:,default_weights] = w_def
+    weights[m_idx, :, f_idx] = d_k
     nu = 2 * (weights ** 2).sum(axis=-2)
+    weights.shape = out_shape + (K, L)
+    nu.shape = out_shape + (L,)
     return weights, nu
 
+
+def _adaptive_iterate(d_sdfs, sdf_iter, eigvals, bband_sup, groups, n_groups,
+                      max_iter):
+    """
+    Iterate the adaptive weighting of :func:`adaptive_weights` over a flat
+    set of (channel, frequency) cells.
+
+    Parameters
+    ----------
+
+    d_sdfs : ndarray (n_cells, K)
+       The K direct spectral estimates of each cell
+    sdf_iter : ndarray (n_cells,)
+       The starting estimate of the adaptive sdf of each cell
+    eigvals : ndarray (K,) or (n_cells, K)
+       The eigenvalues of the DPSS tapers, possibly different for every cell
+    bband_sup : ndarray (n_cells, K)
+       The broadband bias of each taper in each cell
+    groups : ndarray (n_cells,)
+       The group (usually a channel) of each cell, in range(n_groups)
+    n_groups : int
+       The number of groups
+    max_iter : int
+       Maximum number of iterations
+
+    Returns
+    -------
+
+    d_k, converged
+
+       The weights, shaped like d_sdfs, and whether the iteration stopped
+       before reaching max_iter
+
+    Notes
+    -----
+
+    Each cell stops iterating as soon as its own cost function has
+    converged, and all the cells of a group stop once 95% of them have
+    converged. The weights of a group therefore do not depend on the other
+    groups iterated along with it.
+    """
+    per_cell = eigvals.ndim > 1
+    d_k = np.empty_like(d_sdfs)
+    sdf_iter = sdf_iter.copy()
+    n_cells = np.bincount(groups, minlength=n_groups)
+    n_converged = np.zeros(n_groups, dtype=int)
+    active = np.arange(len(groups))
+    for n in range(max_iter):
+        eig_a = eigvals[active] if per_cell else eigvals
+        sdf_a = sdf_iter[active][:, None]
+        bband_a = bband_sup[active]
+        d_sdfs_a = d_sdfs[active]
+        d_k_a = np.sqrt(eig_a) * sdf_a
+        d_k_a /= eig_a * sdf_a + bband_a
+        d_k[active] = d_k_a
+        d_k_a **= 2
+        sdf_a = np.sum(d_k_a * d_sdfs_a, axis=-1)
+        sdf_a /= np.sum(d_k_a, axis=-1)
+        sdf_iter[active] = sdf_a
+        # Compute the cost function from eq 5.4 in Thomson 1982
+        sdf_a = sdf_a[:, None]
+        cfn = eig_a * (sdf_a - d_sdfs_a)
+        cfn /= (eig_a * sdf_a + bband_a) ** 2
+        cfn = np.sum(cfn, axis=-1)
+        # cells whose cost function has converged are frozen
+        done = cfn ** 2 < 1e-12
+        n_converged += np.bincount(groups[active[done]], minlength=n_groups)
+        # there seem to be some pathological freqs sometimes ..
+        # this should be a good heuristic
+        group_done = n_converged >= 0.95 * n_cells
+        active = active[~done & ~group_done[groups[active]]]
+        if np.all(group_done):
+            return d_k, True
+    return d_k, False
+
+
 def detect_lines(s, tapers, p=None, **taper_kws):
     """
     Detect the presence of line spectra in s using the F-test
@@ -618,7 +815,7 @@ def detect_lines(s, tapers, p=None, **taper_kws):
         sn = sn.sum(axis=0)
 
     """
-    from nitime.algorithms import tapered_spectra, dpss_windows
+    from nitime.algorithms import tapered_spectra, dpss_cache
     import scipy.stats.distributions as dists
     import scipy.ndimage as ndimage
     N = s.shape[-1]
@@ -627,12 +824,9 @@ def detect_lines(s, tapers, p=None, **taper_kws):
     # 2) perform FFT on all windowed series
     if not isinstance(tapers, np.ndarray):
         # then tapers is (NW, K)
-        args = (N,) + tuple(tapers)
-        dpss, eigvals = dpss_windows(*args)
-        if taper_kws.pop('low_bias', False):
-            keepers = (eigvals > 0.9)
-            dpss = dpss[keepers]
-        tapers = dpss
+        NW, Kmax = tapers
+        tapers, _ = dpss_cache.get(N, NW, Kmax,
+                                   low_bias=taper_kws.pop('low_bias', False))
     # spectra is (n_arr, K, nfft)
     spectra = tapered_spectra(s, tapers, **taper_kws)
     nfft = spectra.shape[-1]
@@ -1063,19 +1257,17 @@ def get_bounds(f, lb=0, ub=None):
 
 def unwrap_phases(a):
     """
-    Changes consecutive jumps larger than pi to their 2*pi complement.
+    Changes consecutive jumps larger than pi to their 2*pi complement, along
+    the last dimension of a (in place).
     """
     pi = np.pi
 
-    diffs = np.diff(a)
+    diffs = np.diff(a, axis=-1)
     mod_diffs = np.mod(diffs + pi, 2 * pi) - pi
-    neg_pi_idx = np.where(mod_diffs == -1 * np.pi)
-    pos_idx = np.where(diffs > 0)
-    this_idx = np.intersect1d(neg_pi_idx[0], pos_idx[0])
-    mod_diffs[this_idx] = pi
+    mod_diffs[(mod_diffs == -pi) & (diffs > 0)] = pi
     correction = mod_diffs - diffs
-    correction[np.where(np.abs(diffs) < pi)] = 0
-    a[1:] += np.cumsum(correction)
+    correction[np.abs(diffs) < pi] = 0
+    a[..., 1:] += np.cumsum(correction, axis=-1)
 
     return a
 
@@ -1133,6 +1325,160 @@ def zero_pad(time_series, NFFT):
     return time_series
 
 
+#-----------------------------------------------------------------------------
+# Condensed pairwise matrices
+#-----------------------------------------------------------------------------
+class CondensedMatrix(object):
+    """
+    A Hermitian matrix of vectors (such as a matrix of cross-spectra, shaped
+    (M, M, n_freqs)), stored as its upper triangle only.
+
+    This is like the condensed form of scipy's distance matrices, but
+    includes the diagonal and keeps any trailing (e.g. frequency) axes.
+    Entries of the lower triangle are found as the conjugate of the
+    corresponding upper triangle entries.
+
+    Parameters
+    ----------
+    data : ndarray, shaped (M * (M + 1) // 2, ...)
+        The entries [i, j], i <= j, in the order given by triu_indices(M)
+
+    M : int, optional
+        The number of rows of the matrix. Inferred from data if not given.
+
+    Examples
+    --------
+    >>> x = np.arange(9.).reshape(3, 3) + np.arange(9.).reshape(3, 3).T
+    >>> c = CondensedMatrix.from_dense(x)
+    >>> c.data
+    array([  0.,   4.,   8.,   8.,  12.,  16.])
+    >>> c[2, 1]
+    12.0
+    >>> np.all(c.toarray() == x)
+    True
+    """
+    def __init__(self, data, M=None):
+        data = np.asarray(data)
+        n_pairs = data.shape[0]
+        if M is None:
+            M = int(np.round((np.sqrt(8 * n_pairs + 1) - 1) / 2))
+        if M * (M + 1) // 2 != n_pairs:
+            e_s = "The first dimension of data (%d) is not " % n_pairs
+            e_s += "M * (M + 1) / 2 for any number of rows M"
+            raise ValueError(e_s)
+        self.data = data
+        self.M = M
+
+    @classmethod
+    def from_dense(cls, x):
+        """Condense the upper triangle of x, shaped (M, M, ...)"""
+        x = np.asarray(x)
+        return cls(x[triu_indices(x.shape[0])], x.shape[0])
+
+    @property
+    def shape(self):
+        """The shape of the full matrix"""
+        return (self.M, self.M) + self.data.shape[1:]
+
+    @property
+    def ndim(self):
+        return self.data.ndim + 1
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def __len__(self):
+        return self.M
+
+    def __repr__(self):
+        return "CondensedMatrix(shape=%s, dtype=%s)" % (self.shape,
+                                                         self.dtype)
+
+    def pair_index(self, i, j):
+        """
+        Find where the entries [i, j] are stored.
+
+        Parameters
+        ----------
+        i, j : int or int arrays
+            Row and column indices, broadcast against each other
+
+        Returns
+        -------
+        idx : int array
+            The indices of the entries into the first dimension of data
+        lower : bool array
+            True for the entries in the lower triangle, which are the
+            conjugates of the stored values
+        """
+        i, j = np.broadcast_arrays(np.asarray(i), np.asarray(j))
+        M = self.M
+        if np.any((i >= M) | (i < -M) | (j >= M) | (j < -M)):
+            raise IndexError("index out of bounds for %d rows" % M)
+        i = np.where(i < 0, i + M, i)
+        j = np.where(j < 0, j + M, j)
+        lower = i > j
+        row = np.where(lower, j, i)
+        col = np.where(lower, i, j)
+        return row * M - row * (row - 1) // 2 + col - row, lower
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) == 1:
+            key = key + (slice(None),)
+        i, j = key[:2]
+        rows = np.arange(self.M)
+        if isinstance(i, slice) and isinstance(j, slice):
+            i, j = rows[i][:, None], rows[j][None, :]
+        else:
+            i = rows[i] if isinstance(i, slice) else i
+            j = rows[j] if isinstance(j, slice) else j
+        idx, lower = self.pair_index(i, j)
+        out = self.data[(idx,) + key[2:]]
+        if np.iscomplexobj(out) and np.any(lower):
+            lower = lower.reshape(lower.shape + (1,) * (out.ndim - lower.ndim))
+            out = np.where(lower, out.conj(), out)
+        return out
+
+    def diagonal(self):
+        """The entries [i, i], shaped (M, ...)"""
+        return self.data[self.pair_index(np.arange(self.M),
+                                         np.arange(self.M))[0]]
+
+    def toarray(self, out=None):
+        """
+        Expand into the full (M, M, ...) array.
+
+        Parameters
+        ----------
+        out : ndarray, optional
+            An array to write the full matrix into
+        """
+        M = self.M
+        if out is None:
+            out = np.empty(self.shape, self.dtype)
+        start = 0
+        # one row of the upper triangle (and one column of the lower
+        # triangle) at a time, to avoid a second condensed-size temporary
+        for i in range(M):
+            row = self.data[start:start + M - i]
+            out[i + 1:, i] = row[1:].conj()
+            out[i, i:] = row
+            start += M - i
+        return out
+
+    def __array__(self, dtype=None):
+        if dtype is None:
+            return self.toarray()
+        return self.toarray().astype(dtype)
+
+
 #-----------------------------------------------------------------------------
 # Numpy utilities - Note: these have been sent into numpy itself, so eventually
 # we'll be able to get rid of them here.
@@ -1981,7 +2327,7 @@ def hilbert_from_new_scipy(x, N=None, axis=-1):
 # These utilities are used in the computation of multivariate autoregressive
 # models (used in computing Granger causality):
 
-def crosscov_vector(x, y, nlags=None):
+def crosscov_vector(x, y, nlags=None, method='auto'):
     """
     This method computes the following function
 
@@ -2007,33 +2353,77 @@ def crosscov_vector(x, y, nlags=None):
     nlags : int, optional
        compute lags for k in {0, ..., nlags-1}
 
+    method : str, optional
+       'direct' sums the products of x and y at each lag. 'fft' computes all
+       the lags at once, from the FFTs of x and y, zero-padded to avoid
+       wrap-around. 'auto' (the default) chooses the one expected to be
+       faster: the direct sums when nlags is small.
+
     Returns
     -------
 
     rxy : ndarray (nc, nc, nlags)
 
     """
+    x = np.asarray(x)
+    y = np.asarray(y)
     N = x.shape[1]
     if nlags is None:
         nlags = N
-    nc = x.shape[0]
+    nx = x.shape[0]
+    ny = y.shape[0]
+    is_complex = np.iscomplexobj(x) or np.iscomplexobj(y)
+
+    rxy = np.empty((nx, ny, nlags), dtype=complex if is_complex else float)
 
-    rxy = np.empty((nc, nc, nlags))
+    if method == 'auto':
+        method = _crosscov_method(nx, ny, N, nlags)
 
     # rxy(k) = E{ x(t)y*(t-k) } ( * = conj transpose )
-    # Take the expectation over an outer-product
-    # between x(t) and conj{y(t-k)} for each t
-
-    for k in range(nlags):
-        # rxy(k) = E{ x(t)y*(t-k) }
-        prod = x[:, None, k:] * y[None, :, :N - k].conj()
-##         # rxy(k) = E{ x(t)y*(t+k) }
-##         prod = x[:,None,:N-k] * y[None,:,k:].conj()
-        # Do a sample mean of N-k pts? or sum and divide by N?
-        rxy[..., k] = prod.mean(axis=-1)
+    if method == 'direct':
+        yc = y.conj() if is_complex else y
+        for k in range(nlags):
+            # The sum over t of the outer-product between x(t) and
+            # conj{y(t-k)}:
+            rxy[..., k] = np.dot(x[:, k:], yc[:, :N - k].T)
+    elif method == 'fft':
+        # Zero-padding to at least N + nlags - 1 points prevents the
+        # circular correlation from wrapping around into the lags needed:
+        n_fft = fftpack.next_fast_len(N + nlags - 1)
+        if is_complex:
+            fft, ifft = np.fft.fft, np.fft.ifft
+        else:
+            fft, ifft = np.fft.rfft, np.fft.irfft
+        X = fft(x, n_fft)
+        Yc = (X if y is x else fft(y, n_fft)).conj()
+        # Transform back a block of rows of x at a time, so that only the
+        # first nlags points of each correlation are kept:
+        n_rows = max(1, 2 ** 22 // (ny * n_fft))
+        for start in range(0, nx, n_rows):
+            block = slice(start, start + n_rows)
+            rxy[block] = ifft(X[block, None] * Yc[None], n_fft)[..., :nlags]
+    else:
+        e_s = "method must be one of 'auto', 'direct' or 'fft'"
+        raise ValueError(e_s)
+
+    # Do a sample mean of N-k pts:
+    rxy /= N - np.arange(nlags)
     return rxy
 
 
+def _crosscov_method(nx, ny, N, nlags):
+    """The faster method for :func:`crosscov_vector`, according to a rough
+    model of the cost of each (in units of a multiply-add in BLAS)"""
+    # Each of the nlags dot products has a fixed overhead, and is less
+    # efficient for few channels:
+    direct_cost = nlags * ((nx * ny + 10 * (nx + ny)) * N + 20000)
+    n_fft = fftpack.next_fast_len(N + nlags - 1)
+    fft_cost = 12 * (nx * ny + nx + ny) * n_fft * np.log2(n_fft)
+    if direct_cost <= fft_cost:
+        return 'direct'
+    return 'fft'
+
+
 def autocov_vector(x, nlags=None):
     """
     This method computes the following function